@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Offline Pipeline Benchmark
+Replays recorded stereo pairs through the capture pipeline stages without
+cameras attached, so performance regressions can be caught on any Linux box
+before rolling out to the Pi:
+
+    remap -> sgbm -> visualize_depth -> compress_depth_data
+          -> image_to_base64 -> sign_data_eip191 / sign_manifest
+
+The signing stages use a CaptureSigner (key derived once), like the capture
+path, and sign the full canonical JSON and the digest manifest respectively.
+
+Reports per-stage p50/p95 latency, throughput and peak RSS as JSON. Given a
+baseline report, exits non-zero if any stage got slower than the tolerance.
+
+Usage:
+    python benchmark_pipeline.py [pairs_dir] [baseline.json]
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from calibration_store import load_rectification_maps
+from capture_signing import CaptureSigner, build_manifest
+from depthmap import (
+    MIN_DISP,
+    MONO_MATCHING,
+    NUM_DISP,
+    PARAM_FILE,
+    compress_depth_data,
+    compute_stereo_depth,
+    create_stereo_matcher,
+    image_to_base64,
+    matching_pair,
+    rectify_pair,
+    visualize_depth,
+)
+from stereo_matchers import load_recorded_pairs
+from stereo_pipeline import FramePacket
+
+# Peak RSS comes from getrusage, which Windows doesn't have
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_PAIRS_DIR = os.path.join('callibration', 'calibration_images')
+
+# Timed passes over the recorded pairs (after one untimed warm-up pair)
+BENCHMARK_REPEATS = int(os.getenv('BENCHMARK_REPEATS', '3'))
+
+# Allowed slowdown vs. the baseline before a stage counts as a regression
+REGRESSION_TOLERANCE = float(os.getenv('BENCHMARK_TOLERANCE', '0.25'))
+
+STAGES = ('remap', 'sgbm', 'visualize_depth', 'compress_depth_data',
+          'image_to_base64', 'sign_data_eip191', 'sign_manifest')
+
+
+def identity_maps(width, height):
+    """Fixed-point maps that leave the image unchanged (no calibration available)"""
+    camera_matrix = np.array([[1.0, 0, width / 2.0], [0, 1.0, height / 2.0], [0, 0, 1.0]])
+    map1, map2 = cv2.initUndistortRectifyMap(camera_matrix, None, None, camera_matrix,
+                                             (width, height), cv2.CV_16SC2)
+    return map1, map2, map1, map2
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == 'darwin':
+        return peak / (1024.0 * 1024.0)
+    return peak / 1024.0
+
+
+def summarize(samples):
+    """Latency summary (milliseconds) of a list of durations in seconds"""
+    values = np.array(samples) * 1000.0
+    return {
+        'count': int(values.size),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'max_ms': float(values.max())
+    }
+
+
+def run_pair(frameL, frameR, maps, stereo, signer, timings):
+    """Run one pair through every stage, appending each stage's duration to timings"""
+    start_time = time.perf_counter()
+    packet = rectify_pair(FramePacket(frameL, frameR, None), *maps)
+    imgL, imgR = packet.imgL, packet.imgR
+    timings['remap'].append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    disparity = compute_stereo_depth(*matching_pair(imgL, imgR), stereo)
+    timings['sgbm'].append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    depth_color = visualize_depth(disparity, MIN_DISP, NUM_DISP)
+    timings['visualize_depth'].append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    depth_data = compress_depth_data(disparity)
+    timings['compress_depth_data'].append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    base_image_b64 = image_to_base64(imgL)
+    depth_image_b64 = image_to_base64(depth_color)
+    timings['image_to_base64'].append(time.perf_counter() - start_time)
+
+    data_obj = {
+        'baseImage': base_image_b64,
+        'depthImage': depth_image_b64,
+        'depthData': depth_data,
+        'timestamp': int(time.time())
+    }
+
+    start_time = time.perf_counter()
+    signer.sign(data_obj)
+    timings['sign_data_eip191'].append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    signer.sign(build_manifest(data_obj))
+    timings['sign_manifest'].append(time.perf_counter() - start_time)
+
+
+def run_benchmark(pairs_dir=DEFAULT_PAIRS_DIR, repeats=BENCHMARK_REPEATS):
+    """
+    Benchmark the pipeline stages on recorded pairs
+
+    Returns:
+        Report dict, or None if no pairs were found
+    """
+    pairs = load_recorded_pairs(pairs_dir)
+    if not pairs:
+        print(f"❌ No left_*.png/right_*.png pairs found in {pairs_dir}")
+        return None
+
+    height, width = pairs[0][0].shape[:2]
+    if os.path.exists(PARAM_FILE):
+        maps = load_rectification_maps(PARAM_FILE)
+        rectification = PARAM_FILE
+    else:
+        print(f"⚠️ {PARAM_FILE} not found - benchmarking remap with identity maps")
+        maps = identity_maps(width, height)
+        rectification = 'identity'
+
+    stereo = create_stereo_matcher()
+    # Throwaway key: signing cost does not depend on which key is used
+    from eth_account import Account
+    signer = CaptureSigner(Account.create().key.hex())
+
+    print(f"Benchmarking {len(pairs)} pairs x {repeats} passes ({width}x{height})...")
+
+    # Warm-up so one-time allocations don't land in the percentiles
+    run_pair(pairs[0][0], pairs[0][1], maps, stereo, signer, {stage: [] for stage in STAGES})
+
+    timings = {stage: [] for stage in STAGES}
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for frameL, frameR in pairs:
+            run_pair(frameL, frameR, maps, stereo, signer, timings)
+    elapsed = time.perf_counter() - start_time
+    processed = len(pairs) * repeats
+
+    return {
+        'generated_at': int(time.time()),
+        'host': {
+            'machine': platform.machine(),
+            'system': platform.system(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'cpu_count': os.cpu_count()
+        },
+        'pairs': len(pairs),
+        'repeats': repeats,
+        'resolution': [width, height],
+        'rectification': rectification,
+        'mono_matching': MONO_MATCHING,
+        'stages': {stage: summarize(timings[stage]) for stage in STAGES},
+        'throughput_fps': processed / elapsed,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def find_regressions(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Compare a report with a baseline report
+
+    Returns:
+        List of human-readable regression descriptions (empty if none)
+    """
+    regressions = []
+    for stage, stats in report['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if base and stats['p95_ms'] > base['p95_ms'] * (1.0 + tolerance):
+            regressions.append(f"{stage}: p95 {stats['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+
+    base_fps = baseline.get('throughput_fps')
+    if base_fps and report['throughput_fps'] < base_fps * (1.0 - tolerance):
+        regressions.append(f"throughput: {report['throughput_fps']:.2f} fps vs baseline {base_fps:.2f} fps")
+
+    base_rss = baseline.get('peak_rss_mb')
+    if base_rss and report['peak_rss_mb'] and report['peak_rss_mb'] > base_rss * (1.0 + tolerance):
+        regressions.append(f"peak RSS: {report['peak_rss_mb']:.0f} MB vs baseline {base_rss:.0f} MB")
+
+    return regressions
+
+
+def print_report(report):
+    print("\n" + "="*70)
+    print(f"{'Stage':<22}{'p50 (ms)':>12}{'p95 (ms)':>12}{'mean (ms)':>12}")
+    print("-"*70)
+    for stage, stats in report['stages'].items():
+        print(f"{stage:<22}{stats['p50_ms']:>12.2f}{stats['p95_ms']:>12.2f}{stats['mean_ms']:>12.2f}")
+    print("-"*70)
+    print(f"Throughput: {report['throughput_fps']:.2f} pairs/s")
+    if report['peak_rss_mb'] is not None:
+        print(f"Peak RSS:   {report['peak_rss_mb']:.0f} MB")
+    print("="*70)
+
+
+if __name__ == '__main__':
+    pairs_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PAIRS_DIR
+    baseline_file = sys.argv[2] if len(sys.argv) > 2 else None
+
+    report = run_benchmark(pairs_dir)
+    if report is None:
+        sys.exit(1)
+
+    print_report(report)
+    output_file = f"benchmark_{report['generated_at']}.json"
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Report saved: {output_file}")
+
+    if baseline_file:
+        with open(baseline_file, 'r') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) vs {baseline_file} (tolerance {REGRESSION_TOLERANCE * 100:.0f}%):")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"✅ No regressions vs {baseline_file} (tolerance {REGRESSION_TOLERANCE * 100:.0f}%)")
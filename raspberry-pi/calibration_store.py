@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Calibration Store
+Derives fixed-point (CV_16SC2) rectification maps from stereo_params.npz once
+and caches them as uncompressed .npy files keyed by the SHA-256 of the
+calibration file, inside a calibration_cache/ directory this module owns.
+Later starts memory-map the cached maps instead of decompressing and
+converting the float maps again.
+
+cv2.remap with CV_16SC2 maps uses integer lookup plus a small interpolation
+table (1/32 pixel precision), which is noticeably faster per frame than the
+CV_32FC1 maps written by calicali.py.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+
+import cv2
+import numpy as np
+
+# The cache always lives in CACHE_SUBDIR under the configured root, so pruning
+# old calibrations can never touch anything else in that directory
+DEFAULT_CACHE_ROOT = '.'
+CACHE_SUBDIR = 'calibration_cache'
+MAP_NAMES = ('mapL1', 'mapL2', 'mapR1', 'mapR2')
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Cache entries: <sha256 hex> directories (plus '.tmp' while being built)
+_ENTRY_PATTERN = re.compile(r'^[0-9a-f]{64}(\.tmp)?$')
+
+
+def file_digest(path):
+    """SHA-256 hex digest of a file"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def to_fixed_point(map1, map2):
+    """Convert a rectification map pair to CV_16SC2 (no-op if already fixed-point)"""
+    if map1.dtype == np.int16 and map1.ndim == 3:
+        return map1, map2
+    return cv2.convertMaps(map1, map2, cv2.CV_16SC2)
+
+
+def _build_cache(param_file, cache_path):
+    data = np.load(param_file)
+    mapL1, mapL2 = to_fixed_point(data['mapL1'], data['mapL2'])
+    mapR1, mapR2 = to_fixed_point(data['mapR1'], data['mapR2'])
+
+    # Write into a temporary directory and rename, so an interrupted build
+    # never leaves a half-written cache behind
+    tmp_path = cache_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, array in zip(MAP_NAMES, (mapL1, mapL2, mapR1, mapR2)):
+        np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(array))
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.rename(tmp_path, cache_path)
+
+
+def _is_cache_entry(cache_dir, entry):
+    """True for a digest directory holding nothing but cached map files"""
+    path = os.path.join(cache_dir, entry)
+    if not _ENTRY_PATTERN.match(entry) or not os.path.isdir(path) or os.path.islink(path):
+        return False
+    expected = {f'{name}.npy' for name in MAP_NAMES}
+    return all(name in expected for name in os.listdir(path))
+
+
+def _prune_cache(cache_dir, keep):
+    for entry in os.listdir(cache_dir):
+        if entry != keep and _is_cache_entry(cache_dir, entry):
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+
+
+def load_rectification_maps(param_file, cache_root=DEFAULT_CACHE_ROOT):
+    """
+    Load fixed-point rectification maps for a calibration file
+
+    Args:
+        param_file: Path to stereo_params.npz
+        cache_root: Directory in which the calibration_cache/ directory is kept
+            (one subdirectory per calibration hash)
+
+    Returns:
+        (mapL1, mapL2, mapR1, mapR2) as read-only memory-mapped arrays
+    """
+    cache_dir = os.path.join(cache_root, CACHE_SUBDIR)
+    digest = file_digest(param_file)
+    cache_path = os.path.join(cache_dir, digest)
+
+    if not all(os.path.exists(os.path.join(cache_path, f'{name}.npy')) for name in MAP_NAMES):
+        print("  Converting rectification maps to fixed-point (one-time)...")
+        os.makedirs(cache_dir, exist_ok=True)
+        _build_cache(param_file, cache_path)
+        # Maps from older calibrations are never needed again
+        _prune_cache(cache_dir, keep=digest)
+
+    return tuple(np.load(os.path.join(cache_path, f'{name}.npy'), mmap_mode='r') for name in MAP_NAMES)
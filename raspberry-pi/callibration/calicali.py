@@ -167,6 +167,7 @@ def calibrate_stereo_cameras():
              roi_left=roi_left, roi_right=roi_right)
     
     print(f"\n✓ Parameters saved to '{OUTPUT_FILE}'")
+    print("  (depth scripts convert the maps to fixed-point CV_16SC2 on first load and cache them)")
     
     # 8. QUALITY VERIFICATION
     print("\n" + "="*60)
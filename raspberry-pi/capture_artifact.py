@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Encode-Once Capture Images
+A captured image is JPEG-encoded a single time; the saved file, the base64
+blob in the signed payload and the multipart IPFS upload all reuse those
+same bytes. Retries read the bytes back from the saved file instead of
+decoding and re-encoding, so every attempt signs and uploads exactly what
+was written at capture time.
+
+The image can also be referenced from the signed metadata by its SHA-256
+digest and IPFS CID instead of being embedded as base64, computed locally
+the way the IPFS service pins it (CIDv1, 256 KiB chunks, raw leaves).
+"""
+
+import base64
+import hashlib
+
+import cv2
+import numpy as np
+
+# Same as OpenCV's default, so payloads match the previous per-call encodes
+DEFAULT_JPEG_QUALITY = 95
+
+# Base image modes for create_signed_payload
+BASE_IMAGE_EMBED = 'embed'  # base64 'baseImage' inside the metadata (legacy)
+BASE_IMAGE_CID = 'cid'      # 'baseImageCid' + 'baseImageSha256' reference only
+
+# IPFS import layout used by the service (kubo defaults for CIDv1)
+IPFS_CHUNK_SIZE = 262144
+IPFS_MAX_LINKS = 174
+
+CODEC_RAW = 0x55
+CODEC_DAG_PB = 0x70
+MULTIHASH_SHA2_256 = 0x12
+UNIXFS_FILE = 2
+
+_BASE32_ALPHABET = 'abcdefghijklmnopqrstuvwxyz234567'
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number, payload):
+    """Protobuf length-delimited field"""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _varint_field(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def _base32(raw):
+    """RFC 4648 base32, lowercase, unpadded (multibase 'b')"""
+    bits = int.from_bytes(raw, 'big')
+    length = len(raw) * 8
+    padding = -length % 5
+    bits <<= padding
+    return ''.join(_BASE32_ALPHABET[(bits >> shift) & 0x1F]
+                   for shift in range(length + padding - 5, -1, -5))
+
+
+def _cid_v1(codec, block):
+    digest = hashlib.sha256(block).digest()
+    return _varint(1) + _varint(codec) + bytes([MULTIHASH_SHA2_256, len(digest)]) + digest
+
+
+def ipfs_cid(data):
+    """
+    CIDv1 (base32) that IPFS assigns to a file imported with raw leaves and
+    256 KiB chunks
+
+    Returns:
+        CID string, or None for files too large for a single-level DAG
+    """
+    chunks = [data[i:i + IPFS_CHUNK_SIZE] for i in range(0, len(data), IPFS_CHUNK_SIZE)] or [b'']
+    if len(chunks) == 1:
+        return 'b' + _base32(_cid_v1(CODEC_RAW, chunks[0]))
+    if len(chunks) > IPFS_MAX_LINKS:
+        return None
+
+    # One dag-pb UnixFS file node linking the raw chunks (links are encoded before data)
+    links = b''.join(_field(2, _field(1, _cid_v1(CODEC_RAW, chunk)) + _field(2, b'') + _varint_field(3, len(chunk)))
+                     for chunk in chunks)
+    unixfs = _varint_field(1, UNIXFS_FILE) + _varint_field(3, len(data))
+    unixfs += b''.join(_varint_field(4, len(chunk)) for chunk in chunks)
+    return 'b' + _base32(_cid_v1(CODEC_DAG_PB, links + _field(1, unixfs)))
+
+
+class JpegImage:
+    """JPEG bytes of one captured image, with the base64 form cached"""
+
+    def __init__(self, data):
+        self.data = data
+        self._base64 = None
+        self._cid = None
+
+    @classmethod
+    def encode(cls, image, quality=DEFAULT_JPEG_QUALITY):
+        """Encode a BGR image"""
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return cls(encoded.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """Read a previously saved JPEG file as-is"""
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def save(self, path):
+        """Write the bytes to a .jpg file"""
+        with open(path, 'wb') as f:
+            f.write(self.data)
+
+    def to_base64(self):
+        """Base64 string for JSON payloads (computed once)"""
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode('utf-8')
+        return self._base64
+
+    def sha256(self):
+        """SHA-256 hex digest of the JPEG bytes"""
+        return hashlib.sha256(self.data).hexdigest()
+
+    def cid(self):
+        """IPFS CID the service will pin these bytes under (computed once)"""
+        if self._cid is None:
+            self._cid = ipfs_cid(self.data)
+        return self._cid
+
+    def decode(self):
+        """Decode back to a BGR image"""
+        return cv2.imdecode(np.frombuffer(self.data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def __len__(self):
+        return len(self.data)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Background Capture Commits
+Hands encode/sign/upload/register work for each capture to a worker pool so
+the preview keeps running, and collects status messages for a non-blocking
+on-screen overlay.
+"""
+
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Default number of captures processed concurrently
+DEFAULT_MAX_IN_FLIGHT = 2
+
+
+class StatusOverlay:
+    """Thread-safe store of timed status messages, one slot per capture"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.order = itertools.count()
+        # key -> (order, message, color, expires_at)
+        self.messages = {}
+
+    def post(self, key, message, duration=3, color=(0, 255, 0)):
+        """Show message for this key, replacing its previous one"""
+        with self.lock:
+            self.messages[key] = (next(self.order), message, color, time.monotonic() + duration)
+
+    def active(self):
+        """Return unexpired (message, color) tuples, oldest first"""
+        now = time.monotonic()
+        with self.lock:
+            self.messages = {k: v for k, v in self.messages.items() if v[3] > now}
+            entries = sorted(self.messages.values())
+        return [(message, color) for _, message, color, _ in entries]
+
+
+class CommitWorker:
+    """
+    Runs capture commits on a bounded worker pool
+
+    Args:
+        commit_func: Callable commit_func(job, notify) doing the actual work;
+            notify(message, duration, color) posts a status update
+        overlay: StatusOverlay receiving status updates
+        max_in_flight: Maximum number of commits processed at the same time
+    """
+
+    def __init__(self, commit_func, overlay, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self.commit_func = commit_func
+        self.overlay = overlay
+        self.max_in_flight = max(1, max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='commit')
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, key, job):
+        """Queue a capture commit; returns immediately"""
+        with self.lock:
+            self.pending += 1
+            queued = self.pending > self.max_in_flight
+        if queued:
+            self.overlay.post(key, f"Capture {key} queued\n({self.pending} in flight)", duration=3, color=(0, 165, 255))
+        self.executor.submit(self._run, key, job)
+
+    def in_flight(self):
+        """Number of commits queued or running"""
+        with self.lock:
+            return self.pending
+
+    def shutdown(self, wait=True):
+        """Stop accepting work; optionally wait for queued commits to finish"""
+        self.executor.shutdown(wait=wait)
+
+    def _run(self, key, job):
+        def notify(message, duration=3, color=(0, 255, 0)):
+            self.overlay.post(key, message, duration, color)
+
+        success = False
+        try:
+            success = self.commit_func(job, notify)
+        except Exception as e:
+            print(f"⚠️ Capture {key} commit failed: {e}")
+            traceback.print_exc()
+            notify(f"❌ Capture {key} failed\n\nCheck console for details", duration=5, color=(0, 0, 255))
+        finally:
+            with self.lock:
+                self.pending -= 1
+                if success:
+                    self.completed += 1
+                else:
+                    self.failed += 1
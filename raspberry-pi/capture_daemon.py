@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Headless Capture Daemon
+Runs capture + depth without any display. Cameras are kept streaming by the
+reader threads; depth and the payload views are only computed when a
+capture is triggered by:
+  - HTTP:   curl -X POST http://127.0.0.1:8765/capture
+  - Signal: kill -USR1 <pid>
+  - GPIO:   rising edge on CAPTURE_GPIO_PATH (e.g. /sys/class/gpio/gpio17/value)
+"""
+
+import json
+import os
+import queue
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from capture_metrics import METRICS
+from depthmap import (
+    load_calibration,
+    rectify_pair,
+    start_commit_services,
+    start_metrics_exporter,
+    start_stereo_source,
+    stop_commit_services,
+)
+from stereo_pipeline import FramePacket
+
+DAEMON_HOST = os.getenv('CAPTURE_DAEMON_HOST', '127.0.0.1')
+DAEMON_PORT = int(os.getenv('CAPTURE_DAEMON_PORT', '8765'))
+
+# Optional sysfs-style GPIO value file polled for a capture button
+CAPTURE_GPIO_PATH = os.getenv('CAPTURE_GPIO_PATH')
+GPIO_POLL_INTERVAL = 0.02
+
+# Headless units can't press 'x', so camera order is configured instead
+SWAP_CAMERAS = os.getenv('SWAP_CAMERAS', '0') == '1'
+
+
+class ConsoleStatus:
+    """Status sink for the commit worker that logs instead of drawing an overlay"""
+
+    def post(self, key, message, duration=3, color=(0, 255, 0)):
+        text = ' '.join(line for line in message.split('\n') if line)
+        print(f"[capture {key}] {text}")
+
+
+def make_http_handler(triggers, daemon_status):
+    """Build the request handler for the local control endpoint"""
+
+    class CaptureRequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status_code, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != '/capture':
+                self._send_json(404, {'error': 'Not found'})
+                return
+            triggers.put('http')
+            self._send_json(202, {'queued': True})
+
+        def do_GET(self):
+            if self.path != '/status':
+                self._send_json(404, {'error': 'Not found'})
+                return
+            self._send_json(200, daemon_status())
+
+        def log_message(self, format, *args):
+            pass
+
+    return CaptureRequestHandler
+
+
+def watch_gpio(path, triggers, stop_event):
+    """Poll a GPIO value file and trigger a capture on each rising edge"""
+    last_value = None
+    while not stop_event.is_set():
+        try:
+            with open(path, 'r') as f:
+                value = f.read().strip()
+        except OSError:
+            value = None
+        if value == '1' and last_value == '0':
+            triggers.put('gpio')
+        last_value = value
+        stop_event.wait(GPIO_POLL_INTERVAL)
+
+
+def run_daemon():
+    """Run headless capture until SIGINT/SIGTERM"""
+
+    calibration = load_calibration()
+    if calibration is None:
+        return
+    mapL1, mapL2, mapR1, mapR2 = calibration
+
+    grabber, cameras = start_stereo_source()
+    if grabber is None:
+        return
+    start_time = time.monotonic()
+
+    outbox, committer, flusher = start_commit_services(ConsoleStatus())
+    exporter = start_metrics_exporter(grabber, committer, outbox)
+
+    triggers = queue.Queue()
+    stop_event = threading.Event()
+    signal_triggers = []
+    capture_count = 0
+
+    # Signal handlers only record the event; the main loop picks it up
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: signal_triggers.append('signal'))
+
+    def daemon_status():
+        elapsed = max(1e-6, time.monotonic() - start_time)
+        return {
+            'captures': capture_count,
+            'in_flight': committer.in_flight(),
+            'outbox_pending': outbox.pending_count(),
+            'camera_fps': grabber.left.sequence / elapsed,
+            'dropped_pairs': grabber.dropped_pairs
+        }
+
+    server = ThreadingHTTPServer((DAEMON_HOST, DAEMON_PORT), make_http_handler(triggers, daemon_status))
+    threading.Thread(target=server.serve_forever, name='capture-http', daemon=True).start()
+
+    if CAPTURE_GPIO_PATH:
+        threading.Thread(target=watch_gpio, args=(CAPTURE_GPIO_PATH, triggers, stop_event),
+                         name='capture-gpio', daemon=True).start()
+
+    print("\n" + "="*70)
+    print("STEREO DEPTH SYSTEM - HEADLESS CAPTURE DAEMON")
+    print("="*70)
+    print("Triggers:")
+    print(f"  HTTP    POST http://{DAEMON_HOST}:{DAEMON_PORT}/capture  (GET /status)")
+    print(f"  Signal  kill -USR1 {os.getpid()}")
+    if CAPTURE_GPIO_PATH:
+        print(f"  GPIO    rising edge on {CAPTURE_GPIO_PATH}")
+    print("  Stop    Ctrl+C / SIGTERM")
+    print("="*70 + "\n")
+
+    last_capture_timestamp = 0
+
+    while not stop_event.is_set():
+        try:
+            source = triggers.get(timeout=0.1)
+        except queue.Empty:
+            if not signal_triggers:
+                continue
+            source = signal_triggers.pop()
+
+        ret, frameL, frameR, _ = grabber.read()
+        if not ret:
+            print(f"⚠️ Capture ({source}) skipped: no synchronized frame pair available")
+            continue
+
+        # Rectify only; depth and payload views are computed full-res by the commit worker
+        with METRICS.timer('rectify'):
+            packet = rectify_pair(FramePacket(frameL, frameR, None), mapL1, mapL2, mapR1, mapR2,
+                                  swap_cameras=SWAP_CAMERAS)
+
+        # Keep timestamps unique so rapid captures don't overwrite each other's files
+        timestamp = max(int(time.time()), last_capture_timestamp + 1)
+        last_capture_timestamp = timestamp
+
+        elapsed = max(1e-6, time.monotonic() - start_time)
+        committer.submit(timestamp, {
+            'timestamp': timestamp,
+            'imgL': packet.imgL,
+            'imgR': packet.imgR,
+            'blend_strength': 0.6,
+            'fps': grabber.left.sequence / elapsed
+        })
+        METRICS.increment('captures', source=source)
+        capture_count += 1
+        print(f"✓ Capture #{capture_count} triggered by {source} ({committer.in_flight()} in flight)")
+
+    print("\nShutting down...")
+    server.shutdown()
+    grabber.stop()
+    stop_commit_services(outbox, committer, flusher)
+    if exporter is not None:
+        exporter.stop()
+    for cap in cameras:
+        cap.release()
+    print(f"✓ Total captures: {capture_count}")
+
+
+if __name__ == '__main__':
+    run_daemon()
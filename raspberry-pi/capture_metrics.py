@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Stage Latency Metrics
+Per-stage timers recorded into fixed-bucket histograms, plus counters and
+gauges, exported periodically as:
+
+  - a Prometheus textfile (for node_exporter's textfile collector)
+  - a JSON snapshot (for ad-hoc inspection / scp off the device)
+
+Stages are recorded into the shared METRICS registry from wherever they run
+(camera readers, pipeline stages, views, commit steps).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = 'deepshare'
+
+# Histogram bucket upper bounds in seconds (+Inf is implicit); wide enough
+# for both per-frame stages and multi-second upload/registration steps
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+PROMETHEUS_FILE = 'deepshare.prom'
+JSON_FILE = 'metrics.json'
+DEFAULT_EXPORT_INTERVAL = 15.0
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, cumulative count) pairs, ending with +Inf"""
+        result = []
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+    def quantile(self, q):
+        """Approximate quantile (upper bound of the bucket holding it)"""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        for bound, running in self.cumulative():
+            if running >= target:
+                return bound
+        return float('inf')
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+class MetricsRegistry:
+    """Thread-safe store of stage histograms, counters and gauges"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self.started_at = time.time()
+
+    def observe(self, stage, seconds):
+        """Record one duration (seconds) for a stage"""
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """Context manager recording the duration of its block for a stage"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start_time)
+
+    def increment(self, name, amount=1, **labels):
+        """Add to a counter"""
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_counter(self, name, value, **labels):
+        """Mirror a monotonic count kept elsewhere (e.g. Pipeline.dropped_frames)"""
+        with self.lock:
+            self.counters[(name, _label_key(labels))] = value
+
+    def set_gauge(self, name, value, **labels):
+        """Set a point-in-time value"""
+        with self.lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            if self.stages:
+                family = f'{METRIC_PREFIX}_stage_seconds'
+                lines.append(f'# HELP {family} Processing time per stage')
+                lines.append(f'# TYPE {family} histogram')
+                for stage in sorted(self.stages):
+                    histogram = self.stages[stage]
+                    for bound, running in histogram.cumulative():
+                        labels = _format_labels((('stage', stage), ('le', _format_bound(bound))))
+                        lines.append(f'{family}_bucket{labels} {running}')
+                    labels = _format_labels((('stage', stage),))
+                    lines.append(f'{family}_sum{labels} {histogram.total:.6f}')
+                    lines.append(f'{family}_count{labels} {histogram.count}')
+
+            for metrics, kind, suffix in ((self.counters, 'counter', '_total'), (self.gauges, 'gauge', '')):
+                declared = set()
+                for name, labels in sorted(metrics):
+                    family = f'{METRIC_PREFIX}_{name}{suffix}'
+                    if family not in declared:
+                        lines.append(f'# TYPE {family} {kind}')
+                        declared.add(family)
+                    lines.append(f'{family}{_format_labels(labels)} {metrics[(name, labels)]}')
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        """JSON-serializable snapshot with bucket counts and approximate p50/p95"""
+        with self.lock:
+            stages = {}
+            for stage, histogram in self.stages.items():
+                stages[stage] = {
+                    'count': histogram.count,
+                    'mean_ms': histogram.total / histogram.count * 1000 if histogram.count else None,
+                    'p50_le_ms': _ms(histogram.quantile(0.50)),
+                    'p95_le_ms': _ms(histogram.quantile(0.95)),
+                    'buckets': {_format_bound(bound): running for bound, running in histogram.cumulative()}
+                }
+            return {
+                'generated_at': time.time(),
+                'uptime': time.time() - self.started_at,
+                'stages': stages,
+                'counters': {_flat_name(name, labels): value for (name, labels), value in self.counters.items()},
+                'gauges': {_flat_name(name, labels): value for (name, labels), value in self.gauges.items()}
+            }
+
+
+def _ms(seconds):
+    if seconds is None:
+        return None
+    if seconds == float('inf'):
+        return 'inf'
+    return seconds * 1000
+
+
+def _flat_name(name, labels):
+    return name + _format_labels(labels)
+
+
+def _write_atomic(path, text):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """
+    Periodically writes the registry to a Prometheus textfile and a JSON file
+
+    Args:
+        registry: MetricsRegistry to export
+        directory: Output directory (point node_exporter's
+            --collector.textfile.directory here to scrape it)
+        interval: Seconds between exports
+        collect: Optional callable run before each export to refresh
+            counters/gauges mirrored from other components
+        name: Optional suffix for the file names, so several processes can
+            export into the same directory (deepshare_<name>.prom, metrics_<name>.json)
+    """
+
+    def __init__(self, registry, directory, interval=DEFAULT_EXPORT_INTERVAL, collect=None, name=None):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.collect = collect
+        self.prometheus_file = PROMETHEUS_FILE
+        self.json_file = JSON_FILE
+        if name:
+            self.prometheus_file = f'{METRIC_PREFIX}_{name}.prom'
+            self.json_file = f'metrics_{name}.json'
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start the export thread"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the export thread after one final export"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5.0)
+            self.thread = None
+        self.export()
+
+    def export(self):
+        """Write both files now"""
+        if self.collect is not None:
+            try:
+                self.collect()
+            except Exception as e:
+                print(f"⚠️ Metrics collection error: {e}")
+        try:
+            _write_atomic(os.path.join(self.directory, self.prometheus_file), self.registry.to_prometheus())
+            _write_atomic(os.path.join(self.directory, self.json_file),
+                          json.dumps(self.registry.to_dict(), indent=2))
+        except OSError as e:
+            print(f"⚠️ Metrics export failed: {e}")
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.export()
+
+
+# Shared registry for the capture process
+METRICS = MetricsRegistry()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Durable Capture Outbox
+SQLite journal of every capture's commit state (encoded -> signed ->
+uploaded -> registered) plus a background flusher that retries pending
+captures with exponential backoff, resumes after a reboot and drains the
+backlog in batches once connectivity returns.
+
+Capture ids are capture timestamps in seconds and also name the capture's
+files. reserve_id() hands out the first id at or after the timestamp that
+no capture has used yet, so a restart or a clock stepping backwards (Pis
+without an RTC before NTP syncs) never reuses the id of an earlier capture.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+# Capture states, in commit order
+STATE_ENCODED = 'encoded'        # Files written locally, not yet signed
+STATE_SIGNED = 'signed'          # Signed payload persisted, not yet uploaded
+STATE_UPLOADED = 'uploaded'      # Uploaded to IPFS, CIDs known
+STATE_REGISTERED = 'registered'  # Registered as IP asset on Story Protocol
+
+PENDING_STATES = (STATE_ENCODED, STATE_SIGNED, STATE_UPLOADED)
+
+DEFAULT_OUTBOX_DIR = 'outbox'
+
+# How long a claimed capture is hidden from other workers while being processed
+DEFAULT_LEASE_SECONDS = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    capture_id INTEGER PRIMARY KEY,
+    state TEXT NOT NULL,
+    left_file TEXT,
+    views_file TEXT,
+    depth_file TEXT,
+    depth_meta_file TEXT,
+    payload_file TEXT,
+    image_cid TEXT,
+    metadata_cid TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class CaptureOutbox:
+    """Persistent journal of capture commit state, safe to share across threads"""
+
+    def __init__(self, directory=DEFAULT_OUTBOX_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, 'outbox.db')
+        self.lock = threading.Lock()
+        # Ids handed out by reserve_id whose capture hasn't been added yet
+        self.reserved = set()
+        with self.lock, self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, commit on success and always close it"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def reserve_id(self, timestamp):
+        """
+        Reserve the capture id for a new capture before its files are written
+
+        Returns:
+            The first id >= timestamp not used by any capture in the outbox
+            (whatever its state) or reserved by another commit in progress
+        """
+        capture_id = int(timestamp)
+        with self.lock, self._connect() as conn:
+            used = {row[0] for row in conn.execute(
+                "SELECT capture_id FROM captures WHERE capture_id >= ?", (capture_id,))}
+            while capture_id in used or capture_id in self.reserved:
+                capture_id += 1
+            self.reserved.add(capture_id)
+        return capture_id
+
+    def unreserve(self, capture_id):
+        """Release an id from reserve_id whose capture was abandoned before add()"""
+        with self.lock:
+            self.reserved.discard(capture_id)
+
+    def add(self, capture_id, left_file, views_file, depth_file, depth_meta_file, lease=DEFAULT_LEASE_SECONDS):
+        """
+        Record a newly encoded capture, leased to the caller for its first attempt
+
+        Raises:
+            ValueError: if a capture with this id is already recorded (never replaced)
+        """
+        now = time.time()
+        with self.lock:
+            self.reserved.discard(capture_id)
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT INTO captures "
+                        "(capture_id, state, left_file, views_file, depth_file, depth_meta_file, "
+                        "next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (capture_id, STATE_ENCODED, left_file, views_file, depth_file, depth_meta_file,
+                         now + lease, now, now)
+                    )
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Capture {capture_id} is already in the outbox (use reserve_id)")
+
+    def get(self, capture_id):
+        """Return the capture record as a dict, or None"""
+        with self.lock, self._connect() as conn:
+            row = conn.execute("SELECT * FROM captures WHERE capture_id = ?", (capture_id,)).fetchone()
+        return dict(row) if row else None
+
+    def update(self, capture_id, **fields):
+        """Update columns of a capture record"""
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self.lock, self._connect() as conn:
+            conn.execute(f"UPDATE captures SET {columns} WHERE capture_id = ?",
+                         (*fields.values(), capture_id))
+
+    def payload_path(self, capture_id):
+        return os.path.join(self.directory, f'payload_{capture_id}.json')
+
+    def save_payload(self, capture_id, payload):
+        """Persist the signed payload and advance the capture to 'signed'"""
+        path = self.payload_path(capture_id)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.update(capture_id, state=STATE_SIGNED, payload_file=path)
+
+    def load_payload(self, capture_id):
+        with open(self.payload_path(capture_id), 'r') as f:
+            return json.load(f)
+
+    def claim_due(self, limit, lease=DEFAULT_LEASE_SECONDS):
+        """Lease up to `limit` pending captures whose retry time has come, oldest first"""
+        now = time.time()
+        placeholders = ', '.join('?' for _ in PENDING_STATES)
+        with self.lock, self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM captures WHERE state IN ({placeholders}) AND next_attempt_at <= ? "
+                "ORDER BY capture_id LIMIT ?",
+                (*PENDING_STATES, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE captures SET next_attempt_at = ? WHERE capture_id = ?",
+                [(now + lease, row['capture_id']) for row in rows]
+            )
+        return [dict(row) for row in rows]
+
+    def release(self, capture_ids):
+        """Make leased captures immediately due again"""
+        now = time.time()
+        with self.lock, self._connect() as conn:
+            conn.executemany(
+                "UPDATE captures SET next_attempt_at = ?, updated_at = ? WHERE capture_id = ?",
+                [(now, now, capture_id) for capture_id in capture_ids]
+            )
+
+    def record_failure(self, capture_id, error, base_delay, max_delay):
+        """Count a failed attempt and schedule the next one with exponential backoff"""
+        record = self.get(capture_id)
+        if record is None:
+            return 0
+        attempts = record['attempts'] + 1
+        delay = min(max_delay, base_delay * (2 ** (attempts - 1)))
+        delay += random.uniform(0, delay * 0.1)  # Jitter so a fleet doesn't retry in lockstep
+        self.update(capture_id, attempts=attempts, last_error=str(error),
+                    next_attempt_at=time.time() + delay)
+        return delay
+
+    def pending_count(self):
+        placeholders = ', '.join('?' for _ in PENDING_STATES)
+        with self.lock, self._connect() as conn:
+            row = conn.execute(f"SELECT COUNT(*) FROM captures WHERE state IN ({placeholders})",
+                               PENDING_STATES).fetchone()
+        return row[0]
+
+
+class OutboxFlusher:
+    """
+    Background thread retrying pending captures from a CaptureOutbox
+
+    Args:
+        outbox: CaptureOutbox to drain
+        process_func: process_func(record) advances one capture as far as it
+            can and returns True once it is fully registered
+        batch_size: Captures claimed per batch
+        poll_interval: Seconds between checks when nothing is due
+        base_delay: First retry delay in seconds (doubles per failure)
+        max_delay: Upper bound on the retry delay in seconds
+        prepare_func: Optional prepare_func(records) run once per claimed batch
+            before its captures are advanced (e.g. to sign them in one pass)
+    """
+
+    def __init__(self, outbox, process_func, batch_size=5, poll_interval=15, base_delay=10, max_delay=3600,
+                 prepare_func=None):
+        self.outbox = outbox
+        self.process_func = process_func
+        self.prepare_func = prepare_func
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.flushed = 0
+
+    def start(self):
+        pending = self.outbox.pending_count()
+        if pending:
+            print(f"📦 Outbox: {pending} pending capture(s) will be retried in the background")
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='outbox-flusher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5.0)
+            self.thread = None
+
+    def _run(self):
+        # Flusher-level backoff so a dead link isn't hammered one capture at a time
+        backoff = self.base_delay
+        while not self.stop_event.is_set():
+            records = self.outbox.claim_due(self.batch_size)
+            if not records:
+                self.stop_event.wait(self.poll_interval)
+                continue
+
+            if self.prepare_func is not None:
+                try:
+                    self.prepare_func(records)
+                except Exception:
+                    # Each capture still goes through process_func on its own
+                    traceback.print_exc()
+
+            failed = False
+            for i, record in enumerate(records):
+                if self.stop_event.is_set():
+                    self.outbox.release([r['capture_id'] for r in records[i:]])
+                    return
+                capture_id = record['capture_id']
+                try:
+                    ok = self.process_func(record)
+                    error = None if ok else f"{self.outbox.get(capture_id)['state']} step failed"
+                except Exception as e:
+                    traceback.print_exc()
+                    ok, error = False, e
+
+                if ok:
+                    self.flushed += 1
+                    continue
+
+                delay = self.outbox.record_failure(capture_id, error, self.base_delay, self.max_delay)
+                print(f"⚠️ Outbox: capture {capture_id} failed ({error}), retrying in {delay:.0f}s")
+                # Connectivity is probably down; hand the rest of the batch back
+                self.outbox.release([r['capture_id'] for r in records[i + 1:]])
+                failed = True
+                break
+
+            if failed:
+                self.stop_event.wait(backoff)
+                backoff = min(self.max_delay, backoff * 2)
+            else:
+                # Link is up: keep draining the next batch straight away
+                backoff = self.base_delay
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Digest-Manifest Signing
+Signs a small canonical manifest of per-blob SHA-256 digests instead of the
+full canonical JSON of the capture, so signing and verification cost is
+independent of payload size and any subset of blobs can be checked.
+
+The device key is derived once per process (get_signer) and reused for
+every capture and by the CLI tools (get_device_address), including batches
+of queued captures signed in one pass. eth_account is slow to import, so it
+is only loaded on first use.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+
+MANIFEST_VERSION = 1
+MANIFEST_ALGORITHM = 'sha256'
+
+# Signing modes for create_signed_payload
+SIGNING_MODE_MANIFEST = 'manifest'  # Sign a digest manifest (default)
+SIGNING_MODE_FULL = 'full'          # Legacy: sign the full canonical JSON
+
+# Blobs covered by the manifest, when present in the data object
+MANIFEST_BLOBS = ('baseImage', 'baseImageCid', 'baseImageSha256', 'depthImage', 'depthData', 'timestamp', 'device')
+
+
+def canonical_json(value):
+    """Deterministic compact JSON used for signing"""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+
+def blob_digest(value):
+    """SHA-256 hex digest of a blob (strings hashed as UTF-8, everything else as canonical JSON)"""
+    if isinstance(value, bytes):
+        raw = value
+    elif isinstance(value, str):
+        raw = value.encode('utf-8')
+    else:
+        raw = canonical_json(value).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+def build_manifest(data_obj):
+    """Build the digest manifest for the blobs of a capture data object"""
+    return {
+        'version': MANIFEST_VERSION,
+        'algorithm': MANIFEST_ALGORITHM,
+        'blobs': {name: blob_digest(data_obj[name]) for name in MANIFEST_BLOBS if name in data_obj}
+    }
+
+
+_signer = None
+_signer_lock = threading.Lock()
+_verifier = None
+
+
+class CaptureSigner:
+    """
+    EIP-191 signer with the account derived once
+
+    Args:
+        private_key: Hex private key, with or without the 0x prefix
+    """
+
+    def __init__(self, private_key):
+        from eth_account import Account
+        from eth_account.messages import encode_defunct
+
+        if not private_key.startswith('0x'):
+            private_key = '0x' + private_key
+        self._account = Account.from_key(private_key)
+        self._encode = encode_defunct
+        self.address = self._account.address
+
+    def sign(self, value):
+        """Sign the canonical JSON of a value (manifest or full data object)"""
+        message = self._encode(text=canonical_json(value))
+        return self._account.sign_message(message).signature.hex()
+
+
+class SignatureVerifier:
+    """Recovers and checks the signers of values signed by CaptureSigner"""
+
+    def __init__(self):
+        from eth_account import Account
+        from eth_account.messages import encode_defunct
+
+        self._recover = Account.recover_message
+        self._encode = encode_defunct
+
+    def recover(self, value, signature):
+        """Return the address that signed the canonical JSON of value"""
+        return self._recover(self._encode(text=canonical_json(value)), signature=signature)
+
+    def verify(self, value, signature, address):
+        """True if value was signed by address"""
+        try:
+            return self.recover(value, signature).lower() == address.lower()
+        except Exception:
+            return False
+
+
+def get_signer():
+    """
+    Process-wide signer for the PRIVATE_KEY environment variable
+
+    Returns:
+        CaptureSigner, or None if PRIVATE_KEY is not set
+    """
+    global _signer
+    with _signer_lock:
+        if _signer is None:
+            private_key = os.getenv('PRIVATE_KEY')
+            if not private_key:
+                return None
+            _signer = CaptureSigner(private_key)
+        return _signer
+
+
+def get_device_address():
+    """
+    Device wallet address: the PRIVATE_KEY signer's address, or WALLET_ADDRESS
+    when no key is configured
+
+    Returns:
+        Checksummed address string, or None if neither is set
+    """
+    signer = get_signer()
+    if signer is not None:
+        return signer.address
+    return os.getenv('WALLET_ADDRESS')
+
+
+def get_verifier():
+    """Shared SignatureVerifier"""
+    global _verifier
+    if _verifier is None:
+        _verifier = SignatureVerifier()
+    return _verifier
+
+
+def sign_manifest(manifest, private_key):
+    """Sign the canonical manifest with EIP-191 (derives the key; prefer a CaptureSigner)"""
+    return CaptureSigner(private_key).sign(manifest)
+
+
+def recover_manifest_signer(manifest, signature):
+    """Return the address that signed the manifest"""
+    return get_verifier().recover(manifest, signature)
+
+
+def verify_blobs(data_obj, manifest, names=None):
+    """
+    Check blobs against the manifest digests
+
+    Args:
+        data_obj: Capture data object holding the blobs
+        manifest: Signed manifest
+        names: Blob names to check (default: every blob in the manifest)
+
+    Returns:
+        Dict of blob name -> True/False (False if missing on either side)
+    """
+    digests = manifest.get('blobs', {})
+    if names is None:
+        names = list(digests)
+    return {
+        name: name in digests and name in data_obj and blob_digest(data_obj[name]) == digests[name]
+        for name in names
+    }
+
+
+def verify_base_image(data_obj, image_bytes):
+    """
+    Check image bytes (e.g. fetched from IPFS) against a by-reference base image
+
+    Returns:
+        True/False, or None if the payload embeds the image instead
+    """
+    expected = data_obj.get('baseImageSha256')
+    if expected is None:
+        return None
+    return hashlib.sha256(image_bytes).hexdigest() == expected
+
+
+def verify_payload(payload, expected_address=None, names=None):
+    """
+    Verify a manifest-signed payload
+
+    Returns:
+        (ok, signer_address, blob_results)
+    """
+    manifest = payload.get('manifest')
+    signature = payload.get('signature', '')
+    data_obj = payload.get('data', payload)
+    if not manifest:
+        return False, None, {}
+
+    try:
+        signer = recover_manifest_signer(manifest, signature)
+    except Exception:
+        return False, None, {}
+
+    blob_results = verify_blobs(data_obj, manifest, names)
+    ok = all(blob_results.values())
+    if expected_address is not None:
+        ok = ok and signer.lower() == expected_address.lower()
+    return ok, signer, blob_results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python capture_signing.py <payload.json> [blob ...] [--image <image.jpg>]")
+        print("Example: python capture_signing.py outbox/payload_1234.json depthData timestamp")
+        print("         python capture_signing.py outbox/payload_1234.json --image capture_1234_left.jpg")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r') as f:
+        payload = json.load(f)
+
+    names = sys.argv[2:]
+    image_file = None
+    if '--image' in names:
+        index = names.index('--image')
+        image_file = names[index + 1] if index + 1 < len(names) else None
+        names = names[:index] + names[index + 2:]
+
+    ok, signer, blob_results = verify_payload(payload, names=names or None)
+    print(f"Signer: {signer}")
+    for name, valid in blob_results.items():
+        print(f"  {'✓' if valid else '✗'} {name}")
+    if image_file:
+        with open(image_file, 'rb') as f:
+            image_ok = verify_base_image(payload.get('data', payload), f.read())
+        if image_ok is None:
+            print(f"  - {image_file}: payload embeds baseImage, nothing to check")
+        else:
+            print(f"  {'✓' if image_ok else '✗'} {image_file} matches baseImageSha256")
+            ok = ok and image_ok
+    print("✅ Signature valid" if ok else "❌ Verification failed")
+    sys.exit(0 if ok else 1)
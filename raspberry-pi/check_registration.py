@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Check if device is registered via IPFS service
+
+Without an address argument, checks the device address of the shared
+signer (PRIVATE_KEY, or WALLET_ADDRESS, from .env).
 """
 import sys
 import os
@@ -34,11 +37,19 @@ def check_device_registered(wallet_address, service_url):
         return False
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: check_registration.py <wallet_address>")
-        sys.exit(1)
+    if len(sys.argv) > 1:
+        wallet_address = sys.argv[1]
+    else:
+        # Only loaded when needed: register_device.sh polls with the address
+        from dotenv import load_dotenv
+        from capture_signing import get_device_address
+        load_dotenv()
+        wallet_address = get_device_address()
+        if not wallet_address:
+            print("Usage: check_registration.py [wallet_address]")
+            print("  (defaults to the device address from PRIVATE_KEY or WALLET_ADDRESS in .env)")
+            sys.exit(1)
     
-    wallet_address = sys.argv[1]
     is_registered = check_device_registered(wallet_address, IPFS_SERVICE_URL)
     
     # Exit with 0 if registered, 1 if not
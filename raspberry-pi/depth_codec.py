@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Compact Depth Encoding
+Versioned binary format for disparity maps, replacing the per-pixel
+indices_y/indices_x/values JSON lists.
+
+Layout of the (compressed, base64-wrapped) blob:
+    [packed validity bitmask, ceil(H*W/8) bytes, row-major]
+    [int16 little-endian fixed-point disparity (x16) of each valid pixel]
+
+StereoSGBM natively outputs int16 disparity scaled by 16, so the float32
+maps produced by `compute_stereo_depth` round-trip losslessly.
+"""
+
+import base64
+import zlib
+
+import numpy as np
+
+# zstd is faster and smaller than zlib but optional on the device
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEPTH_FORMAT = 'deepshare-depth'
+DEPTH_FORMAT_VERSION = 1
+DEPTH_ENCODING = 'int16-fixed-masked'
+
+# SGBM fixed-point scale (4 fractional bits)
+DISPARITY_SCALE = 16
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _compress(raw, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return zlib.compress(raw, ZLIB_LEVEL)
+
+
+def _decompress(blob, compression):
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("Depth data is zstd-compressed but the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    if compression == 'zlib':
+        return zlib.decompress(blob)
+    raise ValueError(f"Unknown depth compression: {compression}")
+
+
+def depth_statistics(disparity, valid_mask=None):
+    """Summary statistics stored alongside the encoded depth map"""
+    if valid_mask is None:
+        valid_mask = disparity > 0
+    return {
+        'shape': list(disparity.shape),
+        'dtype': str(disparity.dtype),
+        'min': float(np.min(disparity)),
+        'max': float(np.max(disparity)),
+        'mean': float(np.mean(disparity)),
+        'std': float(np.std(disparity)),
+        'valid_pixels': int(np.count_nonzero(valid_mask))
+    }
+
+
+def encode_depth_data(disparity, compression=None):
+    """
+    Encode a disparity map into the compact versioned format
+
+    Args:
+        disparity: float32 disparity in pixels (SGBM output / 16), or the raw
+            int16 fixed-point SGBM output
+        compression: 'zstd' or 'zlib' (default: zstd when available)
+
+    Returns:
+        JSON-serializable dict with statistics and the base64 blob
+    """
+    if compression is None:
+        compression = 'zstd' if zstandard is not None else 'zlib'
+
+    if disparity.dtype == np.int16:
+        fixed = disparity
+        disparity = fixed.astype(np.float32) / DISPARITY_SCALE
+    else:
+        fixed = None
+
+    valid_mask = disparity > 0
+    depth_data = depth_statistics(disparity, valid_mask)
+
+    if fixed is None:
+        values = np.rint(disparity[valid_mask] * DISPARITY_SCALE).astype('<i2')
+    else:
+        values = fixed[valid_mask].astype('<i2', copy=False)
+
+    raw = np.packbits(valid_mask, axis=None).tobytes() + values.tobytes()
+    blob = _compress(raw, compression)
+
+    depth_data.update({
+        'format': DEPTH_FORMAT,
+        'version': DEPTH_FORMAT_VERSION,
+        'encoding': DEPTH_ENCODING,
+        'scale': DISPARITY_SCALE,
+        'compression': compression,
+        'data': base64.b64encode(blob).decode('ascii')
+    })
+    return depth_data
+
+
+def reconstruct_depth_map(depth_data):
+    """
+    Reconstruct a float32 disparity map from encoded depth data
+
+    Accepts both the compact format and the legacy indices_y/indices_x/values lists.
+    """
+    shape = tuple(depth_data['shape'])
+
+    if depth_data.get('format') != DEPTH_FORMAT:
+        # Legacy list-based encoding
+        disparity = np.zeros(shape, dtype=np.float32)
+        if len(depth_data.get('values', [])) > 0:
+            indices_y = np.array(depth_data['indices_y'])
+            indices_x = np.array(depth_data['indices_x'])
+            disparity[indices_y, indices_x] = np.array(depth_data['values'])
+        return disparity
+
+    if depth_data.get('version') != DEPTH_FORMAT_VERSION:
+        raise ValueError(f"Unsupported depth format version: {depth_data.get('version')}")
+
+    raw = _decompress(base64.b64decode(depth_data['data']), depth_data['compression'])
+    pixel_count = int(np.prod(shape))
+    mask_bytes = (pixel_count + 7) // 8
+
+    valid_mask = np.unpackbits(np.frombuffer(raw, dtype=np.uint8, count=mask_bytes),
+                               count=pixel_count).astype(bool).reshape(shape)
+    values = np.frombuffer(raw, dtype='<i2', offset=mask_bytes)
+    if values.size != np.count_nonzero(valid_mask):
+        raise ValueError("Corrupt depth data: value count does not match validity mask")
+
+    disparity = np.zeros(shape, dtype=np.float32)
+    disparity[valid_mask] = values.astype(np.float32) / depth_data.get('scale', DISPARITY_SCALE)
+    return disparity
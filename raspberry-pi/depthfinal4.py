@@ -8,6 +8,9 @@ import base64
 from eth_account import Account
 from eth_account.messages import encode_defunct
 from dotenv import load_dotenv
+from depth_codec import encode_depth_data, reconstruct_depth_map
+from calibration_store import load_rectification_maps
+from stereo_matchers import create_matcher, load_matcher_choice
 
 # Load environment variables
 load_dotenv()
@@ -68,47 +71,8 @@ def image_to_base64(image):
     return base64.b64encode(buffer).decode('utf-8')
 
 def compress_depth_data(disparity):
-    """Compress depth data for JSON storage"""
-    valid_mask = disparity > 0
-    
-    depth_data = {
-        'shape': list(disparity.shape),
-        'dtype': str(disparity.dtype),
-        'min': float(np.min(disparity)),
-        'max': float(np.max(disparity)),
-        'mean': float(np.mean(disparity)),
-        'valid_pixels': int(np.sum(valid_mask))
-    }
-    
-    # Store only non-zero values with their indices for efficiency
-    if valid_mask.any():
-        indices = np.where(valid_mask)
-        values = disparity[valid_mask]
-        
-        # Convert to lists for JSON serialization
-        depth_data['indices_y'] = indices[0].tolist()
-        depth_data['indices_x'] = indices[1].tolist()
-        depth_data['values'] = values.tolist()
-    else:
-        depth_data['indices_y'] = []
-        depth_data['indices_x'] = []
-        depth_data['values'] = []
-    
-    return depth_data
-
-def reconstruct_depth_map(depth_data):
-    """Reconstruct depth map from compressed data"""
-    shape = tuple(depth_data['shape'])
-    disparity = np.zeros(shape, dtype=np.float32)
-    
-    if len(depth_data['values']) > 0:
-        indices_y = np.array(depth_data['indices_y'])
-        indices_x = np.array(depth_data['indices_x'])
-        values = np.array(depth_data['values'])
-        
-        disparity[indices_y, indices_x] = values
-    
-    return disparity
+    """Compress depth data for JSON storage (compact binary format, see depth_codec)"""
+    return encode_depth_data(disparity)
 
 def sign_data_eip191(data_dict, private_key):
     """Sign data using EIP-191 signature"""
@@ -198,16 +162,13 @@ def save_depth_capture(imgL, other_views, disparity, timestamp):
     print("import json")
     print("import numpy as np")
     print("import cv2")
-    print("import base64")
+    print("from depth_codec import reconstruct_depth_map")
     print("")
     print(f"with open('{filename}', 'r') as f:")
     print("    data = json.load(f)")
     print("")
     print("# Reconstruct depth map")
-    print("depth_data = data['data']['depthData']")
-    print("shape = tuple(depth_data['shape'])")
-    print("disparity = np.zeros(shape, dtype=np.float32)")
-    print("disparity[depth_data['indices_y'], depth_data['indices_x']] = depth_data['values']")
+    print("disparity = reconstruct_depth_map(data['data']['depthData'])")
     print("")
     print("# Visualize")
     print("mask = disparity > 0")
@@ -230,9 +191,7 @@ def run_five_view():
     
     # Load calibration
     print("Loading calibration...")
-    data = np.load(PARAM_FILE)
-    mapL1, mapL2 = data['mapL1'], data['mapL2']
-    mapR1, mapR2 = data['mapR1'], data['mapR2']
+    mapL1, mapL2, mapR1, mapR2 = load_rectification_maps(PARAM_FILE)
     print("✓ Calibration loaded")
     
     # Setup cameras
@@ -263,19 +222,8 @@ def run_five_view():
     min_disp = 0
     num_disp = 96
     
-    stereo = cv2.StereoSGBM_create(
-        minDisparity=min_disp,
-        numDisparities=num_disp,
-        blockSize=window_size,
-        P1=8 * 3 * window_size**2,
-        P2=32 * 3 * window_size**2,
-        disp12MaxDiff=1,
-        uniquenessRatio=10,
-        speckleWindowSize=100,
-        speckleRange=32,
-        preFilterCap=63,
-        mode=cv2.STEREO_SGBM_MODE_SGBM_3WAY
-    )
+    stereo = create_matcher(os.getenv('MATCHER_BACKEND') or load_matcher_choice(),
+                            num_disp, window_size, min_disp)
     
     print("\n" + "="*70)
     print("STEREO DEPTH SYSTEM - 5 VIEW DISPLAY")
@@ -1,17 +1,36 @@
+import time
+
+# Taken before the heavy imports so time-to-first-frame includes them
+START_TIME = time.monotonic()
+
 import numpy as np
 import cv2
 import os
 import platform
 from collections import deque
-import time
+from concurrent.futures import ThreadPoolExecutor
 import json
-import base64
-import requests
-from eth_account import Account
-from eth_account.messages import encode_defunct
 from dotenv import load_dotenv
+from calibration_store import DEFAULT_CACHE_ROOT, load_rectification_maps
+from capture_signing import SIGNING_MODE_MANIFEST, CaptureSigner, build_manifest, get_device_address, get_signer
+from depth_codec import encode_depth_data
+from stereo_capture import StereoGrabber
+from stereo_matchers import MATCHER_PROFILE_FILE, create_matcher, load_matcher_choice
+from stereo_pipeline import FramePacket, Pipeline
+from stereo_recording import REPLAY_REALTIME, ReplayGrabber, StereoRecorder
+from temporal_depth import TemporalDepth
+from tiled_matcher import EXACT_BACKENDS, TILING_APPROXIMATE, TILING_EXACT, TiledMatcher, band_overlap, tiling_supported
+from quality_governor import QualityGovernor, build_tiers
+from view_graph import ViewGraph
+from frame_pool import FRAME_POOL
+from capture_commit import CommitWorker, StatusOverlay
+from capture_metrics import METRICS, MetricsExporter
+from capture_artifact import BASE_IMAGE_CID, BASE_IMAGE_EMBED, DEFAULT_JPEG_QUALITY, JpegImage
+from capture_outbox import CaptureOutbox, OutboxFlusher, STATE_ENCODED, STATE_SIGNED, STATE_UPLOADED, STATE_REGISTERED
 
-# Load environment variables
+# Load environment variables (configuration below reads them at import).
+# requests and eth_account add over a second to startup on a Pi and are only
+# needed once a capture is committed, so they are imported where they're used.
 load_dotenv()
 
 # Detect operating system
@@ -34,102 +53,336 @@ else:
     RIGHT_PATH = int(os.getenv('RIGHT_CAMERA_INDEX', '1'))
 
 PARAM_FILE = 'stereo_params.npz'
+# Rectification maps are cached in calibration_cache/ under this directory
+CALIBRATION_CACHE_DIR = os.getenv('CALIBRATION_CACHE_DIR', DEFAULT_CACHE_ROOT)
 WIDTH = 640
 HEIGHT = 480
 FPS = 15
 
+# Stereo matcher configuration (full resolution)
+WINDOW_SIZE = 9
+MIN_DISP = 0
+NUM_DISP = 96
+
+# Matcher backend (see stereo_matchers.py); unset uses this device's auto-tuned choice
+MATCHER_BACKEND = os.getenv('MATCHER_BACKEND') or load_matcher_choice(MATCHER_PROFILE_FILE)
+
+# Live preview computes disparity at this fraction of full resolution
+PREVIEW_SCALE = float(os.getenv('PREVIEW_SCALE', '0.5'))
+
+# Display refresh rate cap; views are only rendered this often
+DISPLAY_FPS = float(os.getenv('DISPLAY_FPS', '15'))
+
+# How long the display may reuse the edge-based depth effect view (seconds)
+FAKE_DEPTH_MAX_AGE = float(os.getenv('FAKE_DEPTH_MAX_AGE', '0.5'))
+
+# Match this many overlapping horizontal bands in parallel (1 = single compute call)
+MATCHER_WORKERS = int(os.getenv('MATCHER_WORKERS', '1'))
+
+# Which backends MATCHER_WORKERS applies to: 'exact' tiles only backends whose
+# banded output is bit identical (StereoBM); 'approximate' also tiles SGBM,
+# which changes a few percent of pixels near the band seams (see tiled_matcher.py)
+MATCHER_TILING = os.getenv('MATCHER_TILING', TILING_EXACT)
+
+# Mono matching: rectify the right camera and run the matcher in grayscale
+# (only the left color image is kept for display and evidence)
+MONO_MATCHING = os.getenv('MONO_MATCHING', '0') == '1'
+
+# Temporal mode: skip or band-limit disparity recomputation while the scene is static
+TEMPORAL_DEPTH = os.getenv('TEMPORAL_DEPTH', '0') == '1'
+TEMPORAL_MOTION_THRESHOLD = float(os.getenv('TEMPORAL_MOTION_THRESHOLD', '4.0'))
+TEMPORAL_MAX_AGE = float(os.getenv('TEMPORAL_MAX_AGE', '2.0'))
+# Weight of the previous disparity when periodic refreshes smooth static rows (0 = off)
+TEMPORAL_BLEND = float(os.getenv('TEMPORAL_BLEND', '0.0'))
+
+# Adaptive quality: step preview quality down/up to hold this FPS (0 disables)
+TARGET_FPS = float(os.getenv('TARGET_FPS', '0'))
+GOVERNOR_TEMP_LIMIT = float(os.getenv('GOVERNOR_TEMP_LIMIT', '75'))
+
+# Replay a recorded session (see stereo_recording.py) instead of opening the cameras
+REPLAY_DIR = os.getenv('REPLAY_DIR')
+REPLAY_SPEED = os.getenv('REPLAY_SPEED', REPLAY_REALTIME)
+REPLAY_LOOP = os.getenv('REPLAY_LOOP', '0') == '1'
+
+# Record the raw synchronized pairs of a live session to this directory
+RECORD_DIR = os.getenv('RECORD_DIR')
+
+# Maximum allowed timestamp difference between paired left/right frames
+MAX_PAIR_SKEW_MS = float(os.getenv('MAX_PAIR_SKEW_MS', '30'))
+
+# At startup, camera frames returned faster than this (ms) were queued before
+# reading started and are discarded (default: a quarter of the frame interval)
+FRESH_GRAB_MS = float(os.getenv('FRESH_GRAB_MS', str(250.0 / FPS)))
+
+# Number of captures signed/uploaded/registered concurrently in the background
+MAX_COMMITS_IN_FLIGHT = int(os.getenv('MAX_COMMITS_IN_FLIGHT', '2'))
+
+# JPEG quality of captured images; each is encoded once and shared by the
+# saved file, the signed payload and the upload
+CAPTURE_JPEG_QUALITY = int(os.getenv('CAPTURE_JPEG_QUALITY', str(DEFAULT_JPEG_QUALITY)))
+
+# 'embed' puts the left image in the metadata as base64 'baseImage'; 'cid'
+# references it by locally computed IPFS CID and SHA-256 instead (the image
+# itself is only uploaded once, as its own file)
+BASE_IMAGE_MODE = os.getenv('BASE_IMAGE_MODE', BASE_IMAGE_EMBED)
+
+# 'manifest' signs per-blob digests, 'full' signs the whole canonical JSON (legacy)
+SIGNING_MODE = os.getenv('SIGNING_MODE', SIGNING_MODE_MANIFEST)
+
+# Stage latency histograms and counters are exported here ('' disables export)
+METRICS_DIR = os.getenv('METRICS_DIR', 'metrics')
+METRICS_EXPORT_INTERVAL = float(os.getenv('METRICS_EXPORT_INTERVAL', '15'))
+
+# Hardcoded IPFS service URL
+IPFS_SERVICE_URL = 'https://deepsharebackend-739298578243.us-central1.run.app'
+
+# Durable outbox for captures that could not be uploaded/registered yet
+OUTBOX_DIR = os.getenv('OUTBOX_DIR', 'outbox')
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '5'))
+OUTBOX_RETRY_BASE_DELAY = float(os.getenv('OUTBOX_RETRY_BASE_DELAY', '10'))
+OUTBOX_RETRY_MAX_DELAY = float(os.getenv('OUTBOX_RETRY_MAX_DELAY', '3600'))
+
 def compute_stereo_depth(imgL, imgR, stereo):
     """Compute depth map using SGBM"""
-    disparity = stereo.compute(imgL, imgR).astype(np.float32) / 16.0
-    return disparity
+    raw = stereo.compute(imgL, imgR)
+    # Fixed-point to pixels in one pass, into a pooled buffer
+    disparity = FRAME_POOL.acquire('disparity', raw.shape, np.float32)
+    return np.multiply(raw, 1.0 / 16.0, out=disparity, dtype=np.float32)
 
 def visualize_depth(disparity, min_disp=0, num_disp=96):
     """Create depth visualization"""
-    mask = (disparity > min_disp) & (disparity < num_disp)
-    disp_vis = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    shape = (HEIGHT, WIDTH)
+    mask = FRAME_POOL.acquire('depth_mask', shape, np.bool_)
+    in_range = FRAME_POOL.acquire('depth_in_range', shape, np.bool_)
+    np.greater(disparity, min_disp, out=mask)
+    np.less(disparity, num_disp, out=in_range)
+    np.logical_and(mask, in_range, out=mask)
+    
+    disp_vis = FRAME_POOL.acquire('depth_color', shape + (3,), np.uint8)
     
     if mask.any():
-        valid_disp = disparity[mask]
-        min_val = valid_disp.min()
-        max_val = valid_disp.max()
+        min_val = np.min(disparity, where=mask, initial=np.inf)
+        max_val = np.max(disparity, where=mask, initial=-np.inf)
         
-        normalized = (valid_disp - min_val) / (max_val - min_val + 1e-5) * 255
+        # Normalize every pixel in place, then zero the invalid ones
+        normalized = FRAME_POOL.acquire('depth_normalized', shape, np.float32)
+        np.subtract(disparity, min_val, out=normalized)
+        np.divide(normalized, max_val - min_val + 1e-5, out=normalized)
+        np.multiply(normalized, 255, out=normalized)
+        np.multiply(normalized, mask, out=normalized)
         
-        disp_vis_gray = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
-        disp_vis_gray[mask] = normalized.astype(np.uint8)
+        disp_vis_gray = FRAME_POOL.acquire('depth_gray', shape, np.uint8)
+        np.copyto(disp_vis_gray, normalized, casting='unsafe')
         
-        disp_vis_gray = cv2.medianBlur(disp_vis_gray, 5)
-        disp_vis = cv2.applyColorMap(disp_vis_gray, cv2.COLORMAP_JET)
-        disp_vis[~mask] = 0
+        blurred = FRAME_POOL.acquire('depth_gray_blurred', shape, np.uint8)
+        cv2.medianBlur(disp_vis_gray, 5, dst=blurred)
+        cv2.applyColorMap(blurred, cv2.COLORMAP_JET, dst=disp_vis)
+        np.multiply(disp_vis, mask[..., np.newaxis], out=disp_vis)
+    else:
+        disp_vis.fill(0)
     
     return disp_vis
 
 def create_depth_overlay_blend(original, depth_color, blend_strength=0.6):
     """Blend depth map with original image"""
-    overlay = cv2.addWeighted(original, 1.0 - blend_strength, depth_color, blend_strength, 0)
-    return overlay
+    overlay = FRAME_POOL.acquire('depth_enhanced', original.shape, np.uint8)
+    return cv2.addWeighted(original, 1.0 - blend_strength, depth_color, blend_strength, 0, dst=overlay)
 
 def fake_depth_effect(frame):
     """Visual effects depth for comparison"""
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 50, 150)
-    dist = cv2.distanceTransform(255 - edges, cv2.DIST_L2, 5)
-    dist = cv2.normalize(dist, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
-    dist = cv2.GaussianBlur(dist, (21, 21), 0)
-    fake_depth = cv2.applyColorMap(dist, cv2.COLORMAP_JET)
-    overlay = cv2.addWeighted(frame, 0.4, fake_depth, 0.6, 0)
-    return overlay
+    shape = frame.shape[:2]
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=FRAME_POOL.acquire('fake_gray', shape))
+    edges = cv2.Canny(gray, 50, 150, edges=FRAME_POOL.acquire('fake_edges', shape))
+    cv2.bitwise_not(edges, dst=edges)
+    dist = cv2.distanceTransform(edges, cv2.DIST_L2, 5, dst=FRAME_POOL.acquire('fake_dist', shape, np.float32))
+    dist = cv2.normalize(dist, gray, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+    dist = cv2.GaussianBlur(dist, (21, 21), 0, dst=edges)
+    fake_depth = cv2.applyColorMap(dist, cv2.COLORMAP_JET, dst=FRAME_POOL.acquire('fake_color', frame.shape))
+    overlay = FRAME_POOL.acquire('depth_overlay', frame.shape)
+    return cv2.addWeighted(frame, 0.4, fake_depth, 0.6, 0, dst=overlay)
 
-def image_to_base64(image):
-    """Convert OpenCV image to base64 string"""
-    _, buffer = cv2.imencode('.jpg', image)
-    return base64.b64encode(buffer).decode('utf-8')
+def rectify_pair(packet, mapL1, mapL2, mapR1, mapR2, swap_cameras=False):
+    """Pipeline stage: rectify the raw stereo pair"""
+    if swap_cameras:
+        imgL_raw, imgR_raw = packet.frameR, packet.frameL
+    else:
+        imgL_raw, imgR_raw = packet.frameL, packet.frameR
+    
+    shape = mapL1.shape[:2] + imgL_raw.shape[2:]
+    packet.imgL = cv2.remap(imgL_raw, mapL1, mapL2, cv2.INTER_LINEAR,
+                            dst=FRAME_POOL.acquire('rectified_left', shape))
+    if MONO_MATCHING:
+        # Convert before remapping so only one channel is interpolated
+        imgR_raw = cv2.cvtColor(imgR_raw, cv2.COLOR_BGR2GRAY,
+                                dst=FRAME_POOL.acquire('gray_right', imgR_raw.shape[:2]))
+        shape = mapR1.shape[:2]
+    packet.imgR = cv2.remap(imgR_raw, mapR1, mapR2, cv2.INTER_LINEAR,
+                            dst=FRAME_POOL.acquire('rectified_right', shape))
+    return packet
 
-def compress_depth_data(disparity):
-    """Compress depth data for JSON storage"""
-    valid_mask = disparity > 0
+def matching_pair(imgL, imgR):
+    """Images to feed the matcher: the left image is converted to grayscale when the right one is"""
+    if imgR.ndim == 2 and imgL.ndim == 3:
+        imgL = cv2.cvtColor(imgL, cv2.COLOR_BGR2GRAY, dst=FRAME_POOL.acquire('gray_left', imgL.shape[:2]))
+    return imgL, imgR
+
+def create_stereo_matcher(num_disp=NUM_DISP, window_size=WINDOW_SIZE, min_disp=MIN_DISP, backend=None):
+    """Create the stereo matcher for the configured (or auto-tuned) backend"""
+    backend = backend or MATCHER_BACKEND
+    channels = 1 if MONO_MATCHING else 3
+    factory = lambda: create_matcher(backend, num_disp, window_size, min_disp, channels)
+    if MATCHER_WORKERS > 1 and tiling_supported(backend, MATCHER_TILING):
+        return TiledMatcher(factory, MATCHER_WORKERS, band_overlap(backend))
+    return factory()
+
+def scaled_matcher_params(scale, num_disp=NUM_DISP, window_size=WINDOW_SIZE):
+    """numDisparities (multiple of 16) and odd blockSize for a downscaled pair"""
+    scaled_num_disp = max(16, int(round(num_disp * scale / 16.0)) * 16)
+    scaled_window_size = max(3, int(window_size * scale) | 1)
+    return scaled_num_disp, scaled_window_size
+
+def compute_preview_depth(imgL, imgR, stereo, scale):
+    """Compute disparity on a downscaled pair, returned at full size in full-res pixel units"""
+    if scale >= 1.0:
+        return compute_stereo_depth(imgL, imgR, stereo)
     
-    depth_data = {
-        'shape': list(disparity.shape),
-        'dtype': str(disparity.dtype),
-        'min': float(np.min(disparity)),
-        'max': float(np.max(disparity)),
-        'mean': float(np.mean(disparity)),
-        'std': float(np.std(disparity)),
-        'valid_pixels': int(np.sum(valid_mask))
-    }
+    height, width = imgL.shape[:2]
+    small_size = (int(round(width * scale)), int(round(height * scale)))
+    small_shape = (small_size[1], small_size[0]) + imgL.shape[2:]
+    smallL = cv2.resize(imgL, small_size, dst=FRAME_POOL.acquire('preview_left', small_shape),
+                        interpolation=cv2.INTER_AREA)
+    smallR = cv2.resize(imgR, small_size, dst=FRAME_POOL.acquire('preview_right', small_shape),
+                        interpolation=cv2.INTER_AREA)
+    disparity = compute_stereo_depth(smallL, smallR, stereo)
     
-    # Store only non-zero values with their indices for efficiency
-    if valid_mask.any():
-        indices = np.where(valid_mask)
-        values = disparity[valid_mask]
-        
-        # Convert to lists for JSON serialization
-        depth_data['indices_y'] = indices[0].tolist()
-        depth_data['indices_x'] = indices[1].tolist()
-        depth_data['values'] = values.tolist()
+    # Nearest-neighbour keeps invalid (negative) pixels invalid after upscaling
+    upscaled = FRAME_POOL.acquire('preview_disparity', (height, width), np.float32)
+    cv2.resize(disparity, (width, height), dst=upscaled, interpolation=cv2.INTER_NEAREST)
+    return np.multiply(upscaled, 1.0 / scale, out=upscaled)
+
+def compute_packet_depth(packet, stereo, scale=1.0, temporal=None):
+    """Pipeline stage: compute (preview) disparity for a rectified pair, reusing static regions if temporal is set"""
+    imgL, imgR = matching_pair(packet.imgL, packet.imgR)
+    if temporal is not None:
+        packet.disparity, _ = temporal.update(imgL, imgR)
     else:
-        depth_data['indices_y'] = []
-        depth_data['indices_x'] = []
-        depth_data['values'] = []
+        packet.disparity = compute_preview_depth(imgL, imgR, stereo, scale)
+    return packet
+
+def draw_view(canvas, top, left, image, labels):
+    """Copy an image into a region of a composite and draw (text, position, scale, color) labels on it"""
+    height, width = image.shape[:2]
+    region = canvas[top:top + height, left:left + width]
+    if image.ndim == 2:
+        # Grayscale right camera in mono matching mode
+        cv2.cvtColor(image, cv2.COLOR_GRAY2BGR, dst=region)
+    else:
+        np.copyto(region, image)
+    for text, position, scale, color in labels:
+        cv2.putText(region, text, position, cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+
+def compose_views(key, canvas_shape, layout, views):
+    """
+    Draw labelled views straight into a pooled composite
     
-    return depth_data
+    Args:
+        key: Pool key of the composite
+        canvas_shape: (height, width, 3) of the composite
+        layout: Dict of view name -> (top, left) position
+        views: Dict of view name -> (image, labels)
+    """
+    canvas = FRAME_POOL.acquire(key, canvas_shape)
+    for name, (top, left) in layout.items():
+        image, labels = views[name]
+        draw_view(canvas, top, left, image, labels)
+    return canvas
 
-def sign_data_eip191(data_dict, private_key):
-    """Sign data using EIP-191 signature"""
-    # Convert data to deterministic JSON string
-    data_str = json.dumps(data_dict, sort_keys=True, separators=(',', ':'))
+def compose_five_view(views):
+    """Create layout: 3 views on top, 2 views on bottom"""
+    # Top row: Left | Right | Depth Map
+    # Bottom row: Depth-Enhanced | Depth Overlay (centered; the zeroed padding is never drawn over)
+    return compose_views('five_view', (HEIGHT * 2, WIDTH * 3, 3), {
+        'view1': (0, 0),
+        'view2': (0, WIDTH),
+        'view3': (0, WIDTH * 2),
+        'view4': (HEIGHT, WIDTH // 2),
+        'view5': (HEIGHT, WIDTH // 2 + WIDTH)
+    }, views)
+
+def compose_other_views(views):
+    """Composite of all views except the left camera (stored as depthImage)"""
+    return compose_views('other_views', (HEIGHT * 2, WIDTH * 2, 3), {
+        'view2': (0, 0),
+        'view3': (0, WIDTH),
+        'view4': (HEIGHT, 0),
+        'view5': (HEIGHT, WIDTH)
+    }, views)
+
+def fps_label_color(avg_fps):
+    return (0, 255, 0) if avg_fps > 10 else (0, 165, 255) if avg_fps > 5 else (0, 0, 255)
+
+def build_view_graph(min_disp=MIN_DISP, num_disp=NUM_DISP):
+    """
+    Declare the display/evidence views as a lazy graph
+    
+    Per-frame params: 'blend_strength' and 'fps'.
+    """
+    graph = ViewGraph()
     
-    # Create Ethereum account from private key
-    account = Account.from_key(private_key)
+    # Visualizations
+    graph.add('depth_color', lambda packet, params: visualize_depth(packet.disparity, min_disp, num_disp))
+    graph.add('depth_enhanced', lambda packet, params, depth_color:
+              create_depth_overlay_blend(packet.imgL, depth_color, params['blend_strength']),
+              deps=['depth_color'])
+    # Edge-based effect is the costliest filter; the display may reuse a recent one
+    graph.add('depth_overlay', lambda packet, params: fake_depth_effect(packet.imgL),
+              max_age=FAKE_DEPTH_MAX_AGE)
     
-    # Encode message with EIP-191
-    message = encode_defunct(text=data_str)
+    # View labels: (text, position, scale, color)
+    def view_labels(packet, params, depth_color, depth_enhanced, depth_overlay):
+        return {
+            # View 1: Left Camera
+            'view1': (packet.imgL, [("Left Camera", (10, 30), 0.7, (0, 255, 0))]),
+            # View 2: Right Camera
+            'view2': (packet.imgR, [("Right Camera", (10, 30), 0.7, (0, 255, 0))]),
+            # View 3: Stereo Depth Map
+            'view3': (depth_color, [
+                ("Stereo Depth Map", (10, 30), 0.7, (255, 255, 255)),
+                (f"FPS: {params['fps']:.1f}", (10, 460), 0.6, fps_label_color(params['fps']))]),
+            # View 4: Depth-Enhanced View
+            'view4': (depth_enhanced, [
+                ("Depth-Enhanced View", (10, 30), 0.7, (0, 255, 0)),
+                (f"Blend: {int(params['blend_strength']*100)}%", (10, 460), 0.6, (255, 255, 255))]),
+            # View 5: Depth Overlay Visualization
+            'view5': (depth_overlay, [("Depth Visualization", (10, 30), 0.7, (0, 255, 0))])
+        }
     
-    # Sign
-    signed_message = account.sign_message(message)
+    # Composites: on-screen display and capture evidence. Views are drawn
+    # straight into the composite instead of being labelled on copies first.
+    graph.add('five_view', lambda packet, params, *visuals: compose_five_view(view_labels(packet, params, *visuals)),
+              deps=['depth_color', 'depth_enhanced', 'depth_overlay'])
+    graph.add('other_views', lambda packet, params, *visuals: compose_other_views(view_labels(packet, params, *visuals)),
+              deps=['depth_color', 'depth_enhanced', 'depth_overlay'])
     
-    return signed_message.signature.hex()
+    return graph
+
+def render_five_view(packet, graph, blend_strength, avg_fps):
+    """Pipeline stage: attach the lazy views and build the display composite"""
+    packet.views = graph.evaluate(packet, {'blend_strength': blend_strength, 'fps': avg_fps})
+    packet.five_view = packet.views.get('five_view', allow_stale=True)
+    return packet
+
+def image_to_base64(image):
+    """Convert OpenCV image to base64 string"""
+    return JpegImage.encode(image, CAPTURE_JPEG_QUALITY).to_base64()
+
+def compress_depth_data(disparity):
+    """Compress depth data for JSON storage (compact binary format, see depth_codec)"""
+    return encode_depth_data(disparity)
+
+def sign_data_eip191(data_dict, private_key):
+    """Sign data using EIP-191 signature (derives the key; the capture path uses get_signer())"""
+    return CaptureSigner(private_key).sign(data_dict)
 
 def save_depth_data(disparity, timestamp):
     """Save depth map data in compressed format"""
@@ -176,38 +429,50 @@ def save_depth_data(disparity, timestamp):
     
     return depth_file, json_file
 
-def show_popup_message(display_frame, message, duration=3, color=(0, 255, 0)):
-    """Display a popup message on the OpenCV window"""
-    overlay = display_frame.copy()
+def render_popup_messages(display_frame, messages, full_screen=True):
+    """
+    Draw popup messages over a copy of the display frame
     
-    # Create semi-transparent overlay
-    cv2.rectangle(overlay, (0, 0), (overlay.shape[1], overlay.shape[0]), (0, 0, 0), -1)
-    overlay = cv2.addWeighted(overlay, 0.7, display_frame, 0.3, 0)
+    Args:
+        display_frame: Frame to draw on (not modified)
+        messages: List of (message, color) tuples, drawn top to bottom
+        full_screen: Darken the whole frame; otherwise only the text band
+    """
+    overlay = display_frame.copy()
     
     # Calculate text size and position (centered)
     font = cv2.FONT_HERSHEY_SIMPLEX
     font_scale = 0.7
     thickness = 2
     
-    # Split message into lines and handle long CID strings
-    lines = message.split('\n')
+    # Split messages into lines and handle long CID strings
     # Break long lines (like CID) into multiple lines if needed
     max_chars_per_line = 50
     processed_lines = []
-    for line in lines:
-        if len(line) > max_chars_per_line:
-            # Break long line into chunks
-            for i in range(0, len(line), max_chars_per_line):
-                processed_lines.append(line[i:i+max_chars_per_line])
-        else:
-            processed_lines.append(line)
+    for message, color in messages:
+        for line in message.split('\n'):
+            if len(line) > max_chars_per_line:
+                # Break long line into chunks
+                for i in range(0, len(line), max_chars_per_line):
+                    processed_lines.append((line[i:i+max_chars_per_line], color))
+            else:
+                processed_lines.append((line, color))
     
     text_height = 35
     total_height = len(processed_lines) * text_height
     start_y = (overlay.shape[0] - total_height) // 2
     
+    # Create semi-transparent overlay
+    if full_screen:
+        top, bottom = 0, overlay.shape[0]
+    else:
+        top = max(0, start_y - text_height // 2)
+        bottom = min(overlay.shape[0], start_y + total_height + text_height // 2)
+    cv2.rectangle(overlay, (0, top), (overlay.shape[1], bottom), (0, 0, 0), -1)
+    overlay = cv2.addWeighted(overlay, 0.7, display_frame, 0.3, 0)
+    
     # Draw each line
-    for i, line in enumerate(processed_lines):
+    for i, (line, color) in enumerate(processed_lines):
         text_size = cv2.getTextSize(line, font, font_scale, thickness)[0]
         text_x = (overlay.shape[1] - text_size[0]) // 2
         text_y = start_y + (i + 1) * text_height
@@ -216,61 +481,101 @@ def show_popup_message(display_frame, message, duration=3, color=(0, 255, 0)):
         cv2.putText(overlay, line, (text_x + 2, text_y + 2), font, font_scale, (0, 0, 0), thickness + 1)
         cv2.putText(overlay, line, (text_x, text_y), font, font_scale, color, thickness)
     
+    return overlay
+
+def show_popup_message(display_frame, message, duration=3, color=(0, 255, 0)):
+    """Display a popup message on the OpenCV window (blocks for duration)"""
+    overlay = render_popup_messages(display_frame, [(message, color)])
     cv2.imshow('Stereo Depth System - 5 View', overlay)
     cv2.waitKey(int(duration * 1000))
 
-def create_signed_payload(imgL, other_views, disparity, timestamp):
-    """Create signed payload using existing logic"""
-    private_key = os.getenv('PRIVATE_KEY')
-    
-    if not private_key:
-        print("⚠ WARNING: PRIVATE_KEY not found in environment!")
-        print("  Capture will not be signed.")
-        signature = "UNSIGNED_NO_PRIVATE_KEY"
-    else:
-        if not private_key.startswith('0x'):
-            private_key = '0x' + private_key
-    
-    # Convert images to base64
-    print("Encoding images to base64...")
-    base_image_b64 = image_to_base64(imgL)
-    depth_image_b64 = image_to_base64(other_views)
+def build_capture_data(base_jpeg, views_jpeg, disparity, timestamp):
+    """
+    Build the unsigned data object of a capture
     
+    Args:
+        base_jpeg: JpegImage of the left camera image
+        views_jpeg: JpegImage of the other views composite
+        disparity: Full-resolution disparity map
+        timestamp: Capture timestamp
+    """
     # Compress depth data
     print("Compressing depth data...")
     depth_data = compress_depth_data(disparity)
     
-    # Create data object
+    # Create data object (images are the already-encoded JPEG bytes)
     data_obj = {
         'timestamp': timestamp,
-        'baseImage': base_image_b64,
-        'depthImage': depth_image_b64,
+        'depthImage': views_jpeg.to_base64(),
         'depthData': depth_data
     }
-    
-    # Sign the data
-    if private_key:
-        print("Signing data with EIP-191...")
-        try:
-            signature = sign_data_eip191(data_obj, private_key)
-            signer_address = Account.from_key(private_key).address
-            print(f"✓ Signed by: {signer_address}")
-            print(f"✓ Signature: {signature[:20]}...{signature[-20:]}")
-        except Exception as e:
-            print(f"⚠ Signature failed: {e}")
-            import traceback
-            traceback.print_exc()
-            signature = f"SIGNATURE_ERROR_{e}"
+    base_image_cid = base_jpeg.cid() if BASE_IMAGE_MODE == BASE_IMAGE_CID else None
+    if base_image_cid:
+        # Reference the separately uploaded image; the signature covers its digest
+        data_obj['baseImageCid'] = base_image_cid
+        data_obj['baseImageSha256'] = base_jpeg.sha256()
     else:
-        signature = "UNSIGNED_NO_PRIVATE_KEY"
+        data_obj['baseImage'] = base_jpeg.to_base64()
+    return data_obj
+
+def sign_capture_data(data_objs):
+    """
+    Sign capture data objects in one pass with the device signer
+    
+    Returns:
+        List of payloads ({'data', 'signature'} plus 'manifest'), in order
+    """
+    manifests = [None] * len(data_objs)
+    try:
+        signer = get_signer()
+        if signer is None:
+            print("⚠ WARNING: PRIVATE_KEY not found in environment!")
+            print("  Capture will not be signed.")
+            signatures = ["UNSIGNED_NO_PRIVATE_KEY"] * len(data_objs)
+        elif SIGNING_MODE == SIGNING_MODE_MANIFEST:
+            # Sign a manifest of blob digests so cost doesn't grow with payload size
+            print(f"Signing {len(data_objs)} digest manifest(s) with EIP-191...")
+            for data_obj in data_objs:
+                data_obj['device'] = signer.address
+            manifests = [build_manifest(data_obj) for data_obj in data_objs]
+            signatures = [signer.sign(manifest) for manifest in manifests]
+        else:
+            print(f"Signing {len(data_objs)} data object(s) with EIP-191...")
+            signatures = [signer.sign(data_obj) for data_obj in data_objs]
+        if signer is not None:
+            print(f"✓ Signed by: {signer.address}")
+            for signature in signatures:
+                print(f"✓ Signature: {signature[:20]}...{signature[-20:]}")
+    except Exception as e:
+        print(f"⚠ Signature failed: {e}")
+        import traceback
+        traceback.print_exc()
+        signatures = [f"SIGNATURE_ERROR_{e}"] * len(data_objs)
     
     # Create final JSON structure
-    payload = {
-        'data': data_obj,
-        'signature': signature
-    }
+    payloads = []
+    for data_obj, signature, manifest in zip(data_objs, signatures, manifests):
+        payload = {
+            'data': data_obj,
+            'signature': signature
+        }
+        if manifest is not None:
+            payload['manifest'] = manifest
+        payloads.append(payload)
+    return payloads
+
+def create_signed_payload(base_jpeg, views_jpeg, disparity, timestamp):
+    """
+    Create signed payload using existing logic
     
-    return payload
+    Args:
+        base_jpeg: JpegImage of the left camera image
+        views_jpeg: JpegImage of the other views composite
+        disparity: Full-resolution disparity map
+        timestamp: Capture timestamp
+    """
+    data_obj = build_capture_data(base_jpeg, views_jpeg, disparity, timestamp)
+    return sign_capture_data([data_obj])[0]
 
 def print_payload_summary(payload):
     """Print payload summary excluding huge depthData"""
@@ -278,10 +583,15 @@ def print_payload_summary(payload):
     print("PAYLOAD SUMMARY (before upload)")
     print("="*70)
     print(f"Signature: {payload.get('signature', 'N/A')}")
+    if 'manifest' in payload:
+        print(f"Signed Manifest: {', '.join(payload['manifest'].get('blobs', {}))}")
     if 'data' in payload:
         data = payload['data']
         print(f"Timestamp: {data.get('timestamp', 'N/A')}")
-        print(f"Base Image: {len(data.get('baseImage', ''))} chars (base64)")
+        if 'baseImageCid' in data:
+            print(f"Base Image: {data['baseImageCid']} (by reference)")
+        else:
+            print(f"Base Image: {len(data.get('baseImage', ''))} chars (base64)")
         print(f"Depth Image: {len(data.get('depthImage', ''))} chars (base64)")
         if 'depthData' in data:
             depth_data = data['depthData']
@@ -293,26 +603,24 @@ def print_payload_summary(payload):
             print(f"  - Mean: {depth_data.get('mean', 'N/A')}")
             print(f"  - Std Dev: {depth_data.get('std', 'N/A')}")
             print(f"  - Valid Pixels: {depth_data.get('valid_pixels', 'N/A')}")
-            print(f"  - Values Count: {len(depth_data.get('values', []))}")
-            print(f"  - Indices Y Count: {len(depth_data.get('indices_y', []))}")
-            print(f"  - Indices X Count: {len(depth_data.get('indices_x', []))}")
+            print(f"  - Encoding: {depth_data.get('encoding', 'N/A')} v{depth_data.get('version', 'N/A')} ({depth_data.get('compression', 'N/A')})")
+            print(f"  - Encoded Size: {len(depth_data.get('data', ''))} chars (base64)")
             print(f"  - (Full depthData object excluded from print - too large)")
     print("="*70 + "\n")
 
-def upload_to_ipfs_service(imgL, payload, ipfs_service_url, wallet_address):
-    """Upload original image and metadata to IPFS via FastAPI service"""
+def upload_to_ipfs_service(base_jpeg, payload, ipfs_service_url, wallet_address):
+    """Upload original image (JpegImage, sent as-is) and metadata to IPFS via FastAPI service"""
+    import requests
+    
     try:
         # Print payload summary before sending
         print_payload_summary(payload)
         
-        # Encode original image to JPEG bytes
-        print("Encoding original image...")
-        _, img_encoded = cv2.imencode('.jpg', imgL, [cv2.IMWRITE_JPEG_QUALITY, 95])
-        img_bytes = img_encoded.tobytes()
-        
         # Prepare metadata (extract from payload)
         metadata_dict = payload.get('data', {})
         metadata_dict['signature'] = payload.get('signature', '')
+        if 'manifest' in payload:
+            metadata_dict['manifest'] = payload['manifest']
         metadata_json = json.dumps(metadata_dict)
         
         # Upload to IPFS service
@@ -320,7 +628,7 @@ def upload_to_ipfs_service(imgL, payload, ipfs_service_url, wallet_address):
         print(f"📤 Uploading to IPFS via: {upload_url}")
         
         files = {
-            'image': ('original_image.jpg', img_bytes, 'image/jpeg')
+            'image': ('original_image.jpg', base_jpeg.data, 'image/jpeg')
         }
         
         data = {
@@ -336,6 +644,10 @@ def upload_to_ipfs_service(imgL, payload, ipfs_service_url, wallet_address):
             gateway_url = result.get('gateway_url', 'N/A')
             print(f"✅ Upload successful! IPFS CID: {cid}")
             print(f"   Gateway URL: {gateway_url}")
+            referenced_cid = metadata_dict.get('baseImageCid')
+            if referenced_cid and referenced_cid != cid:
+                # Same bytes (baseImageSha256 still verifies), but pinned with a different layout
+                print(f"⚠️ Service pinned the image as {cid}, metadata references {referenced_cid}")
             return True, result, cid
         else:
             print(f"❌ Upload failed with status {response.status_code}: {response.text}")
@@ -351,39 +663,239 @@ def upload_to_ipfs_service(imgL, payload, ipfs_service_url, wallet_address):
         return False, None, None
         return False, None, None
 
-def run_five_view():
-    """Run stereo depth with 5-view output"""
+def get_wallet_address():
+    """Device wallet address (the same one captures are signed and registered with)"""
+    try:
+        return get_device_address() or "UNKNOWN"
+    except Exception:
+        return "UNKNOWN"
+
+def register_capture(image_cid, depth_meta_file, metadata_cid=None):
+    """Register an uploaded capture as IP Asset on Story Protocol"""
+    print(f"\n🔐 Registering as IP Asset on Story Protocol...")
+    # Imported on first use (it pulls in requests); the client keeps its
+    # connection to the Story server open between captures
+    from register_ip_asset import get_story_client
+    
+    registered, result = get_story_client().register(image_cid, depth_meta_file, metadata_cid)
+    if not registered:
+        print(f"⚠️ IP registration skipped or failed: {result}")
+        print(f"   Image is still saved and uploaded to IPFS")
+    return registered
+
+def advance_capture(outbox, capture_id, notify=None, base_jpeg=None, views_jpeg=None, disparity=None):
+    """
+    Move a capture through sign -> upload -> register, journaling each step
+    
+    Resumes from whatever state the outbox recorded, so it serves both the
+    first attempt (JPEG bytes still in memory) and later retries (the saved
+    files are read back byte for byte, never re-encoded).
+    
+    Returns:
+        True once the capture is registered, False if a step failed
+    """
+    if notify is None:
+        notify = lambda message, duration=3, color=(0, 255, 0): None
+    
+    record = outbox.get(capture_id)
+    if base_jpeg is None:
+        base_jpeg = JpegImage.load(record['left_file'])
     
+    if record['state'] == STATE_ENCODED:
+        if views_jpeg is None:
+            views_jpeg = JpegImage.load(record['views_file'])
+        if disparity is None:
+            disparity = np.load(record['depth_file'])['disparity']
+        
+        # Create signed payload using existing logic
+        with METRICS.timer('commit_sign'):
+            payload = create_signed_payload(base_jpeg, views_jpeg, disparity, capture_id)
+            outbox.save_payload(capture_id, payload)
+        record = outbox.get(capture_id)
+    
+    if record['state'] == STATE_SIGNED:
+        payload = outbox.load_payload(capture_id)
+        
+        # Upload to IPFS service
+        print(f"\n📤 Uploading signed payload to IPFS: {IPFS_SERVICE_URL}")
+        with METRICS.timer('commit_upload'):
+            success, result, cid = upload_to_ipfs_service(base_jpeg, payload, IPFS_SERVICE_URL, get_wallet_address())
+        
+        if not (success and cid):
+            METRICS.increment('commit_failures', step='upload')
+            # Display error message
+            error_message = "❌ Upload Failed\n\nWill retry from outbox"
+            notify(error_message, duration=3, color=(0, 0, 255))
+            print(f"⚠️ Upload failed, capture {capture_id} kept in outbox for retry.\n")
+            return False
+        
+        # Extract both CIDs from result
+        image_cid = result.get('cid') if result else cid
+        metadata_cid = result.get('metadata_cid') if result else None
+        outbox.update(capture_id, state=STATE_UPLOADED, image_cid=image_cid, metadata_cid=metadata_cid)
+        record = outbox.get(capture_id)
+        
+        # Display success message with CID
+        success_message = f"✅ Upload Successful!\n\nImage CID:\n{image_cid}"
+        if metadata_cid:
+            success_message += f"\n\nMetadata CID:\n{metadata_cid}"
+        notify(success_message, duration=5, color=(0, 255, 0))
+        print(f"✅ Upload complete! CID stored in Supabase.")
+        print(f"   Image CID: {image_cid}")
+        if metadata_cid:
+            print(f"   Metadata CID: {metadata_cid}\n")
+        else:
+            print(f"   Warning: No metadata CID returned\n")
+    
+    if record['state'] == STATE_UPLOADED:
+        with METRICS.timer('commit_register'):
+            registered = register_capture(record['image_cid'], record['depth_meta_file'], record['metadata_cid'])
+        if not registered:
+            METRICS.increment('commit_failures', step='register')
+            return False
+        outbox.update(capture_id, state=STATE_REGISTERED)
+        METRICS.increment('captures_registered')
+        ip_message = f"✅ IP Asset Registered!\n\nProtected on Story Protocol"
+        notify(ip_message, duration=3, color=(0, 255, 0))
+    
+    return True
+
+def sign_encoded_captures(outbox, records):
+    """Sign every capture in a flusher batch that is still unsigned, in one pass"""
+    capture_ids = [record['capture_id'] for record in records if record['state'] == STATE_ENCODED]
+    if not capture_ids:
+        return
+    
+    data_objs = []
+    for capture_id in capture_ids:
+        record = outbox.get(capture_id)
+        data_objs.append(build_capture_data(JpegImage.load(record['left_file']),
+                                            JpegImage.load(record['views_file']),
+                                            np.load(record['depth_file'])['disparity'],
+                                            capture_id))
+    with METRICS.timer('commit_sign'):
+        payloads = sign_capture_data(data_objs)
+        for capture_id, payload in zip(capture_ids, payloads):
+            outbox.save_payload(capture_id, payload)
+    print(f"📦 Outbox: signed {len(payloads)} queued capture(s)")
+
+def commit_capture(job, notify, outbox):
+    """
+    Save, sign, upload and register one capture (runs on a commit worker)
+    
+    Args:
+        job: Dict with 'timestamp', 'imgL', 'imgR', 'blend_strength' and 'fps',
+            plus 'disparity' and 'views' (FrameViews) when they are already full resolution
+        notify: notify(message, duration, color) posts a status overlay message
+        outbox: CaptureOutbox journaling the commit so failures are retried
+    """
+    imgL = job['imgL']
+    
+    # The capture id (timestamp) names the files and is signed; take one no earlier capture used
+    timestamp = outbox.reserve_id(job['timestamp'])
+    if timestamp != job['timestamp']:
+        print(f"⚠️ Capture id {job['timestamp']} already used (clock stepped back?), using {timestamp}")
+    
+    try:
+        if 'disparity' not in job:
+            # Preview depth was low-res; recompute full-resolution evidence for this frame
+            print("Computing full-resolution depth for capture...")
+            packet = FramePacket(None, None, timestamp)
+            packet.imgL, packet.imgR = imgL, job['imgR']
+            with METRICS.timer('commit_depth'):
+                packet.disparity = compute_stereo_depth(*matching_pair(imgL, job['imgR']), create_stereo_matcher())
+            job['disparity'] = packet.disparity
+            job['views'] = build_view_graph().evaluate(packet, {
+                'blend_strength': job['blend_strength'],
+                'fps': job['fps']
+            })
+        
+        disparity = job['disparity']
+        
+        # Create a composite without the left camera (computed fresh, never reused from another frame)
+        other_views = job['views'].get('other_views')
+        
+        save_start = time.perf_counter()
+        
+        # Encode each image once; the files, payload and upload share these bytes
+        base_jpeg = JpegImage.encode(imgL, CAPTURE_JPEG_QUALITY)
+        views_jpeg = JpegImage.encode(other_views, CAPTURE_JPEG_QUALITY)
+        
+        # Save left image separately
+        left_filename = f'capture_{timestamp}_left.jpg'
+        base_jpeg.save(left_filename)
+        print(f"\n✓ Saved left image: {left_filename}")
+        
+        # Save all other views combined
+        other_filename = f'capture_{timestamp}_views.jpg'
+        views_jpeg.save(other_filename)
+        print(f"✓ Saved other views: {other_filename}")
+        
+        # Save depth data
+        depth_file, json_file = save_depth_data(disparity, timestamp)
+        METRICS.observe('commit_save', time.perf_counter() - save_start)
+        
+        # Journal the capture before any network work so it survives failures and reboots
+        outbox.add(timestamp, left_filename, other_filename, depth_file, json_file)
+    except Exception:
+        # Nothing was journaled; free the id so the next capture can take it
+        outbox.unreserve(timestamp)
+        raise
+    
+    # Show popup message
+    popup_message = "Witness image captured,\nsigning and sending it to\nIPFS"
+    notify(popup_message, duration=3)
+    
+    try:
+        ok = advance_capture(outbox, timestamp, notify, base_jpeg, views_jpeg, disparity)
+    except Exception:
+        METRICS.increment('commit_failures', step='exception')
+        outbox.record_failure(timestamp, 'commit raised', OUTBOX_RETRY_BASE_DELAY, OUTBOX_RETRY_MAX_DELAY)
+        raise
+    
+    if not ok:
+        # Hand the capture to the outbox flusher
+        outbox.record_failure(timestamp, f"{outbox.get(timestamp)['state']} step failed",
+                              OUTBOX_RETRY_BASE_DELAY, OUTBOX_RETRY_MAX_DELAY)
+    return ok
+
+def load_calibration():
+    """Load rectification maps; returns (mapL1, mapL2, mapR1, mapR2) or None"""
     if not os.path.exists(PARAM_FILE):
         print("Error: Calibration file not found!")
         print("Run calibration first: python calibration_script.py")
-        return
+        return None
     
-    # Load calibration
+    # Load fixed-point maps from the calibration cache (memory-mapped)
     print("Loading calibration...")
-    data = np.load(PARAM_FILE)
-    mapL1, mapL2 = data['mapL1'], data['mapL2']
-    mapR1, mapR2 = data['mapR1'], data['mapR2']
+    mapL1, mapL2, mapR1, mapR2 = load_rectification_maps(PARAM_FILE, CALIBRATION_CACHE_DIR)
     print("✓ Calibration loaded")
-    
-    # Setup cameras
+    return mapL1, mapL2, mapR1, mapR2
+
+def open_camera(path):
+    """Open and configure one camera"""
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, WIDTH)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, HEIGHT)
+    cap.set(cv2.CAP_PROP_FPS, FPS)
+    if not IS_WINDOWS:
+        # MJPG codec works better on Linux/Raspberry Pi
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+def open_cameras():
+    """Open and configure both cameras; returns (capL, capR) or (None, None)"""
     print("Opening cameras...")
     if IS_WINDOWS:
         print(f"  Windows detected - using camera indices: Left={LEFT_PATH}, Right={RIGHT_PATH}")
     else:
         print(f"  Linux detected - using device paths: Left={LEFT_PATH}, Right={RIGHT_PATH}")
     
-    capL = cv2.VideoCapture(LEFT_PATH)
-    capR = cv2.VideoCapture(RIGHT_PATH)
-    
-    for cap in [capL, capR]:
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, WIDTH)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, HEIGHT)
-        cap.set(cv2.CAP_PROP_FPS, FPS)
-        if not IS_WINDOWS:
-            # MJPG codec works better on Linux/Raspberry Pi
-            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    # Device open and format negotiation mostly wait on the driver, so both run at once
+    open_start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='camera-open') as pool:
+        capL, capR = pool.map(open_camera, [LEFT_PATH, RIGHT_PATH])
     
     if not capL.isOpened() or not capR.isOpened():
         print("❌ Error: Cannot open cameras!")
@@ -394,33 +906,217 @@ def run_five_view():
             print("  If you only have one camera, you can use the same index for both (for testing).")
         else:
             print("  Check camera device paths in .env file or script configuration.")
+        capL.release()
+        capR.release()
+        return None, None
+    
+    print(f"✓ Cameras opened in {time.monotonic() - open_start:.2f}s")
+    return capL, capR
+
+def start_stereo_source():
+    """
+    Start the stereo frame source: the cameras, or a recorded session if REPLAY_DIR is set
+
+    Returns:
+        (grabber, cameras) where cameras must be released after grabber.stop(),
+        or (None, None) on failure
+    """
+    if REPLAY_DIR:
+        print(f"Replaying recorded session: {REPLAY_DIR} ({REPLAY_SPEED}{', looping' if REPLAY_LOOP else ''})")
+        grabber = ReplayGrabber(REPLAY_DIR, speed=REPLAY_SPEED, loop=REPLAY_LOOP)
+        try:
+            grabber.start()
+        except (IOError, OSError) as e:
+            print(f"❌ {e}")
+            return None, None
+        return grabber, []
+    
+    capL, capR = open_cameras()
+    if capL is None:
+        return None, None
+    
+    # Start one reader thread per camera; each drops frames queued before it started
+    grabber = StereoGrabber(capL, capR, max_skew_ms=MAX_PAIR_SKEW_MS, fresh_grab_ms=FRESH_GRAB_MS)
+    grabber.start()
+    return grabber, [capL, capR]
+
+def report_first_frame(grabber=None):
+    """
+    Print and export the time from startup to the first displayed frame
+    
+    Args:
+        grabber: Frame source in this process, for its startup stale-frame count
+    """
+    elapsed = time.monotonic() - START_TIME
+    METRICS.set_gauge('time_to_first_frame_seconds', elapsed)
+    stale_frames = getattr(grabber, 'stale_frames', None)
+    detail = f" ({stale_frames} stale camera frames discarded)" if stale_frames is not None else ""
+    print(f"⏱️ Time to first frame: {elapsed:.2f}s{detail}")
+
+def start_commit_services(status):
+    """
+    Start the background commit worker and outbox flusher
+    
+    Args:
+        status: Object with post(key, message, duration, color) receiving status updates
+    
+    Returns:
+        (outbox, committer, flusher)
+    """
+    outbox = CaptureOutbox(OUTBOX_DIR)
+    committer = CommitWorker(lambda job, notify: commit_capture(job, notify, outbox),
+                             status, max_in_flight=MAX_COMMITS_IN_FLIGHT)
+    
+    # Retry captures that failed earlier, including ones left over from before a reboot
+    def flush_capture(record):
+        capture_id = record['capture_id']
+        notify = lambda message, duration=3, color=(0, 255, 0): status.post(capture_id, message, duration, color)
+        return advance_capture(outbox, capture_id, notify)
+    
+    flusher = OutboxFlusher(outbox, flush_capture,
+                            batch_size=OUTBOX_BATCH_SIZE,
+                            base_delay=OUTBOX_RETRY_BASE_DELAY,
+                            max_delay=OUTBOX_RETRY_MAX_DELAY,
+                            prepare_func=lambda records: sign_encoded_captures(outbox, records))
+    flusher.start()
+    return outbox, committer, flusher
+
+def start_metrics_exporter(grabber, committer, outbox, pipeline=None):
+    """
+    Periodically export stage histograms and counters to METRICS_DIR
+    
+    Args:
+        grabber: Frame source, or None if it runs in another process
+        committer: CommitWorker, or None if commits run in another process
+        outbox: CaptureOutbox, or None with committer
+        pipeline: Optional Pipeline whose dropped frames are counted
+
+    Returns:
+        MetricsExporter, or None if METRICS_DIR is empty
+    """
+    if not METRICS_DIR:
+        return None
+    
+    def collect():
+        # Mirror counts kept by the capture components
+        if grabber is not None:
+            METRICS.set_counter('dropped_pairs', grabber.dropped_pairs)
+            METRICS.set_counter('camera_read_failures', getattr(grabber.left, 'failed_reads', 0), camera='left')
+            METRICS.set_counter('camera_read_failures', getattr(grabber.right, 'failed_reads', 0), camera='right')
+        if committer is not None:
+            METRICS.set_counter('commit_jobs_completed', committer.completed)
+            METRICS.set_counter('commit_jobs_failed', committer.failed)
+            METRICS.set_gauge('commits_in_flight', committer.in_flight())
+            METRICS.set_gauge('outbox_pending', outbox.pending_count())
+        if pipeline is not None:
+            METRICS.set_counter('dropped_frames', pipeline.dropped_frames)
+    
+    # A separate capture process exports to its own files in the same directory
+    name = 'capture' if committer is None else None
+    exporter = MetricsExporter(METRICS, METRICS_DIR, METRICS_EXPORT_INTERVAL, collect, name=name)
+    exporter.start()
+    print(f"✓ Exporting metrics to {METRICS_DIR}/ every {METRICS_EXPORT_INTERVAL:.0f}s")
+    return exporter
+
+def stop_commit_services(outbox, committer, flusher):
+    """Wait for in-flight commits, then stop the outbox flusher"""
+    if committer.in_flight():
+        print(f"Waiting for {committer.in_flight()} capture commit(s) to finish...")
+    committer.shutdown(wait=True)
+    flusher.stop()
+    pending = outbox.pending_count()
+    if pending:
+        print(f"📦 {pending} capture(s) still pending in outbox, will retry on next start")
+
+def create_depth_stage(min_disp=MIN_DISP, num_disp=NUM_DISP):
+    """
+    Build the preview depth pipeline stage, with the quality governor and
+    temporal reuse when they are enabled
+    
+    Returns:
+        (depth_stage, governor, temporal) where governor and temporal may be None
+    """
+    # Live preview runs SGBM on a downscaled pair; captures recompute at full resolution
+    preview_num_disp, preview_window_size = scaled_matcher_params(PREVIEW_SCALE)
+    print(f"Preview depth: scale {PREVIEW_SCALE:.2f}, {preview_num_disp} disparities, block {preview_window_size}")
+    if MATCHER_WORKERS > 1:
+        if tiling_supported(MATCHER_BACKEND, MATCHER_TILING):
+            exactness = 'exact' if MATCHER_BACKEND in EXACT_BACKENDS else 'approximate'
+            print(f"Tiled matching: {MATCHER_WORKERS} bands in parallel ({exactness})")
+        else:
+            print(f"⚠️ MATCHER_WORKERS ignored: '{MATCHER_BACKEND}' can't be split into bands exactly "
+                  f"(tiled backends: {', '.join(EXACT_BACKENDS)}; set MATCHER_TILING={TILING_APPROXIMATE} "
+                  f"to tile it anyway)")
+    
+    # Preview matcher and scale; replaced by the depth stage when the quality tier changes.
+    # 'evidence': the matcher gives what a capture would recompute (full scale, configured
+    # settings, no temporal reuse), so the preview disparity can be signed as-is
+    depth_state = {
+        'tier': None,
+        'stereo': create_stereo_matcher(preview_num_disp, preview_window_size, min_disp),
+        'scale': PREVIEW_SCALE,
+        'evidence': PREVIEW_SCALE >= 1.0 and not TEMPORAL_DEPTH
+    }
+    
+    governor = None
+    if TARGET_FPS > 0:
+        def on_tier_change(index, tier, reason):
+            METRICS.set_gauge('quality_tier', index)
+            METRICS.increment('quality_tier_changes')
+        
+        tiers = build_tiers(PREVIEW_SCALE, num_disp, WINDOW_SIZE, MATCHER_BACKEND, DISPLAY_FPS)
+        governor = QualityGovernor(tiers, TARGET_FPS, GOVERNOR_TEMP_LIMIT, on_change=on_tier_change)
+        depth_state['tier'] = governor.tier
+        print(f"Quality governor: ON (target {TARGET_FPS:.1f} FPS, CPU limit {GOVERNOR_TEMP_LIMIT:.0f}C, {len(tiers)} tiers)")
+    
+    temporal = None
+    if TEMPORAL_DEPTH:
+        temporal = TemporalDepth(
+            lambda imgL, imgR: compute_preview_depth(imgL, imgR, depth_state['stereo'], depth_state['scale']),
+            motion_threshold=TEMPORAL_MOTION_THRESHOLD,
+            max_age=TEMPORAL_MAX_AGE,
+            blend=TEMPORAL_BLEND
+        )
+        print(f"Temporal depth: ON (threshold {TEMPORAL_MOTION_THRESHOLD}, max age {TEMPORAL_MAX_AGE:.1f}s, blend {TEMPORAL_BLEND:.2f})")
+    
+    def depth_stage(packet):
+        # Matchers aren't thread-safe, so tier changes are applied here on the depth thread
+        if governor is not None and governor.tier is not depth_state['tier']:
+            tier = governor.tier
+            tier_num_disp, tier_window_size = scaled_matcher_params(tier['scale'], tier['num_disp'], tier['window_size'])
+            depth_state['stereo'] = create_stereo_matcher(tier_num_disp, tier_window_size, min_disp, tier['backend'])
+            depth_state['scale'] = tier['scale']
+            depth_state['tier'] = tier
+            depth_state['evidence'] = tier['scale'] >= 1.0 and temporal is None and tier is governor.tiers[0]
+            if temporal is not None:
+                temporal.reset()
+        # Recorded per packet: the governor may change tier before this packet is captured
+        packet.evidence = depth_state['evidence']
+        return compute_packet_depth(packet, depth_state['stereo'], depth_state['scale'], temporal)
+    
+    return depth_stage, governor, temporal
+
+def run_five_view():
+    """Run stereo depth with 5-view output"""
+    
+    calibration = load_calibration()
+    if calibration is None:
         return
+    mapL1, mapL2, mapR1, mapR2 = calibration
     
-    print("✓ Cameras opened")
+    grabber, cameras = start_stereo_source()
+    if grabber is None:
+        return
     
-    # Flush buffers
-    for _ in range(10):
-        capL.read()
-        capR.read()
+    recorder = None
+    if RECORD_DIR:
+        recorder = StereoRecorder(RECORD_DIR, FPS)
+        print(f"Recording raw pairs to {RECORD_DIR}")
     
     # Configure stereo matcher
-    window_size = 9
-    min_disp = 0
-    num_disp = 96
-    
-    stereo = cv2.StereoSGBM_create(
-        minDisparity=min_disp,
-        numDisparities=num_disp,
-        blockSize=window_size,
-        P1=8 * 3 * window_size**2,
-        P2=32 * 3 * window_size**2,
-        disp12MaxDiff=1,
-        uniquenessRatio=10,
-        speckleWindowSize=100,
-        speckleRange=32,
-        preFilterCap=63,
-        mode=cv2.STEREO_SGBM_MODE_SGBM_3WAY
-    )
+    min_disp = MIN_DISP
+    num_disp = NUM_DISP
+    depth_stage, governor, temporal = create_depth_stage(min_disp, num_disp)
     
     print("\n" + "="*70)
     print("STEREO DEPTH SYSTEM - 5 VIEW DISPLAY")
@@ -437,228 +1133,146 @@ def run_five_view():
     print("="*70 + "\n")
     
     fps_times = deque(maxlen=30)
-    blend_strength = 0.6
-    swap_cameras = False
+    settings = {
+        'blend_strength': 0.6,
+        'swap_cameras': False
+    }
     capture_count = 0
+    avg_fps = 0.0
+    last_depth_time = None
+    last_render_time = None
+    view_graph = build_view_graph(min_disp, num_disp)
     
-    while True:
-        start_time = time.time()
-        
-        # Synchronized capture
-        capL.grab()
-        capR.grab()
-        retL, frameL = capL.retrieve()
-        retR, frameR = capR.retrieve()
-        
-        if not retL or not retR:
-            continue
-        
-        # Swap if needed
-        if swap_cameras:
-            imgL_raw, imgR_raw = frameR, frameL
-        else:
-            imgL_raw, imgR_raw = frameL, frameR
-        
-        # Rectify
-        imgL = cv2.remap(imgL_raw, mapL1, mapL2, cv2.INTER_LINEAR)
-        imgR = cv2.remap(imgR_raw, mapR1, mapR2, cv2.INTER_LINEAR)
-        
-        # Compute stereo depth
-        disparity = compute_stereo_depth(imgL, imgR, stereo)
-        
-        # Create visualizations
-        depth_color = visualize_depth(disparity, min_disp, num_disp)
-        depth_enhanced = create_depth_overlay_blend(imgL, depth_color, blend_strength)
-        depth_overlay = fake_depth_effect(imgL)
-        
-        # Calculate FPS
-        fps_times.append(time.time() - start_time)
-        avg_fps = 1.0 / (np.mean(fps_times) + 1e-6)
-        
-        # Add labels to each view
-        fps_color = (0, 255, 0) if avg_fps > 10 else (0, 165, 255) if avg_fps > 5 else (0, 0, 255)
-        
-        # View 1: Left Camera
-        view1 = imgL.copy()
-        cv2.putText(view1, "Left Camera", (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        
-        # View 2: Right Camera
-        view2 = imgR.copy()
-        cv2.putText(view2, "Right Camera", (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        
-        # View 3: Stereo Depth Map
-        view3 = depth_color.copy()
-        cv2.putText(view3, "Stereo Depth Map", (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(view3, f"FPS: {avg_fps:.1f}", (10, 460),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, fps_color, 2)
-        
-        # View 4: Depth-Enhanced View
-        view4 = depth_enhanced.copy()
-        cv2.putText(view4, "Depth-Enhanced View", (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(view4, f"Blend: {int(blend_strength*100)}%", (10, 460),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-        # View 5: Depth Overlay Visualization
-        view5 = depth_overlay.copy()
-        cv2.putText(view5, "Depth Visualization", (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        
-        # Create layout: 3 views on top, 2 views on bottom
-        # Top row: Left | Right | Depth Map
-        top_row = cv2.hconcat([view1, view2, view3])
-        
-        # Bottom row: Depth-Enhanced | Depth Overlay (centered)
-        padding = np.zeros((HEIGHT, WIDTH // 2, 3), dtype=np.uint8)
-        bottom_row = cv2.hconcat([padding, view4, view5, padding])
+    def read_pair():
+        ret, frameL, frameR, timestamp = grabber.read()
+        if not ret:
+            return None
+        if recorder is not None:
+            recorder.write(frameL, frameR, timestamp)
+        return FramePacket(frameL, frameR, timestamp)
+    
+    def render_stage(packet):
+        # Throughput is measured between consecutive depth frames
+        nonlocal avg_fps, last_depth_time, last_render_time
+        now = time.time()
+        if last_depth_time is not None:
+            fps_times.append(now - last_depth_time)
+            avg_fps = 1.0 / (np.mean(fps_times) + 1e-6)
+        last_depth_time = now
         
-        # Combine
-        five_view = cv2.vconcat([top_row, bottom_row])
+        display_fps = DISPLAY_FPS
+        if governor is not None:
+            governor.observe(packet.stage_times)
+            display_fps = governor.tier['display_fps']
         
-        # Show
-        cv2.imshow('Stereo Depth System - 5 View', five_view)
+        # Views are only built as often as the display refreshes
+        if last_render_time is not None and now - last_render_time < 1.0 / display_fps:
+            return None
+        last_render_time = now
+        return render_five_view(packet, view_graph, settings['blend_strength'], avg_fps)
+    
+    # Rectify -> SGBM -> render, each stage on its own thread
+    pipeline = Pipeline(read_pair, [
+        ('rectify', lambda packet: rectify_pair(packet, mapL1, mapL2, mapR1, mapR2, settings['swap_cameras'])),
+        ('depth', depth_stage),
+        ('render', render_stage)
+    ])
+    pipeline.start()
+    if governor is not None:
+        governor.start()
+    
+    # Capture commits run in the background with their status drawn as an overlay
+    status_overlay = StatusOverlay()
+    outbox, committer, flusher = start_commit_services(status_overlay)
+    exporter = start_metrics_exporter(grabber, committer, outbox, pipeline)
+    last_capture_timestamp = 0
+    
+    packet = None
+    
+    while True:
+        # Latest fully processed frame wins so the preview never lags
+        latest = pipeline.get(timeout=0.1)
+        if latest is not None:
+            if packet is None:
+                report_first_frame(grabber)
+            packet = latest
+            display_start = time.perf_counter()
+            statuses = status_overlay.active()
+            if statuses:
+                display = render_popup_messages(packet.five_view, statuses, full_screen=False)
+            else:
+                display = packet.five_view
+            cv2.imshow('Stereo Depth System - 5 View', display)
+            METRICS.observe('display', time.perf_counter() - display_start)
         
         # Handle keys
         key = cv2.waitKey(1) & 0xFF
         if key == 27:  # ESC
             break
             
-        elif key == ord(' '):  # SPACEBAR - Capture
-            timestamp = int(time.time())
-            
-            # Save left image separately
-            left_filename = f'capture_{timestamp}_left.jpg'
-            cv2.imwrite(left_filename, imgL)
-            print(f"\n✓ Saved left image: {left_filename}")
-            
-            # Save all other views combined
-            # Create a composite without the left camera
-            other_views_top = cv2.hconcat([view2, view3])
-            other_views_bottom = cv2.hconcat([view4, view5])
-            other_views = cv2.vconcat([other_views_top, other_views_bottom])
-            
-            other_filename = f'capture_{timestamp}_views.jpg'
-            cv2.imwrite(other_filename, other_views)
-            print(f"✓ Saved other views: {other_filename}")
-            
-            # Save depth data
-            depth_file, json_file = save_depth_data(disparity, timestamp)
+        elif key == ord(' ') and packet is not None:  # SPACEBAR - Capture
+            # Keep timestamps unique so rapid captures don't overwrite each other's files
+            timestamp = max(int(time.time()), last_capture_timestamp + 1)
+            last_capture_timestamp = timestamp
             
-            # Get wallet address from private key
-            private_key = os.getenv('PRIVATE_KEY')
-            if private_key:
-                if not private_key.startswith('0x'):
-                    private_key = '0x' + private_key
-                try:
-                    wallet_address = Account.from_key(private_key).address
-                except:
-                    wallet_address = "UNKNOWN"
-            else:
-                wallet_address = "UNKNOWN"
-            
-            # Show popup message
-            ipfs_service_url = 'https://deepsharebackend-739298578243.us-central1.run.app'  # Hardcoded IPFS service URL
-            popup_message = "Witness image captured,\nsigning and sending it to\nIPFS"
-            show_popup_message(five_view, popup_message, duration=3)
-            
-            # Create signed payload using existing logic
-            print(f"\n📤 Creating signed payload and uploading to IPFS: {ipfs_service_url}")
-            payload = create_signed_payload(imgL, other_views, disparity, timestamp)
-            
-            # Upload to IPFS service
-            success, result, cid = upload_to_ipfs_service(imgL, payload, ipfs_service_url, wallet_address)
-            
-            if success and cid:
-                # Extract both CIDs from result
-                image_cid = result.get('cid') if result else cid
-                metadata_cid = result.get('metadata_cid') if result else None
-                
-                # Display success message with CID
-                success_message = f"✅ Upload Successful!\n\nImage CID:\n{image_cid}"
-                if metadata_cid:
-                    success_message += f"\n\nMetadata CID:\n{metadata_cid}"
-                show_popup_message(five_view, success_message, duration=5, color=(0, 255, 0))
-                print(f"✅ Upload complete! CID stored in Supabase.")
-                print(f"   Image CID: {image_cid}")
-                if metadata_cid:
-                    print(f"   Metadata CID: {metadata_cid}\n")
-                else:
-                    print(f"   Warning: No metadata CID returned\n")
-                
-                # Register as IP Asset on Story Protocol
-                print(f"\n🔐 Registering as IP Asset on Story Protocol...")
-                try:
-                    import subprocess
-                    # Get depth metadata file path
-                    depth_meta_file = f'depth_meta_{timestamp}.json'
-                    
-                    # Prepare arguments: image_cid, metadata_cid, depth_meta_file
-                    args = [
-                        'python3' if not IS_WINDOWS else 'python',
-                        'register_ip_asset.py',
-                        image_cid,
-                        depth_meta_file
-                    ]
-                    
-                    # Add metadata CID if available
-                    if metadata_cid:
-                        args.append(metadata_cid)
-                    
-                    # Call the IP registration script
-                    ip_reg_result = subprocess.run(
-                        args,
-                        capture_output=True,
-                        text=True,
-                        timeout=180
-                    )
-                    
-                    if ip_reg_result.returncode == 0:
-                        print(ip_reg_result.stdout)
-                        ip_message = f"✅ IP Asset Registered!\n\nProtected on Story Protocol"
-                        show_popup_message(five_view, ip_message, duration=3, color=(0, 255, 0))
-                    else:
-                        print(f"⚠️ IP registration skipped or failed:")
-                        print(ip_reg_result.stdout)
-                        print(ip_reg_result.stderr)
-                except subprocess.TimeoutExpired:
-                    print(f"⚠️ IP registration timed out (can take 60+ seconds)")
-                except Exception as e:
-                    print(f"⚠️ Could not register IP asset: {e}")
-                    print(f"   Image is still saved and uploaded to IPFS")
-            else:
-                # Display error message
-                error_message = "❌ Upload Failed\n\nCheck console for details"
-                show_popup_message(five_view, error_message, duration=3, color=(0, 0, 255))
-                print(f"⚠️ Upload failed, but files saved locally.\n")
+            # Hand the commit to a background worker and keep previewing
+            job = {
+                'timestamp': timestamp,
+                'imgL': packet.imgL,
+                'imgR': packet.imgR,
+                'blend_strength': settings['blend_strength'],
+                'fps': avg_fps
+            }
+            if packet.evidence:
+                # Preview is already full resolution (and never reused/blended), reuse it
+                job['disparity'] = packet.disparity
+                job['views'] = packet.views
+            committer.submit(timestamp, job)
+            METRICS.increment('captures')
             
             capture_count += 1
-            print(f"✓ Capture #{capture_count} complete!\n")
+            print(f"✓ Capture #{capture_count} queued ({committer.in_flight()} in flight)\n")
             
-        elif key == ord('s'):  # Full screenshot
+        elif key == ord('s') and packet is not None:  # Full screenshot
             filename = f'stereo_5view_{int(time.time())}.jpg'
-            cv2.imwrite(filename, five_view)
+            cv2.imwrite(filename, packet.five_view)
             print(f"✓ Saved full screenshot: {filename}")
             
         elif key == ord('+') or key == ord('='):
-            blend_strength = min(1.0, blend_strength + 0.05)
-            print(f"Blend strength: {int(blend_strength*100)}%")
+            settings['blend_strength'] = min(1.0, settings['blend_strength'] + 0.05)
+            print(f"Blend strength: {int(settings['blend_strength']*100)}%")
             
         elif key == ord('-') or key == ord('_'):
-            blend_strength = max(0.0, blend_strength - 0.05)
-            print(f"Blend strength: {int(blend_strength*100)}%")
+            settings['blend_strength'] = max(0.0, settings['blend_strength'] - 0.05)
+            print(f"Blend strength: {int(settings['blend_strength']*100)}%")
             
         elif key == ord('x'):
-            swap_cameras = not swap_cameras
-            print(f"Camera swap: {'ON' if swap_cameras else 'OFF'}")
+            settings['swap_cameras'] = not settings['swap_cameras']
+            print(f"Camera swap: {'ON' if settings['swap_cameras'] else 'OFF'}")
     
     print(f"\n✓ Average FPS: {avg_fps:.1f}")
     print(f"✓ Total captures: {capture_count}")
+    print(f"✓ Dropped pairs (skew > {MAX_PAIR_SKEW_MS:.0f} ms): {grabber.dropped_pairs}")
+    print(f"✓ Frames skipped by pipeline: {pipeline.dropped_frames}")
+    if temporal is not None:
+        counts = temporal.counts
+        print(f"✓ Depth frames: {counts['full']} full, {counts['region']} band-limited, {counts['reused']} reused")
+    pool_stats = FRAME_POOL.stats()
+    print(f"✓ Frame buffers: {pool_stats['reuses']} reused, {pool_stats['allocations']} allocated ({pool_stats['pooled_mb']:.0f} MB pooled)")
     
-    capL.release()
-    capR.release()
+    if governor is not None:
+        print(f"✓ Quality tier: {governor.tier['name']} ({governor.changes} changes)")
+        governor.stop()
+    pipeline.stop()
+    grabber.stop()
+    if recorder is not None:
+        recorder.close()
+        print(f"✓ Recorded {recorder.frame_count} pairs to {RECORD_DIR}")
+    stop_commit_services(outbox, committer, flusher)
+    if exporter is not None:
+        exporter.stop()
+    for cap in cameras:
+        cap.release()
     cv2.destroyAllWindows()
 
 
@@ -3,6 +3,12 @@ import cv2
 import os
 from collections import deque  # Fixed: added 'import'
 import time
+import sys
+
+# Shared modules (calibration_store, stereo_matchers) live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calibration_store import load_rectification_maps
+from stereo_matchers import create_matcher
 
 # --- CONFIGURATION ---
 LEFT_PATH = "/dev/v4l/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.1:1.0-video-index0"
@@ -64,9 +70,7 @@ def run_five_view():
     
     # Load calibration
     print("Loading calibration...")
-    data = np.load(PARAM_FILE)
-    mapL1, mapL2 = data['mapL1'], data['mapL2']
-    mapR1, mapR2 = data['mapR1'], data['mapR2']
+    mapL1, mapL2, mapR1, mapR2 = load_rectification_maps(PARAM_FILE)
     print("✓ Calibration loaded")
     
     # Setup cameras
@@ -97,19 +101,8 @@ def run_five_view():
     min_disp = 0
     num_disp = 96
     
-    stereo = cv2.StereoSGBM_create(
-        minDisparity=min_disp,
-        numDisparities=num_disp,
-        blockSize=window_size,
-        P1=8 * 3 * window_size**2,
-        P2=32 * 3 * window_size**2,
-        disp12MaxDiff=1,
-        uniquenessRatio=10,
-        speckleWindowSize=100,
-        speckleRange=32,
-        preFilterCap=63,
-        mode=cv2.STEREO_SGBM_MODE_SGBM_3WAY
-    )
+    # Same SGBM 3-way settings as the shared matcher defaults
+    stereo = create_matcher('sgbm_3way', num_disp, window_size, min_disp)
     
     print("\n" + "="*70)
     print("STEREO DEPTH SYSTEM - 5 VIEW DISPLAY")
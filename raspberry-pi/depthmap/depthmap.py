@@ -1,6 +1,11 @@
 import numpy as np
 import cv2
 import os
+import sys
+
+# Shared modules (calibration_store) live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calibration_store import load_rectification_maps
 
 # --- CONFIGURATION ---
 LEFT_PATH = "/dev/v4l/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.1.2:1.0-video-index0"
@@ -18,9 +23,7 @@ def run():
         print("Run calibration first!")
         return
         
-    data = np.load(PARAM_FILE)
-    mapL1, mapL2 = data['mapL1'], data['mapL2']
-    mapR1, mapR2 = data['mapR1'], data['mapR2']
+    mapL1, mapL2, mapR1, mapR2 = load_rectification_maps(PARAM_FILE)
 
     capL = cv2.VideoCapture(LEFT_PATH)
     capR = cv2.VideoCapture(RIGHT_PATH)
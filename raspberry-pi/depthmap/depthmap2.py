@@ -1,6 +1,12 @@
 import numpy as np
 import cv2
 import os
+import sys
+
+# Shared modules (calibration_store, stereo_matchers) live one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calibration_store import load_rectification_maps
+from stereo_matchers import create_matcher
 
 # --- CONFIGURATION ---
 LEFT_PATH = "/dev/v4l/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.1:1.0-video-index0"
@@ -16,10 +22,7 @@ def run_clean_depth():
         return
     
     # Load Calibration
-    data = np.load(PARAM_FILE)
-    mapL1, mapL2 = data['mapL1'], data['mapL2']
-    mapR1, mapR2 = data['mapR1'], data['mapR2']
-    Q = data['Q']
+    mapL1, mapL2, mapR1, mapR2 = load_rectification_maps(PARAM_FILE)
 
     # Setup Cameras
     capL = cv2.VideoCapture(LEFT_PATH)
@@ -37,17 +40,12 @@ def run_clean_depth():
     min_disp = 0
     num_disp = 96 # Keep divisible by 16
     
-    stereo = cv2.StereoSGBM_create(
-        minDisparity=min_disp,
-        numDisparities=num_disp,
-        blockSize=window_size,
-        P1=8 * 3 * window_size**2,
-        P2=32 * 3 * window_size**2,
-        disp12MaxDiff=1,
+    stereo = create_matcher(
+        'sgbm_3way', num_disp, window_size, min_disp,
         uniquenessRatio=15,       # Higher = Less Noise, more empty gaps
         speckleWindowSize=200,    # Higher = Removes bigger chunks of noise
         speckleRange=2,
-        mode=cv2.STEREO_SGBM_MODE_SGBM_3WAY
+        preFilterCap=0            # OpenCV default, as originally tuned
     )
 
     print("Running Clean Depth...")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Frame Buffer Pool
+Fixed-shape buffers reused across frames so the hot loop passes them as
+OpenCV `dst=` / NumPy `out=` arguments instead of allocating new arrays
+for every remap, disparity conversion, visualization and composite.
+
+Frames travel between pipeline threads, sit in view caches and get handed
+to capture commits, so a buffer can't be recycled on a fixed schedule.
+Instead a buffer is only handed out again once nothing but the pool
+references it (NumPy views keep their base array referenced, so a slice
+still in use also keeps its buffer busy). When every buffer for a key is
+busy the pool grows, up to a limit.
+
+Objects holding pooled buffers must not sit in reference cycles: a buffer
+reachable from a cycle stays busy until the cyclic garbage collector runs,
+and the pool allocates a fresh one every frame until then.
+"""
+
+import sys
+import threading
+
+import numpy as np
+
+# Buffers kept per key and shape; beyond this, busy keys fall back to plain allocation
+DEFAULT_MAX_BUFFERS = 8
+
+# Shapes kept per key (e.g. full frame, preview, temporal bands); the oldest
+# shape is dropped when a new one arrives, so variable-size callers stay bounded
+DEFAULT_MAX_SHAPES = 4
+
+# sys.getrefcount of a buffer referenced only by the pool's list
+# (the list entry plus getrefcount's own argument)
+_FREE_REFCOUNT = 2
+
+
+class BufferPool:
+    """Reusable arrays keyed by stage name, shape and dtype"""
+
+    def __init__(self, max_buffers=DEFAULT_MAX_BUFFERS, max_shapes=DEFAULT_MAX_SHAPES):
+        self.max_buffers = max_buffers
+        self.max_shapes = max_shapes
+        self.lock = threading.Lock()
+        self.buffers = {}
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, key, shape, dtype=np.uint8):
+        """
+        Return a buffer for a stage output
+
+        Contents are whatever was last written to it, except that newly
+        allocated buffers are zeroed (composites rely on this for padding
+        regions they never write).
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        with self.lock:
+            shapes = self.buffers.setdefault(key, {})
+            slots = shapes.get((shape, dtype))
+            if slots is None:
+                if len(shapes) >= self.max_shapes:
+                    del shapes[next(iter(shapes))]
+                slots = shapes[(shape, dtype)] = []
+            for i in range(len(slots)):
+                if sys.getrefcount(slots[i]) <= _FREE_REFCOUNT:
+                    self.reuses += 1
+                    return slots[i]
+
+            buffer = np.zeros(shape, dtype=dtype)
+            self.allocations += 1
+            if len(slots) < self.max_buffers:
+                slots.append(buffer)
+            return buffer
+
+    def stats(self):
+        """Allocation/reuse counts and pooled memory"""
+        with self.lock:
+            pooled = sum(buffer.nbytes for shapes in self.buffers.values()
+                         for slots in shapes.values() for buffer in slots)
+            return {
+                'allocations': self.allocations,
+                'reuses': self.reuses,
+                'pooled_mb': pooled / (1024.0 * 1024.0)
+            }
+
+
+# Shared pool for the capture process
+FRAME_POOL = BufferPool()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Adaptive Quality Governor
+Holds a target preview FPS on constrained or throttling devices by stepping
+through quality tiers. Each tier is cheaper than the one before:
+
+    0  configured preview (scale, numDisparities, matcher, display rate)
+    1  fewer disparities
+    2  smaller preview scale
+    3  block matcher (StereoBM) instead of SGBM
+    4  smallest scale, half display rate
+
+The governor watches the slowest pipeline stage per frame (which bounds the
+achievable FPS) and the CPU temperature / firmware throttle flags, steps
+down quickly when the target is missed or the CPU is hot, and steps back up
+only after a sustained period of headroom.
+"""
+
+import glob
+import shutil
+import subprocess
+import threading
+import time
+
+# Evaluate this often (seconds); vcgencmd is only run at this rate
+DEFAULT_INTERVAL = 2.0
+
+# Step down below target * (1 - DOWN_MARGIN), up above target * (1 + UP_MARGIN)
+DOWN_MARGIN = 0.10
+UP_MARGIN = 0.35
+
+# Seconds of sustained headroom before stepping back up
+UPGRADE_HOLD = 10.0
+
+# CPU temperature (C) above which quality is reduced regardless of FPS; the
+# Pi firmware starts soft-throttling at 80 C
+DEFAULT_TEMP_LIMIT = 75.0
+TEMP_HYSTERESIS = 5.0
+
+# vcgencmd get_throttled bits that mean "throttled right now":
+# under-voltage, ARM frequency capped, throttled, soft temperature limit
+THROTTLED_NOW_MASK = 0x1 | 0x2 | 0x4 | 0x8
+
+THERMAL_ZONE_GLOB = '/sys/class/thermal/thermal_zone*'
+
+
+def read_cpu_temperature():
+    """CPU temperature in C from /sys/class/thermal, or None if unavailable"""
+    fallback = None
+    for zone in sorted(glob.glob(THERMAL_ZONE_GLOB)):
+        try:
+            with open(f'{zone}/temp', 'r') as f:
+                temperature = int(f.read().strip()) / 1000.0
+        except (OSError, ValueError):
+            continue
+        try:
+            with open(f'{zone}/type', 'r') as f:
+                zone_type = f.read().strip().lower()
+        except OSError:
+            zone_type = ''
+        if 'cpu' in zone_type or 'soc' in zone_type:
+            return temperature
+        if fallback is None:
+            fallback = temperature
+    return fallback
+
+
+def read_throttle_state():
+    """
+    Firmware throttle flags from `vcgencmd get_throttled`
+
+    Returns:
+        True/False for currently throttled, or None if vcgencmd is unavailable
+    """
+    if shutil.which('vcgencmd') is None:
+        return None
+    try:
+        output = subprocess.run(['vcgencmd', 'get_throttled'], capture_output=True,
+                                text=True, timeout=1.0).stdout
+        flags = int(output.strip().split('=')[1], 16)
+    except (OSError, subprocess.SubprocessError, IndexError, ValueError):
+        return None
+    return bool(flags & THROTTLED_NOW_MASK)
+
+
+def build_tiers(scale, num_disp, window_size, backend, display_fps):
+    """
+    Quality tiers from most to least expensive, starting at the configured settings
+
+    Each tier is a dict with name, scale, num_disp (at full resolution),
+    window_size, backend and display_fps.
+    """
+    reduced_disp = max(32, (num_disp * 2 // 3) // 16 * 16)
+    base = {'scale': scale, 'num_disp': num_disp, 'window_size': window_size,
+            'backend': backend, 'display_fps': display_fps}
+    return [
+        dict(base, name='configured'),
+        dict(base, name='fewer-disparities', num_disp=reduced_disp),
+        dict(base, name='smaller-scale', num_disp=reduced_disp, scale=scale * 0.75),
+        dict(base, name='block-matcher', num_disp=reduced_disp, scale=scale * 0.75, backend='bm'),
+        dict(base, name='minimum', num_disp=reduced_disp, scale=scale * 0.5, backend='bm',
+             display_fps=max(1.0, display_fps / 2.0))
+    ]
+
+
+class QualityGovernor:
+    """
+    Chooses a quality tier that holds target_fps
+
+    Args:
+        tiers: List of tier dicts from build_tiers (most expensive first)
+        target_fps: Preview rate to hold
+        temp_limit: CPU temperature (C) that forces a step down
+        interval: Seconds between decisions
+        on_change: Optional callback(tier_index, tier, reason) after a tier change
+    """
+
+    def __init__(self, tiers, target_fps, temp_limit=DEFAULT_TEMP_LIMIT,
+                 interval=DEFAULT_INTERVAL, on_change=None):
+        self.tiers = tiers
+        self.target_fps = target_fps
+        self.temp_limit = temp_limit
+        self.interval = interval
+        self.on_change = on_change
+
+        self.lock = threading.Lock()
+        self.tier_index = 0
+        self.frame_costs = []
+        self.headroom_since = None
+        self.last_fps = None
+        self.temperature = None
+        self.throttled = None
+        self.changes = 0
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def tier(self):
+        """Current tier dict"""
+        return self.tiers[self.tier_index]
+
+    def observe(self, stage_times):
+        """Record the per-stage times (seconds) of one processed frame"""
+        if not stage_times:
+            return
+        with self.lock:
+            # Stages run in parallel, so the slowest one bounds the frame rate
+            self.frame_costs.append(max(stage_times.values()))
+
+    def start(self):
+        """Start the decision thread"""
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='quality-governor', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the decision thread"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def status(self):
+        """Summary for logs / status endpoints"""
+        return {
+            'tier': self.tier['name'],
+            'tier_index': self.tier_index,
+            'fps': self.last_fps,
+            'target_fps': self.target_fps,
+            'temperature': self.temperature,
+            'throttled': self.throttled,
+            'changes': self.changes
+        }
+
+    def evaluate(self):
+        """Take one decision from the frames observed since the last one"""
+        with self.lock:
+            costs, self.frame_costs = self.frame_costs, []
+
+        self.temperature = read_cpu_temperature()
+        self.throttled = read_throttle_state()
+        hot = self.temperature is not None and self.temperature >= self.temp_limit
+        cool = self.temperature is None or self.temperature < self.temp_limit - TEMP_HYSTERESIS
+
+        if not costs:
+            return
+        costs.sort()
+        # Median frame cost, so one slow frame doesn't trigger a change
+        fps = 1.0 / max(costs[len(costs) // 2], 1e-6)
+        self.last_fps = fps
+
+        if hot or self.throttled or fps < self.target_fps * (1.0 - DOWN_MARGIN):
+            self.headroom_since = None
+            if self.tier_index < len(self.tiers) - 1:
+                if hot:
+                    reason = f"CPU {self.temperature:.0f}C"
+                elif self.throttled:
+                    reason = "firmware throttling"
+                else:
+                    reason = f"{fps:.1f} FPS < target {self.target_fps:.1f}"
+                self._set_tier(self.tier_index + 1, reason)
+            return
+
+        if fps > self.target_fps * (1.0 + UP_MARGIN) and cool and self.tier_index > 0:
+            now = time.monotonic()
+            if self.headroom_since is None:
+                self.headroom_since = now
+            elif now - self.headroom_since >= UPGRADE_HOLD:
+                self.headroom_since = None
+                self._set_tier(self.tier_index - 1, f"{fps:.1f} FPS headroom")
+        else:
+            self.headroom_since = None
+
+    def _set_tier(self, index, reason):
+        direction = 'down' if index > self.tier_index else 'up'
+        self.tier_index = index
+        self.changes += 1
+        # Costs measured at the old tier no longer apply
+        with self.lock:
+            self.frame_costs = []
+        print(f"⚙️ Quality {direction} -> tier {index} '{self.tier['name']}' ({reason})")
+        if self.on_change is not None:
+            self.on_change(index, self.tier, reason)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.evaluate()
+            except Exception as e:
+                print(f"⚠️ Quality governor error: {e}")
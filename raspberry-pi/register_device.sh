@@ -279,8 +279,11 @@ fi
 echo -e "${BLUE}Starting main capture script...${NC}"
 echo -e "${BLUE}Uploads will be sent to: ${IPFS_SERVICE_URL}${NC}\n"
 
-# Check which capture script exists
-if [ -f "depthmap.py" ]; then
+# Check which capture script exists (HEADLESS=1 runs the display-less daemon)
+if [ "${HEADLESS}" = "1" ] && [ -f "capture_daemon.py" ]; then
+    echo -e "${GREEN}Starting capture_daemon.py (headless)...${NC}\n"
+    $PYTHON_CMD capture_daemon.py
+elif [ -f "depthmap.py" ]; then
     echo -e "${GREEN}Starting depthmap.py...${NC}\n"
     $PYTHON_CMD depthmap.py
 elif [ -f "depthfinal4.py" ]; then
@@ -2,113 +2,175 @@
 """
 DeepShare - Register IP Asset on Story Protocol
 Sends captured image CID and depth metadata to Story Protocol server
+
+Imported by depthmap.py, which registers captures in-process through one
+long-lived StoryClient. Running this file registers a single capture by hand.
+Both register as the device address of the shared signer (capture_signing).
 """
 
 import sys
 import json
 import os
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from capture_signing import get_device_address
 
 # Load environment variables
 load_dotenv()
 
-def register_ip_asset(image_cid, depth_metadata_file, metadata_cid=None, minting_fee=None, commercial_rev_share=None):
+DEFAULT_STORY_SERVER_URL = 'https://storyserver-739298578243.us-central1.run.app'
+
+# IP registration can take time
+REGISTER_TIMEOUT = 120
+
+# Pooled connections kept open to the server: depthmap.py registers from its
+# commit workers (MAX_COMMITS_IN_FLIGHT, default 2) and the outbox flusher
+DEFAULT_CLIENT_CONNECTIONS = 3
+
+_client = None
+_client_lock = threading.Lock()
+
+class StoryClient:
     """
-    Register captured image with depth metadata as IP asset
+    Story Protocol server client with a pooled HTTP session
+    
+    Keeps its TLS connections open between registrations, so it is meant to
+    live for the whole process (see get_story_client). register() blocks the
+    calling thread and may be called from several threads at once.
     
     Args:
-        image_cid: IPFS CID of the captured image (original photo)
-        depth_metadata_file: Path to depth metadata JSON file
-        metadata_cid: IPFS CID of the full metadata JSON (includes depth data, signatures, etc.)
-        minting_fee: License minting fee in IP tokens (e.g., "0.1")
-        commercial_rev_share: Revenue share percentage (e.g., 10)
+        server_url: Story server URL (default: STORY_SERVER_URL from .env)
+        device_address: Device wallet address (default: the PRIVATE_KEY signer's
+            address, or WALLET_ADDRESS from .env)
+        connections: Connections kept open for concurrent registrations
     """
-    # Get configuration from .env
-    story_server_url = os.getenv('STORY_SERVER_URL', 'https://storyserver-739298578243.us-central1.run.app')
-    device_address = os.getenv('WALLET_ADDRESS')
-    
-    # Get user-configured royalty settings from .env (or use passed values)
-    if minting_fee is None:
-        minting_fee = os.getenv('IP_MINTING_FEE', '0.1')
-    if commercial_rev_share is None:
-        commercial_rev_share = int(os.getenv('IP_REVENUE_SHARE', '10'))
-    
-    if not device_address:
-        print("❌ Error: WALLET_ADDRESS not found in .env")
-        return False
-    
-    # Load depth metadata
-    try:
-        with open(depth_metadata_file, 'r') as f:
-            depth_metadata = json.load(f)
-    except Exception as e:
-        print(f"❌ Error loading depth metadata: {e}")
-        return False
     
-    # Prepare request payload
-    payload = {
-        'imageCid': image_cid,
-        'metadataCid': metadata_cid,  # IPFS CID of full metadata JSON with depth data
-        'depthMetadata': depth_metadata,  # Fallback if metadataCid not available
-        'deviceAddress': device_address,
-        'mintingFee': minting_fee,
-        'commercialRevShare': commercial_rev_share
-    }
+    def __init__(self, server_url=None, device_address=None, connections=DEFAULT_CLIENT_CONNECTIONS):
+        self.server_url = server_url or os.getenv('STORY_SERVER_URL', DEFAULT_STORY_SERVER_URL)
+        self.device_address = device_address or get_device_address()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
-    print(f"\n>> Registering IP Asset on Story Protocol...")
-    print(f"   Image CID: {image_cid}")
-    if metadata_cid:
-        print(f"   Metadata CID: {metadata_cid}")
-    print(f"   Device: {device_address}")
-    print(f"   Minting Fee: {minting_fee} IP tokens")
-    print(f"   Revenue Share: {commercial_rev_share}%")
-    
-    try:
-        # Send request to Story Protocol server
-        response = requests.post(
-            f'{story_server_url}/register-ip',
-            json=payload,
-            timeout=120  # IP registration can take time
-        )
+    def register(self, image_cid, depth_metadata_file, metadata_cid=None, minting_fee=None, commercial_rev_share=None):
+        """
+        Register captured image with depth metadata as IP asset
+        
+        Args:
+            image_cid: IPFS CID of the captured image (original photo)
+            depth_metadata_file: Path to depth metadata JSON file
+            metadata_cid: IPFS CID of the full metadata JSON (includes depth data, signatures, etc.)
+            minting_fee: License minting fee in IP tokens (e.g., "0.1")
+            commercial_rev_share: Revenue share percentage (e.g., 10)
+        
+        Returns:
+            (True, registration data) or (False, error message)
+        """
+        # Get user-configured royalty settings from .env (or use passed values)
+        if minting_fee is None:
+            minting_fee = os.getenv('IP_MINTING_FEE', '0.1')
+        if commercial_rev_share is None:
+            commercial_rev_share = int(os.getenv('IP_REVENUE_SHARE', '10'))
+        
+        if not self.device_address:
+            return False, "PRIVATE_KEY (or WALLET_ADDRESS) not found in .env"
+        
+        # Load depth metadata
+        try:
+            with open(depth_metadata_file, 'r') as f:
+                depth_metadata = json.load(f)
+        except Exception as e:
+            return False, f"Error loading depth metadata: {e}"
         
-        if response.status_code == 200:
+        # Prepare request payload
+        payload = {
+            'imageCid': image_cid,
+            'metadataCid': metadata_cid,  # IPFS CID of full metadata JSON with depth data
+            'depthMetadata': depth_metadata,  # Fallback if metadataCid not available
+            'deviceAddress': self.device_address,
+            'mintingFee': minting_fee,
+            'commercialRevShare': commercial_rev_share
+        }
+        
+        print(f"\n>> Registering IP Asset on Story Protocol...")
+        print(f"   Image CID: {image_cid}")
+        if metadata_cid:
+            print(f"   Metadata CID: {metadata_cid}")
+        print(f"   Device: {self.device_address}")
+        print(f"   Minting Fee: {minting_fee} IP tokens")
+        print(f"   Revenue Share: {commercial_rev_share}%")
+        
+        try:
+            # Send request to Story Protocol server
+            response = self.session.post(
+                f'{self.server_url}/register-ip',
+                json=payload,
+                timeout=REGISTER_TIMEOUT
+            )
+            
+            if response.status_code != 200:
+                return False, f"HTTP Error {response.status_code}: {response.text}"
+            
             result = response.json()
+            if not result.get('success'):
+                return False, f"Registration failed: {result.get('error', 'Unknown error')}"
             
-            if result.get('success'):
-                data = result['data']
-                print(f"\n[SUCCESS] IP Asset registered successfully!")
-                print(f"   IP Asset ID: {data['ipId']}")
-                print(f"   Token ID: {data['tokenId']}")
-                print(f"   Transaction: {data['txHash']}")
-                print(f"   NFT Contract: {data['nftContract']}")
-                print(f"\n[EXPLORER] View on Explorer:")
-                print(f"   {data['explorerUrl']}")
-                
-                # Save IP registration info
-                output_file = depth_metadata_file.replace('depth_meta', 'ip_registration')
-                with open(output_file, 'w') as f:
-                    json.dump(data, f, indent=2)
-                
-                print(f"\n[SAVED] IP registration details saved to: {output_file}")
-                return True
-            else:
-                print(f"[ERROR] Registration failed: {result.get('error', 'Unknown error')}")
-                return False
-        else:
-            print(f"[ERROR] HTTP Error {response.status_code}: {response.text}")
-            return False
+            data = result['data']
+            print(f"\n[SUCCESS] IP Asset registered successfully!")
+            print(f"   IP Asset ID: {data['ipId']}")
+            print(f"   Token ID: {data['tokenId']}")
+            print(f"   Transaction: {data['txHash']}")
+            print(f"   NFT Contract: {data['nftContract']}")
+            print(f"\n[EXPLORER] View on Explorer:")
+            print(f"   {data['explorerUrl']}")
             
-    except requests.exceptions.ConnectionError:
-        print(f"[ERROR] Cannot connect to Story Protocol server at {story_server_url}")
-        print(f"   Make sure the server is running: cd story-server && npm start")
-        return False
-    except requests.exceptions.Timeout:
-        print(f"[ERROR] Request timed out (IP registration takes 30-60 seconds)")
-        return False
-    except Exception as e:
-        print(f"[ERROR] {e}")
-        return False
+            # Save IP registration info
+            output_file = depth_metadata_file.replace('depth_meta', 'ip_registration')
+            with open(output_file, 'w') as f:
+                json.dump(data, f, indent=2)
+            
+            print(f"\n[SAVED] IP registration details saved to: {output_file}")
+            return True, data
+            
+        except requests.exceptions.ConnectionError:
+            return False, (f"Cannot connect to Story Protocol server at {self.server_url}\n"
+                           f"   Make sure the server is running: cd story-server && npm start")
+        except requests.exceptions.Timeout:
+            return False, "Request timed out (IP registration takes 30-60 seconds)"
+        except Exception as e:
+            return False, str(e)
+    
+    def close(self):
+        """Close the pooled connections"""
+        self.session.close()
+
+def get_story_client():
+    """Process-wide StoryClient, created on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = StoryClient()
+        return _client
+
+def register_ip_asset(image_cid, depth_metadata_file, metadata_cid=None, minting_fee=None, commercial_rev_share=None):
+    """
+    Register captured image with depth metadata as IP asset (prints errors, returns True/False)
+    
+    Args:
+        image_cid: IPFS CID of the captured image (original photo)
+        depth_metadata_file: Path to depth metadata JSON file
+        metadata_cid: IPFS CID of the full metadata JSON (includes depth data, signatures, etc.)
+        minting_fee: License minting fee in IP tokens (e.g., "0.1")
+        commercial_rev_share: Revenue share percentage (e.g., 10)
+    """
+    ok, result = get_story_client().register(image_cid, depth_metadata_file, metadata_cid,
+                                             minting_fee, commercial_rev_share)
+    if not ok:
+        print(f"[ERROR] {result}")
+    return ok
 
 if __name__ == '__main__':
     if len(sys.argv) < 3:
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Shared-Memory Frame Ring
+Triple-buffered ring of frame slots in `multiprocessing.shared_memory`, so
+one process can publish rectified frames and disparity and another can read
+them without pickling or copying.
+
+One writer, one reader. The writer fills a slot that is neither the latest
+published one nor the one the reader holds, then publishes it. The reader
+always takes the latest slot and holds it until its next read, so the
+arrays it was given are never overwritten while it uses them. With three
+slots the writer always has a free one and never waits for the reader.
+"""
+
+import numpy as np
+from multiprocessing import shared_memory
+
+DEFAULT_SLOTS = 3
+
+# Slot arrays start on cache-line boundaries
+ALIGNMENT = 64
+
+# Control words: latest published slot, slot held by the reader, publish count
+_LATEST, _HELD, _PUBLISHED = 0, 1, 2
+_CONTROL_WORDS = 4
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _layout(fields, meta_fields, slots):
+    """Byte offsets of the control words, metadata table and every slot array"""
+    offset = _CONTROL_WORDS * 8
+    meta_offset = offset
+    offset = _align(offset + slots * len(meta_fields) * 8)
+    arrays = []
+    for slot in range(slots):
+        slot_arrays = {}
+        for name, (shape, dtype) in fields.items():
+            slot_arrays[name] = offset
+            offset = _align(offset + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        arrays.append(slot_arrays)
+    return meta_offset, arrays, offset
+
+
+class FrameRing:
+    """
+    Shared-memory frame slots
+
+    Create in the parent with FrameRing.create(...) and pass ring.handle()
+    to the other process, which opens it with FrameRing.attach(handle).
+
+    Args:
+        fields: Dict of array name -> (shape, dtype) stored per slot
+        meta_fields: Names of the float values stored with each frame
+        condition: multiprocessing Condition shared by both sides
+    """
+
+    def __init__(self, memory, fields, meta_fields, slots, condition, owner):
+        self.memory = memory
+        self.fields = fields
+        self.meta_fields = tuple(meta_fields)
+        self.slots = slots
+        self.condition = condition
+        self.owner = owner
+        self.last_published = 0
+
+        meta_offset, offsets, _ = _layout(fields, self.meta_fields, slots)
+        self.control = np.ndarray((_CONTROL_WORDS,), dtype=np.int64, buffer=memory.buf)
+        self.meta = np.ndarray((slots, len(self.meta_fields)), dtype=np.float64,
+                               buffer=memory.buf, offset=meta_offset)
+        self.arrays = [
+            {name: np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=slot_offsets[name])
+             for name, (shape, dtype) in fields.items()}
+            for slot_offsets in offsets
+        ]
+
+    @classmethod
+    def create(cls, context, fields, meta_fields, slots=DEFAULT_SLOTS):
+        """Allocate a new ring (context: multiprocessing context used for the Condition)"""
+        fields = {name: (tuple(shape), np.dtype(dtype).str) for name, (shape, dtype) in fields.items()}
+        _, _, size = _layout(fields, tuple(meta_fields), slots)
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(memory, fields, meta_fields, slots, context.Condition(), owner=True)
+        ring.control[:] = 0
+        ring.control[_LATEST] = -1
+        ring.control[_HELD] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, handle):
+        """Open a ring created by another process"""
+        name, fields, meta_fields, slots, condition = handle
+        memory = shared_memory.SharedMemory(name=name)
+        return cls(memory, fields, meta_fields, slots, condition, owner=False)
+
+    def handle(self):
+        """Picklable description passed to the other process"""
+        return (self.memory.name, self.fields, self.meta_fields, self.slots, self.condition)
+
+    # Writer side
+
+    def begin_write(self):
+        """
+        Claim a free slot
+
+        Returns:
+            (slot, arrays) where arrays are the slot's shared arrays to fill
+        """
+        with self.condition:
+            busy = (self.control[_LATEST], self.control[_HELD])
+        slot = next(index for index in range(self.slots) if index not in busy)
+        return slot, self.arrays[slot]
+
+    def publish(self, slot, **meta):
+        """Make a filled slot the latest frame and wake the reader"""
+        with self.condition:
+            self.meta[slot] = [meta.get(name, 0.0) for name in self.meta_fields]
+            self.control[_LATEST] = slot
+            self.control[_PUBLISHED] += 1
+            self.condition.notify_all()
+
+    def write(self, arrays, **meta):
+        """Copy arrays into a free slot and publish it"""
+        slot, slot_arrays = self.begin_write()
+        for name, array in arrays.items():
+            np.copyto(slot_arrays[name], array)
+        self.publish(slot, **meta)
+
+    # Reader side
+
+    def read_latest(self, timeout=None):
+        """
+        Take the latest frame if a new one was published
+
+        The returned arrays are views into shared memory. They stay valid
+        until the next read_latest call.
+
+        Returns:
+            (arrays, meta) or None if nothing new arrived within timeout
+        """
+        with self.condition:
+            if self.control[_PUBLISHED] == self.last_published:
+                self.condition.wait(timeout)
+            if self.control[_PUBLISHED] == self.last_published:
+                return None
+            self.last_published = int(self.control[_PUBLISHED])
+            slot = int(self.control[_LATEST])
+            self.control[_HELD] = slot
+            meta = dict(zip(self.meta_fields, self.meta[slot].tolist()))
+        return self.arrays[slot], meta
+
+    def wake(self):
+        """Wake a reader blocked in read_latest"""
+        with self.condition:
+            self.condition.notify_all()
+
+    def close(self):
+        """Detach (and free, on the creating side); drop any arrays taken from the ring first"""
+        self.control = self.meta = self.arrays = None
+        try:
+            self.memory.close()
+        except BufferError:
+            # Arrays still referenced somewhere; the mapping goes away with the process
+            pass
+        if self.owner:
+            self.memory.unlink()
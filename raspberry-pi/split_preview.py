@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Split-Process Stereo Preview
+Runs the 5-view preview as two processes so Python work on one side never
+holds the GIL the other side needs:
+
+    capture process   cameras -> rectify -> depth -> shared-memory frame ring
+    UI process        ring -> views -> imshow, keys, capture commits
+
+Frames and disparity cross over through a shared-memory ring (see
+shared_frames.py) that the UI reads without copying. Keys that affect
+capture (camera swap) go back over a small control queue; blend and capture
+are handled on the UI side, which copies a frame out of the ring only when
+it is captured.
+
+Usage:
+    python split_preview.py
+"""
+
+import multiprocessing
+import queue
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from capture_metrics import METRICS
+from depthmap import (
+    DISPLAY_FPS,
+    FPS,
+    HEIGHT,
+    MAX_PAIR_SKEW_MS,
+    MIN_DISP,
+    MONO_MATCHING,
+    NUM_DISP,
+    RECORD_DIR,
+    WIDTH,
+    build_view_graph,
+    create_depth_stage,
+    load_calibration,
+    rectify_pair,
+    render_five_view,
+    render_popup_messages,
+    report_first_frame,
+    start_commit_services,
+    start_metrics_exporter,
+    start_stereo_source,
+    stop_commit_services,
+)
+from capture_commit import StatusOverlay
+from shared_frames import FrameRing
+from stereo_pipeline import FramePacket, Pipeline
+from stereo_recording import StereoRecorder
+
+WINDOW_NAME = 'Stereo Depth System - 5 View'
+
+# Per-frame values published with each ring slot
+META_FIELDS = ('frame_id', 'timestamp', 'fps', 'display_fps', 'evidence')
+
+# Seconds to wait for the capture process to shut down before terminating it
+CAPTURE_STOP_TIMEOUT = 10.0
+
+
+def ring_fields():
+    """Arrays carried per frame: rectified pair and full-size disparity"""
+    right_shape = (HEIGHT, WIDTH) if MONO_MATCHING else (HEIGHT, WIDTH, 3)
+    return {
+        'imgL': ((HEIGHT, WIDTH, 3), np.uint8),
+        'imgR': (right_shape, np.uint8),
+        'disparity': ((HEIGHT, WIDTH), np.float32)
+    }
+
+
+def capture_process(ring_handle, control, stop_event):
+    """
+    Capture side: cameras -> rectify -> depth, published to the frame ring
+
+    Args:
+        ring_handle: FrameRing.handle() of the ring created by the UI process
+        control: Queue of (command, value) from the UI ('swap')
+        stop_event: Set by the UI to shut down
+    """
+    ring = FrameRing.attach(ring_handle)
+    calibration = load_calibration()
+    if calibration is None:
+        stop_event.set()
+        ring.close()
+        return
+    mapL1, mapL2, mapR1, mapR2 = calibration
+
+    grabber, cameras = start_stereo_source()
+    if grabber is None:
+        stop_event.set()
+        ring.close()
+        return
+
+    recorder = None
+    if RECORD_DIR:
+        recorder = StereoRecorder(RECORD_DIR, FPS)
+        print(f"Recording raw pairs to {RECORD_DIR}")
+
+    depth_stage, governor, temporal = create_depth_stage(MIN_DISP, NUM_DISP)
+    settings = {'swap_cameras': False}
+
+    def read_pair():
+        ret, frameL, frameR, timestamp = grabber.read()
+        if not ret:
+            return None
+        if recorder is not None:
+            recorder.write(frameL, frameR, timestamp)
+        return FramePacket(frameL, frameR, timestamp)
+
+    # Rectify -> SGBM, each stage on its own thread; this thread publishes
+    pipeline = Pipeline(read_pair, [
+        ('rectify', lambda packet: rectify_pair(packet, mapL1, mapL2, mapR1, mapR2, settings['swap_cameras'])),
+        ('depth', depth_stage)
+    ])
+    pipeline.start()
+    if governor is not None:
+        governor.start()
+    exporter = start_metrics_exporter(grabber, None, None, pipeline)
+
+    fps_times = deque(maxlen=30)
+    avg_fps = 0.0
+    last_depth_time = None
+    published = 0
+
+    while not stop_event.is_set():
+        try:
+            while True:
+                command, value = control.get_nowait()
+                if command == 'swap':
+                    settings['swap_cameras'] = value
+        except queue.Empty:
+            pass
+
+        packet = pipeline.get(timeout=0.1)
+        if packet is None:
+            continue
+
+        # Throughput is measured between consecutive depth frames
+        now = time.time()
+        if last_depth_time is not None:
+            fps_times.append(now - last_depth_time)
+            avg_fps = 1.0 / (np.mean(fps_times) + 1e-6)
+        last_depth_time = now
+
+        display_fps = DISPLAY_FPS
+        if governor is not None:
+            governor.observe(packet.stage_times)
+            display_fps = governor.tier['display_fps']
+
+        with METRICS.timer('publish'):
+            ring.write({'imgL': packet.imgL, 'imgR': packet.imgR, 'disparity': packet.disparity},
+                       frame_id=packet.frame_id, timestamp=packet.timestamp, fps=avg_fps,
+                       display_fps=display_fps, evidence=float(packet.evidence))
+        published += 1
+
+    print(f"✓ Capture process: {published} frames published, average {avg_fps:.1f} FPS")
+    print(f"✓ Dropped pairs (skew > {MAX_PAIR_SKEW_MS:.0f} ms): {grabber.dropped_pairs}")
+    print(f"✓ Frames skipped by pipeline: {pipeline.dropped_frames}")
+    if temporal is not None:
+        counts = temporal.counts
+        print(f"✓ Depth frames: {counts['full']} full, {counts['region']} band-limited, {counts['reused']} reused")
+    if governor is not None:
+        print(f"✓ Quality tier: {governor.tier['name']} ({governor.changes} changes)")
+        governor.stop()
+    pipeline.stop()
+    grabber.stop()
+    if recorder is not None:
+        recorder.close()
+        print(f"✓ Recorded {recorder.frame_count} pairs to {RECORD_DIR}")
+    if exporter is not None:
+        exporter.stop()
+    for cap in cameras:
+        cap.release()
+    ring.close()
+
+
+def captured_job(packet, meta, blend_strength):
+    """Commit job for a frame still in the ring (copied out, the slot will be reused)"""
+    job = {
+        'timestamp': None,
+        'imgL': packet.imgL.copy(),
+        'imgR': packet.imgR.copy(),
+        'blend_strength': blend_strength,
+        'fps': meta['fps']
+    }
+    if meta['evidence']:
+        # Preview is already full resolution (and never reused/blended), reuse it
+        evidence = FramePacket(None, None, meta['timestamp'])
+        evidence.imgL, evidence.imgR = job['imgL'], job['imgR']
+        evidence.disparity = packet.disparity.copy()
+        job['disparity'] = evidence.disparity
+        job['views'] = build_view_graph().evaluate(evidence, {'blend_strength': blend_strength, 'fps': meta['fps']})
+    return job
+
+
+def run_split_view():
+    """UI side: start the capture process, then display, handle keys and commit captures"""
+    context = multiprocessing.get_context('spawn')
+    ring = FrameRing.create(context, ring_fields(), META_FIELDS)
+    control = context.Queue()
+    stop_event = context.Event()
+    process = context.Process(target=capture_process, args=(ring.handle(), control, stop_event),
+                              name='deepshare-capture')
+    process.start()
+
+    print("\n" + "="*70)
+    print("STEREO DEPTH SYSTEM - 5 VIEW DISPLAY (split processes)")
+    print("="*70)
+    print("Controls:")
+    print("  SPACE  Capture images + depth data")
+    print("  '+/-'  Adjust blend strength (depth-enhanced view)")
+    print("  's'    Save full screenshot")
+    print("  'x'    Swap left/right cameras")
+    print("  ESC    Exit")
+    print("="*70 + "\n")
+
+    status_overlay = StatusOverlay()
+    outbox, committer, flusher = start_commit_services(status_overlay)
+    exporter = start_metrics_exporter(None, committer, outbox)
+    view_graph = build_view_graph(MIN_DISP, NUM_DISP)
+
+    settings = {
+        'blend_strength': 0.6,
+        'swap_cameras': False
+    }
+    capture_count = 0
+    last_capture_timestamp = 0
+    last_render_time = None
+    packet = None
+    meta = None
+    five_view = None
+
+    while process.is_alive() and not stop_event.is_set():
+        frame = ring.read_latest(timeout=0.1)
+        if frame is not None:
+            # Always track the slot the ring holds for us; older slots may be overwritten
+            arrays, meta = frame
+            packet = FramePacket(None, None, meta['timestamp'])
+            packet.frame_id = int(meta['frame_id'])
+            packet.imgL, packet.imgR, packet.disparity = arrays['imgL'], arrays['imgR'], arrays['disparity']
+
+            # Views are only built as often as the display refreshes
+            now = time.time()
+            if last_render_time is None or now - last_render_time >= 1.0 / meta['display_fps']:
+                last_render_time = now
+                render_five_view(packet, view_graph, settings['blend_strength'], meta['fps'])
+                if five_view is None:
+                    report_first_frame()
+                five_view = packet.five_view
+
+                display_start = time.perf_counter()
+                statuses = status_overlay.active()
+                if statuses:
+                    display = render_popup_messages(five_view, statuses, full_screen=False)
+                else:
+                    display = five_view
+                cv2.imshow(WINDOW_NAME, display)
+                METRICS.observe('display', time.perf_counter() - display_start)
+
+        # Handle keys
+        key = cv2.waitKey(1) & 0xFF
+        if key == 27:  # ESC
+            break
+
+        elif key == ord(' ') and packet is not None:  # SPACEBAR - Capture
+            # Keep timestamps unique so rapid captures don't overwrite each other's files
+            timestamp = max(int(time.time()), last_capture_timestamp + 1)
+            last_capture_timestamp = timestamp
+
+            job = captured_job(packet, meta, settings['blend_strength'])
+            job['timestamp'] = timestamp
+            committer.submit(timestamp, job)
+            METRICS.increment('captures')
+
+            capture_count += 1
+            print(f"✓ Capture #{capture_count} queued ({committer.in_flight()} in flight)\n")
+
+        elif key == ord('s') and five_view is not None:  # Full screenshot
+            filename = f'stereo_5view_{int(time.time())}.jpg'
+            cv2.imwrite(filename, five_view)
+            print(f"✓ Saved full screenshot: {filename}")
+
+        elif key == ord('+') or key == ord('='):
+            settings['blend_strength'] = min(1.0, settings['blend_strength'] + 0.05)
+            print(f"Blend strength: {int(settings['blend_strength']*100)}%")
+
+        elif key == ord('-') or key == ord('_'):
+            settings['blend_strength'] = max(0.0, settings['blend_strength'] - 0.05)
+            print(f"Blend strength: {int(settings['blend_strength']*100)}%")
+
+        elif key == ord('x'):
+            settings['swap_cameras'] = not settings['swap_cameras']
+            control.put(('swap', settings['swap_cameras']))
+            print(f"Camera swap: {'ON' if settings['swap_cameras'] else 'OFF'}")
+
+    if not process.is_alive() and process.exitcode:
+        print(f"❌ Capture process exited with code {process.exitcode}")
+
+    stop_event.set()
+    process.join(timeout=CAPTURE_STOP_TIMEOUT)
+    if process.is_alive():
+        print("⚠️ Capture process did not stop, terminating it")
+        process.terminate()
+        process.join()
+
+    print(f"\n✓ Total captures: {capture_count}")
+    stop_commit_services(outbox, committer, flusher)
+    if exporter is not None:
+        exporter.stop()
+    cv2.destroyAllWindows()
+
+    # Drop every view into shared memory before releasing it
+    packet = frame = arrays = None
+    ring.close()
+
+
+if __name__ == '__main__':
+    run_split_view()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Threaded Stereo Capture
+One reader thread per camera fills a small timestamped ring buffer, and a
+pairing stage hands the depth loop the nearest-timestamp L/R pair.
+
+Frames the driver queued before reading started would carry a timestamp of
+when they were read, not when they were exposed. At startup each reader
+therefore drops frames until grab() actually has to wait for the camera,
+instead of flushing a fixed number of frames.
+"""
+
+import threading
+import time
+from collections import deque
+
+from capture_metrics import METRICS
+
+# Default ring buffer length per camera (frames)
+DEFAULT_BUFFER_SIZE = 4
+
+# Default maximum allowed skew between left and right frames of a pair
+DEFAULT_MAX_SKEW_MS = 30.0
+
+# Upper bound on stale frames dropped per camera at startup
+MAX_STALE_FRAMES = 10
+
+
+class CameraReader:
+    """Continuously grabs frames from one cv2.VideoCapture on its own thread"""
+
+    def __init__(self, cap, name, condition, buffer_size=DEFAULT_BUFFER_SIZE, fresh_grab_ms=0.0):
+        self.cap = cap
+        self.name = name
+        self.condition = condition
+        # Each entry is (timestamp, sequence number, frame)
+        self.frames = deque(maxlen=buffer_size)
+        self.sequence = 0
+        self.failed_reads = 0
+        # A grab() returning faster than this handed back an already queued frame
+        self.fresh_grab = fresh_grab_ms / 1000.0
+        self.stale_frames = 0
+        self.first_frame_time = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start the reader thread"""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f'camera-{self.name}', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the reader thread and wait for it to exit"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def _run(self):
+        while self.running:
+            # grab() blocks until the driver has a new frame, so the timestamp
+            # taken right after it is the best estimate of exposure time
+            grab_start = time.monotonic()
+            if not self.cap.grab():
+                self.failed_reads += 1
+                time.sleep(0.005)
+                continue
+            timestamp = time.monotonic()
+            METRICS.observe(f'grab_{self.name}', timestamp - grab_start)
+
+            if self.first_frame_time is None:
+                if timestamp - grab_start < self.fresh_grab and self.stale_frames < MAX_STALE_FRAMES:
+                    # Queued before we started reading; dropped without decoding
+                    self.stale_frames += 1
+                    continue
+                self.first_frame_time = timestamp
+
+            ret, frame = self.cap.retrieve()
+            METRICS.observe(f'retrieve_{self.name}', time.monotonic() - timestamp)
+            if not ret:
+                self.failed_reads += 1
+                continue
+
+            with self.condition:
+                self.sequence += 1
+                self.frames.append((timestamp, self.sequence, frame))
+                self.condition.notify_all()
+
+
+class StereoGrabber:
+    """
+    Pairs frames from two CameraReaders by nearest timestamp
+
+    Args:
+        capL: Left cv2.VideoCapture
+        capR: Right cv2.VideoCapture
+        max_skew_ms: Pairs whose timestamps differ by more than this are dropped
+        buffer_size: Ring buffer length per camera
+        fresh_grab_ms: At startup, frames whose grab() took less than this are
+            dropped as stale (0 keeps every frame)
+    """
+
+    def __init__(self, capL, capR, max_skew_ms=DEFAULT_MAX_SKEW_MS, buffer_size=DEFAULT_BUFFER_SIZE,
+                 fresh_grab_ms=0.0):
+        self.condition = threading.Condition()
+        self.left = CameraReader(capL, 'left', self.condition, buffer_size, fresh_grab_ms)
+        self.right = CameraReader(capR, 'right', self.condition, buffer_size, fresh_grab_ms)
+        self.max_skew = max_skew_ms / 1000.0
+        self.last_seq_left = 0
+        self.last_seq_right = 0
+        self.pair_count = 0
+        self.dropped_pairs = 0
+        self.last_skew = 0.0
+
+    def start(self):
+        """Start both reader threads"""
+        self.left.start()
+        self.right.start()
+
+    def stop(self):
+        """Stop both reader threads"""
+        self.left.stop()
+        self.right.stop()
+        with self.condition:
+            self.condition.notify_all()
+
+    @property
+    def stale_frames(self):
+        """Frames dropped as stale at startup, both cameras"""
+        return self.left.stale_frames + self.right.stale_frames
+
+    def _find_pair(self):
+        """Find the nearest-timestamp pair not yet delivered (caller holds the lock)"""
+        framesL = [f for f in self.left.frames if f[1] > self.last_seq_left]
+        framesR = [f for f in self.right.frames if f[1] > self.last_seq_right]
+        if not framesL or not framesR:
+            return None
+
+        # Anchor on the camera whose newest frame is older, then look for the
+        # closest frame from the other camera
+        if framesL[-1][0] <= framesR[-1][0]:
+            anchor = framesL[-1]
+            match = min(framesR, key=lambda f: abs(f[0] - anchor[0]))
+            left, right = anchor, match
+        else:
+            anchor = framesR[-1]
+            match = min(framesL, key=lambda f: abs(f[0] - anchor[0]))
+            left, right = match, anchor
+
+        skew = abs(left[0] - right[0])
+        if skew > self.max_skew:
+            # Consume the anchor so we wait for a fresher frame on that side
+            self.dropped_pairs += 1
+            if anchor is left:
+                self.last_seq_left = left[1]
+            else:
+                self.last_seq_right = right[1]
+            return None
+
+        self.last_seq_left = left[1]
+        self.last_seq_right = right[1]
+        self.pair_count += 1
+        self.last_skew = skew
+        return left, right
+
+    def read(self, timeout=1.0):
+        """
+        Wait for the next synchronized pair
+
+        Returns:
+            (ok, frameL, frameR, timestamp) where timestamp is the mean
+            monotonic capture time of the pair
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                pair = self._find_pair()
+                if pair is not None:
+                    left, right = pair
+                    return True, left[2], right[2], (left[0] + right[0]) / 2.0
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not (self.left.running and self.right.running):
+                    return False, None, None, None
+                self.condition.wait(remaining)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Stereo Matcher Backends
+One factory for every disparity matcher the depth scripts can use, so the
+matcher is chosen by name instead of hard-coding StereoSGBM_create:
+
+    bm         StereoBM (block matching, cheapest, sparse)
+    sgbm       StereoSGBM, 5-direction mode
+    sgbm_hh    StereoSGBM, full 8-direction mode (slowest, densest)
+    sgbm_3way  StereoSGBM, 3-way mode (previous hard-coded default)
+    sgbm_hh4   StereoSGBM, 4-direction mode
+    sgbm_wls   sgbm_3way + left/right consistency + ximgproc WLS filter
+
+Every backend exposes compute(imgL, imgR) returning int16 disparity scaled
+by 16, exactly like cv2.StereoSGBM, so callers keep dividing by 16. Pass
+channels=1 when matching grayscale pairs so the SGBM smoothness penalties
+keep their intended strength.
+
+Auto-tune picks the fastest backend that still fills enough of the frame:
+    python stereo_matchers.py autotune [pairs_dir] [fill_target]
+"""
+
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from calibration_store import load_rectification_maps
+
+DEFAULT_BACKEND = 'sgbm_3way'
+MATCHER_PROFILE_FILE = 'matcher_profile.json'
+
+SGBM_MODES = {
+    'sgbm': cv2.STEREO_SGBM_MODE_SGBM,
+    'sgbm_hh': cv2.STEREO_SGBM_MODE_HH,
+    'sgbm_3way': cv2.STEREO_SGBM_MODE_SGBM_3WAY,
+    'sgbm_hh4': cv2.STEREO_SGBM_MODE_HH4,
+}
+BACKENDS = ('bm',) + tuple(SGBM_MODES) + ('sgbm_wls',)
+
+# WLS filter smoothing strength and edge sensitivity
+WLS_LAMBDA = 8000.0
+WLS_SIGMA_COLOR = 1.5
+
+# Auto-tune defaults
+DEFAULT_PAIRS_DIR = os.path.join('callibration', 'calibration_images')
+DEFAULT_FILL_TARGET = 0.4
+AUTOTUNE_REPEATS = 3
+
+
+def _to_gray(image):
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _create_sgbm(num_disp, window_size, min_disp, mode, channels=3, **overrides):
+    # P1/P2 scale with the channel count SGBM actually sees (3 for BGR input)
+    params = {
+        'minDisparity': min_disp,
+        'numDisparities': num_disp,
+        'blockSize': window_size,
+        'P1': 8 * channels * window_size**2,
+        'P2': 32 * channels * window_size**2,
+        'disp12MaxDiff': 1,
+        'uniquenessRatio': 10,
+        'speckleWindowSize': 100,
+        'speckleRange': 32,
+        'preFilterCap': 63,
+        'mode': mode
+    }
+    params.update(overrides)
+    return cv2.StereoSGBM_create(**params)
+
+
+class BlockMatcher:
+    """StereoBM wrapper that accepts color input"""
+
+    def __init__(self, num_disp, window_size, min_disp, channels=3, **overrides):
+        # StereoBM needs an odd block size of at least 5
+        self.matcher = cv2.StereoBM_create(numDisparities=num_disp, blockSize=max(5, window_size | 1))
+        self.matcher.setMinDisparity(min_disp)
+        self.matcher.setPreFilterCap(overrides.get('preFilterCap', 31))
+        self.matcher.setTextureThreshold(overrides.get('textureThreshold', 10))
+        self.matcher.setUniquenessRatio(overrides.get('uniquenessRatio', 10))
+        self.matcher.setSpeckleWindowSize(overrides.get('speckleWindowSize', 100))
+        self.matcher.setSpeckleRange(overrides.get('speckleRange', 32))
+        self.matcher.setDisp12MaxDiff(overrides.get('disp12MaxDiff', 1))
+
+    def compute(self, imgL, imgR):
+        return self.matcher.compute(_to_gray(imgL), _to_gray(imgR))
+
+
+class WLSMatcher:
+    """SGBM with a right-view matcher and WLS edge-aware hole filling"""
+
+    def __init__(self, num_disp, window_size, min_disp, channels=3, **overrides):
+        self.left_matcher = _create_sgbm(num_disp, window_size, min_disp,
+                                         cv2.STEREO_SGBM_MODE_SGBM_3WAY, channels, **overrides)
+        self.right_matcher = cv2.ximgproc.createRightMatcher(self.left_matcher)
+        self.wls_filter = cv2.ximgproc.createDisparityWLSFilter(self.left_matcher)
+        self.wls_filter.setLambda(WLS_LAMBDA)
+        self.wls_filter.setSigmaColor(WLS_SIGMA_COLOR)
+
+    def compute(self, imgL, imgR):
+        dispL = self.left_matcher.compute(imgL, imgR)
+        dispR = self.right_matcher.compute(imgR, imgL)
+        return self.wls_filter.filter(dispL, imgL, disparity_map_right=dispR)
+
+
+def wls_available():
+    """True if the installed OpenCV has the contrib ximgproc module"""
+    return hasattr(cv2, 'ximgproc')
+
+
+def available_backends():
+    """Backends usable with the installed OpenCV build"""
+    return [name for name in BACKENDS if name != 'sgbm_wls' or wls_available()]
+
+
+def create_matcher(backend=DEFAULT_BACKEND, num_disp=96, window_size=9, min_disp=0, channels=3, **overrides):
+    """
+    Create a stereo matcher by backend name
+
+    Args:
+        backend: One of BACKENDS
+        num_disp: numDisparities (multiple of 16)
+        window_size: Block size (odd)
+        min_disp: minDisparity
+        channels: Channels of the images that will be matched (3 for BGR, 1 for grayscale)
+        **overrides: Extra matcher parameters (SGBM keyword names)
+
+    Returns:
+        Object with compute(imgL, imgR) -> int16 disparity x16
+    """
+    if backend == 'bm':
+        return BlockMatcher(num_disp, window_size, min_disp, channels, **overrides)
+    if backend in SGBM_MODES:
+        return _create_sgbm(num_disp, window_size, min_disp, SGBM_MODES[backend], channels, **overrides)
+    if backend == 'sgbm_wls':
+        if not wls_available():
+            raise ValueError("Backend 'sgbm_wls' needs opencv-contrib-python (cv2.ximgproc)")
+        return WLSMatcher(num_disp, window_size, min_disp, channels, **overrides)
+    raise ValueError(f"Unknown matcher backend '{backend}' (choose from: {', '.join(BACKENDS)})")
+
+
+def load_matcher_choice(profile_file=MATCHER_PROFILE_FILE, default=DEFAULT_BACKEND):
+    """Backend picked by the last auto-tune run on this device, or the default"""
+    try:
+        with open(profile_file, 'r') as f:
+            backend = json.load(f).get('backend')
+    except (OSError, ValueError):
+        return default
+    if backend not in available_backends():
+        return default
+    return backend
+
+
+def fill_ratio(disparity_fixed, min_disp=0):
+    """Fraction of pixels with a valid disparity (input is int16 x16)"""
+    return float(np.count_nonzero(disparity_fixed > min_disp * 16)) / disparity_fixed.size
+
+
+def load_recorded_pairs(pairs_dir, maps=None):
+    """Load left_*.png/right_*.png pairs, rectified with (mapL1, mapL2, mapR1, mapR2) if given"""
+    left_files = sorted(glob.glob(os.path.join(pairs_dir, 'left_*.png')))
+    right_files = sorted(glob.glob(os.path.join(pairs_dir, 'right_*.png')))
+    pairs = []
+    for left_file, right_file in zip(left_files, right_files):
+        imgL = cv2.imread(left_file)
+        imgR = cv2.imread(right_file)
+        if imgL is None or imgR is None:
+            continue
+        if maps is not None:
+            mapL1, mapL2, mapR1, mapR2 = maps
+            imgL = cv2.remap(imgL, mapL1, mapL2, cv2.INTER_LINEAR)
+            imgR = cv2.remap(imgR, mapR1, mapR2, cv2.INTER_LINEAR)
+        pairs.append((imgL, imgR))
+    return pairs
+
+
+def benchmark_backend(backend, pairs, num_disp=96, window_size=9, min_disp=0, repeats=AUTOTUNE_REPEATS):
+    """Mean compute time (ms) and mean fill ratio of one backend over recorded pairs"""
+    matcher = create_matcher(backend, num_disp, window_size, min_disp)
+    matcher.compute(*pairs[0])  # Warm-up (allocations, thread pool)
+
+    timings = []
+    fills = []
+    for _ in range(repeats):
+        for imgL, imgR in pairs:
+            start_time = time.perf_counter()
+            disparity = matcher.compute(imgL, imgR)
+            timings.append(time.perf_counter() - start_time)
+            fills.append(fill_ratio(disparity, min_disp))
+
+    return {
+        'backend': backend,
+        'mean_ms': float(np.mean(timings) * 1000),
+        'fill_ratio': float(np.mean(fills))
+    }
+
+
+def autotune(pairs, fill_target=DEFAULT_FILL_TARGET, num_disp=96, window_size=9, min_disp=0):
+    """
+    Benchmark every available backend and pick the fastest one meeting fill_target
+
+    Returns:
+        (chosen_backend, results) where results are sorted fastest first.
+        Falls back to the densest backend if none meets the target.
+    """
+    results = []
+    for backend in available_backends():
+        result = benchmark_backend(backend, pairs, num_disp, window_size, min_disp)
+        print(f"  {backend:<10} {result['mean_ms']:8.1f} ms   fill {result['fill_ratio'] * 100:5.1f}%")
+        results.append(result)
+
+    results.sort(key=lambda r: r['mean_ms'])
+    meeting = [r for r in results if r['fill_ratio'] >= fill_target]
+    if meeting:
+        return meeting[0]['backend'], results
+    return max(results, key=lambda r: r['fill_ratio'])['backend'], results
+
+
+def run_autotune(pairs_dir=DEFAULT_PAIRS_DIR, fill_target=DEFAULT_FILL_TARGET,
+                 param_file='stereo_params.npz', profile_file=MATCHER_PROFILE_FILE):
+    """Auto-tune on recorded pairs and save the choice to the matcher profile"""
+    maps = None
+    if os.path.exists(param_file):
+        maps = load_rectification_maps(param_file)
+    else:
+        print(f"⚠️ {param_file} not found - benchmarking unrectified pairs")
+
+    pairs = load_recorded_pairs(pairs_dir, maps)
+    if not pairs:
+        print(f"❌ No left_*.png/right_*.png pairs found in {pairs_dir}")
+        return None
+
+    print(f"Benchmarking {len(available_backends())} matchers on {len(pairs)} pairs "
+          f"(fill target {fill_target * 100:.0f}%)...")
+    backend, results = autotune(pairs, fill_target)
+
+    with open(profile_file, 'w') as f:
+        json.dump({
+            'backend': backend,
+            'fill_target': fill_target,
+            'pairs': len(pairs),
+            'resolution': list(pairs[0][0].shape[:2]),
+            'tuned_at': int(time.time()),
+            'results': results
+        }, f, indent=2)
+
+    print(f"✓ Selected matcher: {backend} (saved to {profile_file})")
+    return backend
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'autotune':
+        print("Usage: python stereo_matchers.py autotune [pairs_dir] [fill_target]")
+        print(f"Example: python stereo_matchers.py autotune {DEFAULT_PAIRS_DIR} 0.4")
+        print(f"Backends: {', '.join(available_backends())}")
+        sys.exit(1)
+
+    pairs_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PAIRS_DIR
+    fill_target = float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_FILL_TARGET
+    sys.exit(0 if run_autotune(pairs_dir, fill_target) else 1)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Pipelined Frame Processing
+Runs rectification, disparity computation and rendering as separate stages
+on separate threads, connected by bounded latest-frame-wins queues.
+OpenCV releases the GIL inside remap/SGBM, so throughput approaches the
+slowest stage instead of the sum of all stages.
+"""
+
+import threading
+import time
+import traceback
+
+from capture_metrics import METRICS
+
+
+class FramePacket:
+    """Data carried through the pipeline for one stereo pair"""
+
+    def __init__(self, frameL, frameR, timestamp):
+        self.frame_id = 0
+        self.timestamp = timestamp
+        self.frameL = frameL
+        self.frameR = frameR
+        self.imgL = None
+        self.imgR = None
+        self.disparity = None
+        # Set by the depth stage: disparity is full-resolution, full-quality and fresh
+        self.evidence = False
+        self.views = None  # Lazy FrameViews attached by the render stage
+        self.five_view = None
+        # Per-stage processing time in seconds, keyed by stage name
+        self.stage_times = {}
+
+
+class LatestQueue:
+    """Single-slot queue where a new item replaces any unconsumed one"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.item = None
+        self.dropped = 0
+
+    def put(self, item):
+        with self.condition:
+            if self.item is not None:
+                self.dropped += 1
+            self.item = item
+            self.condition.notify_all()
+
+    def get(self, timeout=None):
+        """Return the latest item, or None if nothing arrived within timeout"""
+        with self.condition:
+            if self.item is None:
+                self.condition.wait(timeout)
+            item, self.item = self.item, None
+            return item
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify_all()
+
+
+class Pipeline:
+    """
+    Chain of processing stages, each on its own thread
+
+    Args:
+        source: Callable returning a new FramePacket, or None if no frame is ready
+        stages: List of (name, func) where func(packet) returns the packet to
+            pass downstream, or None to drop it
+    """
+
+    def __init__(self, source, stages):
+        self.source = source
+        self.stages = stages
+        self.queues = [LatestQueue() for _ in range(len(stages) + 1)]
+        self.threads = []
+        self.running = False
+        self.frame_count = 0
+
+    def start(self):
+        """Start the source thread and one thread per stage"""
+        self.running = True
+        self.threads = [threading.Thread(target=self._run_source, name='pipeline-source', daemon=True)]
+        for i, (name, func) in enumerate(self.stages):
+            self.threads.append(threading.Thread(
+                target=self._run_stage,
+                args=(name, func, self.queues[i], self.queues[i + 1]),
+                name=f'pipeline-{name}',
+                daemon=True
+            ))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """Stop all stage threads"""
+        self.running = False
+        for queue in self.queues:
+            queue.wake()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+        self.threads = []
+
+    def get(self, timeout=None):
+        """Return the most recent fully processed packet, or None"""
+        return self.queues[-1].get(timeout)
+
+    @property
+    def dropped_frames(self):
+        """Packets overwritten before the next stage picked them up"""
+        return sum(queue.dropped for queue in self.queues)
+
+    def _run_source(self):
+        while self.running:
+            try:
+                packet = self.source()
+            except Exception as e:
+                print(f"⚠ Pipeline source error: {e}")
+                traceback.print_exc()
+                time.sleep(0.1)
+                continue
+            if packet is None:
+                continue
+            self.frame_count += 1
+            packet.frame_id = self.frame_count
+            self.queues[0].put(packet)
+
+    def _run_stage(self, name, func, input_queue, output_queue):
+        while self.running:
+            packet = input_queue.get(timeout=0.1)
+            if packet is None:
+                continue
+            start_time = time.perf_counter()
+            try:
+                packet = func(packet)
+            except Exception as e:
+                print(f"⚠ Pipeline stage '{name}' error: {e}")
+                traceback.print_exc()
+                continue
+            if packet is None:
+                continue
+            packet.stage_times[name] = time.perf_counter() - start_time
+            METRICS.observe(name, packet.stage_times[name])
+            output_queue.put(packet)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Stereo Session Recording and Replay
+Records synchronized raw L/R frames with their capture timestamps, and
+replays them through the same capture loop in place of the cameras, for
+reproducible profiling and soak tests without hardware.
+
+A session directory holds:
+    left.avi, right.avi   MJPG streams, one frame per pair
+    timestamps.csv        frame,timestamp (seconds, monotonic clock)
+    session.json          resolution, fps and frame count
+
+Record from the cameras:
+    python stereo_recording.py record <session_dir> [seconds]
+Replay in depthmap.py / capture_daemon.py:
+    REPLAY_DIR=<session_dir> [REPLAY_SPEED=max] [REPLAY_LOOP=1] python depthmap.py
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+
+import cv2
+
+LEFT_VIDEO = 'left.avi'
+RIGHT_VIDEO = 'right.avi'
+TIMESTAMPS_FILE = 'timestamps.csv'
+SESSION_FILE = 'session.json'
+
+RECORDING_CODEC = 'MJPG'
+RECORDING_QUALITY = 95
+
+REPLAY_REALTIME = 'realtime'
+REPLAY_MAX = 'max'
+
+
+class StereoRecorder:
+    """Writes raw stereo pairs and their timestamps to a session directory"""
+
+    def __init__(self, directory, fps, codec=RECORDING_CODEC):
+        self.directory = directory
+        self.fps = fps
+        self.codec = codec
+        self.writers = None
+        self.frame_size = None
+        self.frame_count = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+        os.makedirs(directory, exist_ok=True)
+        self.timestamps_file = open(os.path.join(directory, TIMESTAMPS_FILE), 'w', newline='')
+        self.timestamps = csv.writer(self.timestamps_file)
+        self.timestamps.writerow(['frame', 'timestamp'])
+
+    def _open_writers(self, frame):
+        height, width = frame.shape[:2]
+        self.frame_size = (width, height)
+        fourcc = cv2.VideoWriter_fourcc(*self.codec)
+        self.writers = []
+        for name in (LEFT_VIDEO, RIGHT_VIDEO):
+            writer = cv2.VideoWriter(os.path.join(self.directory, name), fourcc, self.fps, self.frame_size)
+            writer.set(cv2.VIDEOWRITER_PROP_QUALITY, RECORDING_QUALITY)
+            self.writers.append(writer)
+
+    def write(self, frameL, frameR, timestamp):
+        """Append one synchronized pair"""
+        if self.writers is None:
+            self._open_writers(frameL)
+        self.writers[0].write(frameL)
+        self.writers[1].write(frameR)
+        self.timestamps.writerow([self.frame_count, f'{timestamp:.6f}'])
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        self.frame_count += 1
+
+    def close(self):
+        """Finish the streams and write the session description"""
+        if self.writers is not None:
+            for writer in self.writers:
+                writer.release()
+        self.timestamps_file.close()
+
+        duration = 0.0
+        if self.frame_count > 1:
+            duration = self.last_timestamp - self.first_timestamp
+        with open(os.path.join(self.directory, SESSION_FILE), 'w') as f:
+            json.dump({
+                'frames': self.frame_count,
+                'resolution': list(self.frame_size) if self.frame_size else None,
+                'fps': self.fps,
+                'duration': duration,
+                'codec': self.codec,
+                'recorded_at': int(time.time())
+            }, f, indent=2)
+
+
+class ReplayStream:
+    """One recorded camera stream"""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.cap = cv2.VideoCapture(path)
+        # Frames delivered, like CameraReader.sequence
+        self.sequence = 0
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if ret:
+            self.sequence += 1
+        return ret, frame
+
+    def rewind(self):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        self.cap.release()
+
+
+def load_timestamps(directory):
+    """Recorded frame timestamps, in frame order"""
+    with open(os.path.join(directory, TIMESTAMPS_FILE), 'r', newline='') as f:
+        return [float(row['timestamp']) for row in csv.DictReader(f)]
+
+
+class ReplayGrabber:
+    """
+    Drop-in replacement for StereoGrabber that plays back a recorded session
+
+    Args:
+        directory: Session directory written by StereoRecorder
+        speed: 'realtime' keeps the recorded frame timing (and skips frames
+            the consumer is too slow for, like a live camera), 'max' delivers
+            every frame as fast as it is read
+        loop: Restart from the first frame at the end of the session
+    """
+
+    def __init__(self, directory, speed=REPLAY_REALTIME, loop=False):
+        self.directory = directory
+        self.realtime = speed != REPLAY_MAX
+        self.loop = loop
+        self.timestamps = load_timestamps(directory)
+        self.left = ReplayStream(os.path.join(directory, LEFT_VIDEO), 'left')
+        self.right = ReplayStream(os.path.join(directory, RIGHT_VIDEO), 'right')
+        self.index = 0
+        self.start_time = None
+        self.pair_count = 0
+        # Pairs skipped in realtime mode because the consumer fell behind
+        self.dropped_pairs = 0
+        self.last_skew = 0.0
+        self.finished = False
+
+    def start(self):
+        """Start playback (the clock starts at the first read)"""
+        if not self.left.cap.isOpened() or not self.right.cap.isOpened():
+            raise IOError(f"Cannot open recorded session in {self.directory}")
+        self.start_time = None
+
+    def stop(self):
+        """Release the recorded streams"""
+        self.left.release()
+        self.right.release()
+
+    def _rewind(self):
+        self.left.rewind()
+        self.right.rewind()
+        self.index = 0
+        self.start_time = None
+
+    def _due_time(self, index):
+        return self.start_time + (self.timestamps[index] - self.timestamps[0])
+
+    def _read_pair(self):
+        retL, frameL = self.left.read()
+        retR, frameR = self.right.read()
+        self.index += 1
+        return retL and retR, frameL, frameR
+
+    def read(self, timeout=1.0):
+        """
+        Return the next recorded pair
+
+        Returns:
+            (ok, frameL, frameR, timestamp) with the timestamp on the current
+            monotonic clock, or (False, None, None, None) when no pair is due
+            within timeout or the session has ended
+        """
+        if self.index >= len(self.timestamps):
+            if not self.loop:
+                if not self.finished:
+                    print("✓ Replay finished")
+                    self.finished = True
+                time.sleep(min(timeout, 0.1))
+                return False, None, None, None
+            self._rewind()
+
+        if self.start_time is None:
+            self.start_time = time.monotonic()
+
+        if self.realtime:
+            # Like a live camera, frames the consumer was too slow for are gone
+            while self.index + 1 < len(self.timestamps) and self._due_time(self.index + 1) <= time.monotonic():
+                self._read_pair()
+                self.dropped_pairs += 1
+
+            wait = self._due_time(self.index) - time.monotonic()
+            if wait > timeout:
+                time.sleep(timeout)
+                return False, None, None, None
+            if wait > 0:
+                time.sleep(wait)
+            timestamp = self._due_time(self.index)
+        else:
+            timestamp = time.monotonic()
+
+        ok, frameL, frameR = self._read_pair()
+        if not ok:
+            # Streams shorter than the timestamp list (truncated recording)
+            self.index = len(self.timestamps)
+            return False, None, None, None
+
+        self.pair_count += 1
+        return True, frameL, frameR, timestamp
+
+
+def record_session(directory, seconds=None):
+    """Record raw synchronized pairs from the cameras until Ctrl+C or the time limit"""
+    # depthmap imports this module, so it is only imported when recording
+    from depthmap import FPS, FRESH_GRAB_MS, MAX_PAIR_SKEW_MS, open_cameras
+    from stereo_capture import StereoGrabber
+
+    capL, capR = open_cameras()
+    if capL is None:
+        return False
+
+    grabber = StereoGrabber(capL, capR, max_skew_ms=MAX_PAIR_SKEW_MS, fresh_grab_ms=FRESH_GRAB_MS)
+    grabber.start()
+    recorder = StereoRecorder(directory, FPS)
+    start_time = time.monotonic()
+    print(f"Recording to {directory} (Ctrl+C to stop)...")
+
+    try:
+        while seconds is None or time.monotonic() - start_time < seconds:
+            ret, frameL, frameR, timestamp = grabber.read()
+            if ret:
+                recorder.write(frameL, frameR, timestamp)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        grabber.stop()
+        recorder.close()
+        capL.release()
+        capR.release()
+
+    print(f"✓ Recorded {recorder.frame_count} pairs ({grabber.dropped_pairs} dropped for skew)")
+    return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] != 'record':
+        print("Usage: python stereo_recording.py record <session_dir> [seconds]")
+        print("Example: python stereo_recording.py record sessions/tripod_1 60")
+        print("Replay:  REPLAY_DIR=sessions/tripod_1 python depthmap.py")
+        sys.exit(1)
+
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    sys.exit(0 if record_session(sys.argv[2], seconds) else 1)
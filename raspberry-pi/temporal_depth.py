@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Temporal Disparity Reuse
+For static scenes (tripod-mounted rigs) most frames look like the last one.
+Frame-to-frame change is measured on a tiny grayscale copy of the left image:
+
+  - nothing moved        -> reuse the previous disparity, no matching at all
+  - a few rows changed   -> recompute only a horizontal band around them
+  - large change / stale -> recompute the full frame
+
+Rectified stereo matches along rows, so a band with a vertical margin closely
+matches the full-frame result (SGBM's diagonal paths and speckle filtering
+reach a little further, so it is an approximation - fine for preview, while
+captures always recompute the full frame).
+
+Optional temporal smoothing blends the previous disparity into the periodic
+full refresh, and only on rows that did not change: there both results see
+the same content, so averaging reduces matching noise. Rows that changed
+always take the new disparity, since the previous one is stale there and
+blending would smear or ghost moving objects.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+# Downscale factor of the grayscale copy used for change detection
+DEFAULT_ANALYSIS_SCALE = 0.125
+
+# Mean absolute difference (gray levels) above which a row counts as changed
+DEFAULT_MOTION_THRESHOLD = 4.0
+
+# Recompute the full frame at least this often (seconds), even if static
+DEFAULT_MAX_AGE = 2.0
+
+# Above this fraction of changed rows a full recompute is cheaper than a band
+DEFAULT_REGION_MAX_FRACTION = 0.5
+
+# Extra rows computed above/below a changed band (matcher block support)
+DEFAULT_BAND_MARGIN = 32
+
+ACTION_FULL = 'full'
+ACTION_REGION = 'region'
+ACTION_REUSED = 'reused'
+
+
+def analysis_frame(image, scale=DEFAULT_ANALYSIS_SCALE):
+    """Small float32 grayscale copy used for change detection"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return small.astype(np.float32)
+
+
+class TemporalDepth:
+    """
+    Wraps a disparity function with static-scene skipping and band updates
+
+    Args:
+        compute_func: func(imgL, imgR) -> float32 disparity of the same height/width
+        motion_threshold: Per-row mean absolute difference that counts as motion
+        max_age: Seconds after which a full recompute is forced
+        blend: Weight of the previous disparity when refreshing unchanged rows
+            (0 disables temporal smoothing)
+        region_max_fraction: Changed-row fraction above which the full frame is recomputed
+        band_margin: Rows of context added above and below a recomputed band
+        analysis_scale: Downscale factor for change detection
+    """
+
+    def __init__(self, compute_func, motion_threshold=DEFAULT_MOTION_THRESHOLD, max_age=DEFAULT_MAX_AGE,
+                 blend=0.0, region_max_fraction=DEFAULT_REGION_MAX_FRACTION,
+                 band_margin=DEFAULT_BAND_MARGIN, analysis_scale=DEFAULT_ANALYSIS_SCALE):
+        self.compute_func = compute_func
+        self.motion_threshold = motion_threshold
+        self.max_age = max_age
+        self.blend = blend
+        self.region_max_fraction = region_max_fraction
+        self.band_margin = band_margin
+        self.analysis_scale = analysis_scale
+
+        self.reference = None
+        self.disparity = None
+        self.computed_at = 0.0
+        self.counts = {ACTION_FULL: 0, ACTION_REGION: 0, ACTION_REUSED: 0}
+
+    def reset(self):
+        """Forget the previous frame so the next update recomputes everything"""
+        self.reference = None
+        self.disparity = None
+
+    def update(self, imgL, imgR):
+        """
+        Return disparity for a rectified pair, reusing previous work where possible
+
+        Returns:
+            (disparity, action) where action is 'full', 'region' or 'reused'
+        """
+        current = analysis_frame(imgL, self.analysis_scale)
+        now = time.monotonic()
+
+        if (self.disparity is None or self.reference is None
+                or self.reference.shape != current.shape
+                or self.disparity.shape != imgL.shape[:2]):
+            return self._full(imgL, imgR, current, now)
+
+        row_change = cv2.absdiff(current, self.reference).mean(axis=1)
+        changed = row_change > self.motion_threshold
+        changed_rows = np.flatnonzero(changed)
+
+        if now - self.computed_at > self.max_age:
+            # Periodic refresh: smooth only the rows that stayed static
+            return self._full(imgL, imgR, current, now, static_rows=~changed)
+
+        if changed_rows.size == 0:
+            self.counts[ACTION_REUSED] += 1
+            return self.disparity, ACTION_REUSED
+
+        if changed_rows.size > self.region_max_fraction * current.shape[0]:
+            return self._full(imgL, imgR, current, now)
+
+        return self._region(imgL, imgR, current, changed_rows)
+
+    def _full(self, imgL, imgR, current, now, static_rows=None):
+        """Recompute the full frame, blending rows marked static in static_rows (analysis rows)"""
+        disparity = self.compute_func(imgL, imgR)
+        if static_rows is not None and static_rows.any():
+            # Map each full-size row to its analysis row
+            analysis_rows = np.arange(disparity.shape[0]) * static_rows.size // disparity.shape[0]
+            disparity = self._blend(self.disparity, disparity, static_rows[analysis_rows])
+        self.disparity = disparity
+        self.reference = current
+        self.computed_at = now
+        self.counts[ACTION_FULL] += 1
+        return disparity, ACTION_FULL
+
+    def _region(self, imgL, imgR, current, changed_rows):
+        height = imgL.shape[0]
+        row_scale = height / float(current.shape[0])
+
+        # Changed rows of the analysis frame, mapped back to full-size rows
+        y0 = int(changed_rows[0] * row_scale)
+        y1 = min(height, int(np.ceil((changed_rows[-1] + 1) * row_scale)))
+        band_y0 = max(0, y0 - self.band_margin)
+        band_y1 = min(height, y1 + self.band_margin)
+
+        band = self.compute_func(imgL[band_y0:band_y1], imgR[band_y0:band_y1])
+
+        # Earlier packets may still hold the previous array, so never edit it in place
+        disparity = self.disparity.copy()
+        disparity[y0:y1] = band[y0 - band_y0:y1 - band_y0]
+        self.disparity = disparity
+
+        first, last = changed_rows[0], changed_rows[-1] + 1
+        self.reference = self.reference.copy()
+        self.reference[first:last] = current[first:last]
+        self.counts[ACTION_REGION] += 1
+        return disparity, ACTION_REGION
+
+    def _blend(self, previous, disparity, rows):
+        """Blend with the previous disparity on the given rows (bool per row) where both are valid"""
+        if self.blend <= 0 or previous is None or previous.shape != disparity.shape:
+            return disparity
+        both_valid = (previous > 0) & (disparity > 0) & rows[:, None]
+        blended = disparity.copy()
+        blended[both_valid] = self.blend * previous[both_valid] + (1.0 - self.blend) * disparity[both_valid]
+        return blended
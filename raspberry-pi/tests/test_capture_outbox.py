@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from capture_outbox import STATE_REGISTERED, CaptureOutbox
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return CaptureOutbox(str(tmp_path / 'outbox'))
+
+
+def add_capture(outbox, capture_id, lease=0):
+    outbox.add(capture_id, f'capture_{capture_id}_left.jpg', f'capture_{capture_id}_views.jpg',
+               f'depth_{capture_id}.npz', f'depth_{capture_id}.json', lease=lease)
+
+
+def test_reserve_id_skips_used_and_reserved_ids(outbox):
+    add_capture(outbox, 1000)
+    outbox.update(1000, state=STATE_REGISTERED)
+
+    assert outbox.reserve_id(1000.7) == 1001
+    assert outbox.reserve_id(1000) == 1002
+    # A clock stepping back never lands on an earlier capture's id
+    assert outbox.reserve_id(999) == 999
+
+
+def test_reserve_id_is_unique_across_threads(outbox):
+    ids = []
+    lock = threading.Lock()
+
+    def reserve():
+        capture_id = outbox.reserve_id(2000)
+        with lock:
+            ids.append(capture_id)
+
+    threads = [threading.Thread(target=reserve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(ids) == list(range(2000, 2008))
+
+
+def test_reserve_id_survives_restart(outbox):
+    add_capture(outbox, 3000)
+
+    reopened = CaptureOutbox(outbox.directory)
+
+    assert reopened.reserve_id(3000) == 3001
+
+
+def test_unreserve_frees_an_abandoned_id(outbox):
+    capture_id = outbox.reserve_id(4000)
+    outbox.unreserve(capture_id)
+
+    assert outbox.reserve_id(4000) == capture_id
+
+
+def test_add_never_replaces_a_capture(outbox):
+    add_capture(outbox, 5000)
+
+    with pytest.raises(ValueError):
+        add_capture(outbox, 5000)
+
+
+def test_claim_due_leases_captures(outbox):
+    add_capture(outbox, 6000, lease=0)
+    add_capture(outbox, 6001, lease=0)
+    add_capture(outbox, 6002, lease=600)
+
+    claimed = outbox.claim_due(limit=5, lease=600)
+
+    assert [record['capture_id'] for record in claimed] == [6000, 6001]
+    # Leased captures are hidden from the next claim until released
+    assert outbox.claim_due(limit=5, lease=600) == []
+    outbox.release([6001])
+    assert [record['capture_id'] for record in outbox.claim_due(limit=5)] == [6001]
+
+
+def test_registered_captures_are_never_claimed(outbox):
+    add_capture(outbox, 7000)
+    outbox.update(7000, state=STATE_REGISTERED)
+
+    assert outbox.claim_due(limit=5) == []
+    assert outbox.pending_count() == 0
+
+
+def test_record_failure_backs_off_exponentially(outbox):
+    add_capture(outbox, 8000)
+
+    delays = []
+    for _ in range(6):
+        before = time.time()
+        delays.append(outbox.record_failure(8000, 'upload failed', base_delay=10, max_delay=100))
+        record = outbox.get(8000)
+        assert record['next_attempt_at'] >= before + delays[-1] - 0.01
+
+    # Base delay doubles per attempt (plus up to 10% jitter), capped at max_delay
+    for delay, expected in zip(delays, [10, 20, 40, 80, 100, 100]):
+        assert expected <= delay <= expected * 1.1
+    assert record['attempts'] == 6
+    assert record['last_error'] == 'upload failed'
+    assert outbox.claim_due(limit=5) == []
+
+
+def test_record_failure_ignores_unknown_captures(outbox):
+    assert outbox.record_failure(9000, 'gone', base_delay=10, max_delay=100) == 0
@@ -0,0 +1,104 @@
+import hashlib
+
+import pytest
+
+pytest.importorskip('eth_account')
+
+import capture_signing
+from capture_signing import CaptureSigner, build_manifest, get_device_address, verify_base_image, verify_payload
+
+# Throwaway key used only by these tests
+TEST_PRIVATE_KEY = '0x' + '11' * 32
+OTHER_PRIVATE_KEY = '0x' + '22' * 32
+
+IMAGE_BYTES = b'\xff\xd8 not really a jpeg \xff\xd9'
+
+
+@pytest.fixture(scope='module')
+def signer():
+    return CaptureSigner(TEST_PRIVATE_KEY)
+
+
+def signed_payload(signer):
+    data_obj = {
+        'baseImageCid': 'bafybeigdyrzt5sfp7udm7hu76uh7y26nf3efuylqabf3oclgtqy55fbzdi',
+        'baseImageSha256': hashlib.sha256(IMAGE_BYTES).hexdigest(),
+        'depthImage': 'ZGVwdGggaW1hZ2U=',
+        'depthData': {'format': 'deepshare-depth', 'version': 1, 'data': 'eJwDAAAAAAE='},
+        'timestamp': 1763863841,
+        'device': signer.address
+    }
+    manifest = build_manifest(data_obj)
+    return {'data': data_obj, 'manifest': manifest, 'signature': signer.sign(manifest)}
+
+
+def test_untouched_payload_verifies(signer):
+    ok, address, blob_results = verify_payload(signed_payload(signer), expected_address=signer.address)
+
+    assert ok
+    assert address == signer.address
+    assert blob_results and all(blob_results.values())
+
+
+def test_tampered_blob_fails(signer):
+    payload = signed_payload(signer)
+    payload['data']['depthData']['data'] = 'eJwDAAAAAAI='
+
+    ok, address, blob_results = verify_payload(payload)
+
+    assert not ok
+    # The manifest itself is intact, so the signer is still recovered
+    assert address == signer.address
+    assert blob_results['depthData'] is False
+    assert blob_results['timestamp'] is True
+
+
+def test_tampered_manifest_changes_signer(signer):
+    payload = signed_payload(signer)
+    payload['data']['timestamp'] += 1
+    payload['manifest'] = build_manifest(payload['data'])
+
+    ok, address, _ = verify_payload(payload, expected_address=signer.address)
+
+    assert not ok
+    assert address != signer.address
+
+
+def test_wrong_signer_fails(signer):
+    payload = signed_payload(signer)
+    payload['signature'] = CaptureSigner(OTHER_PRIVATE_KEY).sign(payload['manifest'])
+
+    ok, _, blob_results = verify_payload(payload, expected_address=signer.address)
+
+    assert not ok
+    assert all(blob_results.values())
+
+
+def test_missing_blob_fails(signer):
+    payload = signed_payload(signer)
+    del payload['data']['depthImage']
+
+    ok, _, blob_results = verify_payload(payload)
+
+    assert not ok
+    assert blob_results['depthImage'] is False
+
+
+def test_base_image_bytes_are_checked(signer):
+    data_obj = signed_payload(signer)['data']
+
+    assert verify_base_image(data_obj, IMAGE_BYTES)
+    assert not verify_base_image(data_obj, IMAGE_BYTES + b'\x00')
+    assert verify_base_image({'baseImage': 'aW1hZ2U='}, IMAGE_BYTES) is None
+
+
+def test_device_address_prefers_the_signer(signer, monkeypatch):
+    monkeypatch.setattr(capture_signing, '_signer', None)
+    monkeypatch.setenv('WALLET_ADDRESS', '0x000000000000000000000000000000000000dEaD')
+    monkeypatch.setenv('PRIVATE_KEY', TEST_PRIVATE_KEY)
+
+    assert get_device_address() == signer.address
+
+    monkeypatch.setattr(capture_signing, '_signer', None)
+    monkeypatch.delenv('PRIVATE_KEY')
+    assert get_device_address() == '0x000000000000000000000000000000000000dEaD'
@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+import depth_codec
+from depth_codec import DISPARITY_SCALE, encode_depth_data, reconstruct_depth_map
+
+COMPRESSIONS = ['zlib'] + (['zstd'] if depth_codec.zstandard is not None else [])
+
+
+def sgbm_disparity(shape=(48, 64), seed=0):
+    """int16 x16 disparity as StereoSGBM returns it, with invalid (-16) and zero pixels"""
+    rng = np.random.default_rng(seed)
+    fixed = rng.integers(1, 96 * DISPARITY_SCALE, shape).astype(np.int16)
+    fixed[rng.random(shape) < 0.3] = -DISPARITY_SCALE
+    fixed[:4] = 0
+    return fixed
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_int16_round_trip_is_lossless(compression):
+    fixed = sgbm_disparity()
+    depth_data = json.loads(json.dumps(encode_depth_data(fixed, compression)))
+
+    decoded = reconstruct_depth_map(depth_data)
+
+    assert decoded.dtype == np.float32
+    valid = fixed > 0
+    np.testing.assert_array_equal(decoded[valid] * DISPARITY_SCALE, fixed[valid])
+    assert np.all(decoded[~valid] == 0)
+    assert depth_data['valid_pixels'] == np.count_nonzero(valid)
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_float32_round_trip_is_lossless(compression):
+    fixed = sgbm_disparity(seed=1)
+    disparity = fixed.astype(np.float32) / DISPARITY_SCALE
+
+    decoded = reconstruct_depth_map(encode_depth_data(disparity, compression))
+
+    expected = np.where(disparity > 0, disparity, 0)
+    np.testing.assert_array_equal(decoded, expected)
+
+
+def test_legacy_list_encoding():
+    depth_data = {
+        'shape': [3, 4],
+        'indices_y': [0, 2],
+        'indices_x': [1, 3],
+        'values': [5.5, 12.0]
+    }
+
+    decoded = reconstruct_depth_map(depth_data)
+
+    expected = np.zeros((3, 4), dtype=np.float32)
+    expected[0, 1] = 5.5
+    expected[2, 3] = 12.0
+    np.testing.assert_array_equal(decoded, expected)
+    assert np.all(reconstruct_depth_map({'shape': [2, 2], 'values': []}) == 0)
+
+
+def test_rejects_unknown_version_and_corrupt_data():
+    depth_data = encode_depth_data(sgbm_disparity(), 'zlib')
+
+    with pytest.raises(ValueError):
+        reconstruct_depth_map(dict(depth_data, version=depth_codec.DEPTH_FORMAT_VERSION + 1))
+    with pytest.raises(ValueError):
+        reconstruct_depth_map(dict(depth_data, shape=[48, 65]))
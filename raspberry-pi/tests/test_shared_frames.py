@@ -0,0 +1,79 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from shared_frames import FrameRing
+
+FIELDS = {'image': ((4, 6, 3), np.uint8), 'disparity': ((4, 6), np.float32)}
+META_FIELDS = ('timestamp', 'evidence')
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create(multiprocessing.get_context('spawn'), FIELDS, META_FIELDS)
+    yield ring
+    ring.close()
+
+
+def frame(value):
+    return {'image': np.full((4, 6, 3), value, dtype=np.uint8),
+            'disparity': np.full((4, 6), value / 2, dtype=np.float32)}
+
+
+def test_read_returns_published_frame(ring):
+    ring.write(frame(7), timestamp=12.5, evidence=1.0)
+
+    arrays, meta = ring.read_latest(timeout=0)
+
+    assert np.all(arrays['image'] == 7)
+    assert np.all(arrays['disparity'] == 3.5)
+    assert meta == {'timestamp': 12.5, 'evidence': 1.0}
+    # Nothing new since the last read
+    assert ring.read_latest(timeout=0) is None
+
+
+def test_reader_gets_latest_and_missing_meta_is_zero(ring):
+    for value in range(5):
+        ring.write(frame(value), timestamp=value)
+
+    arrays, meta = ring.read_latest(timeout=0)
+
+    assert np.all(arrays['image'] == 4)
+    assert meta == {'timestamp': 4.0, 'evidence': 0.0}
+
+
+def test_writer_never_overwrites_the_held_slot(ring):
+    ring.write(frame(1))
+    held, _ = ring.read_latest(timeout=0)
+
+    for value in range(2, 12):
+        slot, _ = ring.begin_write()
+        assert ring.arrays[slot]['image'] is not held['image']
+        ring.write(frame(value))
+        # The frame the reader holds is untouched until its next read
+        assert np.all(held['image'] == 1)
+
+    arrays, _ = ring.read_latest(timeout=0)
+    assert np.all(arrays['image'] == 11)
+
+
+def _write_frames(handle, count):
+    ring = FrameRing.attach(handle)
+    for value in range(1, count + 1):
+        ring.write(frame(value), timestamp=value)
+    ring.close()
+
+
+def test_frames_cross_processes(ring):
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=_write_frames, args=(ring.handle(), 3))
+    process.start()
+    process.join(timeout=30)
+    assert process.exitcode == 0
+
+    arrays, meta = ring.read_latest(timeout=5)
+
+    assert np.all(arrays['image'] == 3)
+    assert np.all(arrays['disparity'] == 1.5)
+    assert meta['timestamp'] == 3.0
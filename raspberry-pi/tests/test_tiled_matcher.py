@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pytest
+
+from stereo_matchers import DEFAULT_PAIRS_DIR, create_matcher, load_recorded_pairs
+from tiled_matcher import (TILING_APPROXIMATE, TILING_EXACT, TiledMatcher, band_bounds, band_overlap,
+                           get_pool, tiling_supported)
+
+PAIRS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), DEFAULT_PAIRS_DIR)
+
+
+def synthetic_pair(height=240, width=320, shift=12, seed=0):
+    """Random texture with a closer square shifted further than the background"""
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(0, 256, (height, width + 2 * shift), dtype=np.uint8)
+    imgL = texture[:, shift:shift + width].copy()
+    imgR = texture[:, shift + shift // 2:shift + shift // 2 + width].copy()
+    imgR[60:180, 80:200] = texture[60:180, 2 * shift + 80:2 * shift + 200]
+    return imgL, imgR
+
+
+def assert_bm_tiling_exact(pairs, workers):
+    single = create_matcher('bm', 96, 9, 0)
+    tiled = TiledMatcher(lambda: create_matcher('bm', 96, 9, 0), workers, band_overlap('bm'))
+    for imgL, imgR in pairs:
+        expected = single.compute(imgL, imgR)
+        actual = tiled.compute(imgL, imgR)
+        assert actual.dtype == expected.dtype
+        differing = np.count_nonzero(actual != expected)
+        assert differing == 0, f"{differing} pixels differ with {workers} bands"
+
+
+@pytest.mark.parametrize('workers', [2, 3, 4])
+def test_bm_tiled_matches_single_call_synthetic(workers):
+    assert_bm_tiling_exact([synthetic_pair(seed=seed) for seed in range(3)], workers)
+
+
+@pytest.mark.skipif(not os.path.isdir(PAIRS_DIR), reason='recorded pairs not available')
+def test_bm_tiled_matches_single_call_recorded():
+    pairs = load_recorded_pairs(PAIRS_DIR)[:6]
+    assert pairs
+    assert_bm_tiling_exact(pairs, 4)
+
+
+def test_band_bounds_cover_every_row_once():
+    bounds = band_bounds(480, 4, 32)
+    cores = [row for _, _, core_y0, core_y1 in bounds for row in range(core_y0, core_y1)]
+    assert cores == list(range(480))
+    assert all(y0 <= core_y0 and core_y1 <= y1 for y0, y1, core_y0, core_y1 in bounds)
+
+
+def test_tiling_modes():
+    assert tiling_supported('bm', TILING_EXACT)
+    assert not tiling_supported('sgbm_3way', TILING_EXACT)
+    assert tiling_supported('sgbm_3way', TILING_APPROXIMATE)
+    with pytest.raises(ValueError):
+        tiling_supported('bm', 'fast')
+
+
+def test_pools_are_kept_per_worker_count():
+    small = get_pool(2)
+    large = get_pool(5)
+    assert get_pool(2) is small
+    assert large is not small
+    # A matcher still holding the smaller pool keeps working
+    assert small.submit(sum, [1, 2]).result() == 3
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+DeepShare - Lazy View Graph
+Views (depth colormap, blends, labelled tiles, composites) are declared as
+nodes with dependencies and computed only when a consumer asks for them.
+Results are cached per frame, so the display and a capture commit that ask
+for the same view of the same frame share one computation.
+"""
+
+import copy
+import threading
+import time
+
+from capture_metrics import METRICS
+
+
+class ViewNode:
+    """A named view computed by func(packet, params, *dependency_values)"""
+
+    def __init__(self, name, func, deps=(), max_age=0.0):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        # Display consumers may reuse a result from an earlier frame this recent
+        self.max_age = max_age
+
+
+class ViewGraph:
+    """Registry of view nodes shared by all frames"""
+
+    def __init__(self):
+        self.nodes = {}
+        self.lock = threading.Lock()
+        # name -> (computed_at, frame_id, value) of the most recent computation
+        self.latest = {}
+
+    def add(self, name, func, deps=(), max_age=0.0):
+        """Register a view node"""
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError(f"View '{name}' depends on unknown view '{dep}'")
+        self.nodes[name] = ViewNode(name, func, deps, max_age)
+
+    def evaluate(self, packet, params):
+        """Return a lazy per-frame view cache for this packet"""
+        return FrameViews(self, packet, params)
+
+    def _remember(self, name, frame_id, value):
+        with self.lock:
+            self.latest[name] = (time.monotonic(), frame_id, value)
+
+    def _recent(self, name, max_age):
+        with self.lock:
+            entry = self.latest.get(name)
+        if entry is not None and time.monotonic() - entry[0] <= max_age:
+            return entry[2]
+        return None
+
+
+class FrameViews:
+    """Views of one frame, computed on first request and cached"""
+
+    def __init__(self, graph, packet, params):
+        self.graph = graph
+        # Keep the frame's data, not the packet itself: the packet holds this
+        # FrameViews, and the cycle would keep its pooled buffers (see
+        # frame_pool.py) busy until the cyclic garbage collector ran
+        self.packet = copy.copy(packet)
+        self.packet.views = None
+        self.frame_id = packet.frame_id
+        self.params = dict(params)
+        self.cache = {}
+        self.lock = threading.RLock()
+
+    def get(self, name, allow_stale=False):
+        """
+        Return the named view, computing it (and its dependencies) if needed
+
+        Args:
+            name: View name
+            allow_stale: Accept a recent result from an earlier frame for nodes
+                with max_age > 0 (fine for display, never for evidence)
+        """
+        with self.lock:
+            if name in self.cache:
+                return self.cache[name]
+
+            node = self.graph.nodes[name]
+            if allow_stale and node.max_age > 0:
+                value = self.graph._recent(name, node.max_age)
+                if value is not None:
+                    return value
+
+            args = [self.get(dep, allow_stale) for dep in node.deps]
+            with METRICS.timer(f'view_{name}'):
+                value = node.func(self.packet, self.params, *args)
+            self.cache[name] = value
+            self.graph._remember(name, self.frame_id, value)
+            return value
+
+    def computed(self):
+        """Names of the views computed for this frame so far"""
+        with self.lock:
+            return list(self.cache)